@@ -0,0 +1,35 @@
+"""Add (sort column, id) indexes for keyset pagination
+
+Revision ID: 3f8a6c2e91b4
+Revises: 7c1e4b9a2d10
+Create Date: 2026-10-16 11:03:27.512904
+
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3f8a6c2e91b4"
+down_revision: Union[str, None] = "7c1e4b9a2d10"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("idx_bikes_created_at_id", "bikes", ["created_at", "id"]),
+    ("idx_users_created_at_id", "users", ["created_at", "id"]),
+    ("idx_transactions_created_at_id", "transactions", ["created_at", "id"]),
+    ("idx_map_zones_city_id_id", "map_zones", ["city_id", "id"]),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in INDEXES:
+        op.drop_index(name, table_name=table, if_exists=True)
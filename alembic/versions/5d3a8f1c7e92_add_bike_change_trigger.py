@@ -0,0 +1,69 @@
+"""Add trigger that NOTIFYs bike_changes of every change to bikes
+
+Revision ID: 5d3a8f1c7e92
+Revises: 9b2d5e7f4c61
+Create Date: 2026-10-16 15:02:44.518903
+
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5d3a8f1c7e92"
+down_revision: Union[str, None] = "9b2d5e7f4c61"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_bike_change() RETURNS trigger AS $$
+        DECLARE
+            bike bikes;
+            changed text[];
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                bike := OLD;
+            ELSE
+                bike := NEW;
+                SELECT array_agg(new.key ORDER BY new.key) INTO changed
+                FROM jsonb_each(to_jsonb(NEW)) AS new
+                WHERE new.key NOT IN ('created_at', 'updated_at')
+                    AND (TG_OP = 'INSERT' OR new.value IS DISTINCT FROM to_jsonb(OLD) -> new.key);
+                IF changed IS NULL AND TG_OP = 'UPDATE' THEN
+                    RETURN NULL;
+                END IF;
+            END IF;
+
+            PERFORM pg_notify(
+                'bike_changes',
+                json_build_object(
+                    'op', lower(TG_OP),
+                    'id', bike.id,
+                    'changed', coalesce(changed, ARRAY[]::text[]),
+                    'city_id', bike.city_id,
+                    'battery_lvl', bike.battery_lvl,
+                    'is_available', bike.is_available,
+                    'deleted', bike.deleted_at IS NOT NULL,
+                    'lon', ST_X(bike.last_position),
+                    'lat', ST_Y(bike.last_position),
+                    'updated_at', bike.updated_at
+                )::text
+            );
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE OR REPLACE TRIGGER bikes_notify_change
+        AFTER INSERT OR UPDATE OR DELETE ON bikes
+        FOR EACH ROW EXECUTE FUNCTION notify_bike_change();
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS bikes_notify_change ON bikes;")
+    op.execute("DROP FUNCTION IF EXISTS notify_bike_change();")
@@ -0,0 +1,57 @@
+"""Add partial GiST indexes on available bike positions
+
+Revision ID: 7c1e4b9a2d10
+Revises:
+Create Date: 2026-10-16 09:12:41.318204
+
+Base tables are created by api.db.table_creation, so this revision starts a new chain.
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7c1e4b9a2d10"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "idx_bikes_available_last_position",
+        "bikes",
+        ["last_position"],
+        unique=False,
+        postgresql_using="gist",
+        postgresql_where=sa.text("is_available AND deleted_at IS NULL"),
+        if_not_exists=True,
+    )
+    op.create_index(
+        "idx_bikes_available_last_position_geography",
+        "bikes",
+        [sa.text("(last_position::geography)")],
+        unique=False,
+        postgresql_using="gist",
+        postgresql_where=sa.text("is_available AND deleted_at IS NULL"),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "idx_bikes_available_last_position_geography",
+        table_name="bikes",
+        postgresql_using="gist",
+        if_exists=True,
+    )
+    op.drop_index(
+        "idx_bikes_available_last_position",
+        table_name="bikes",
+        postgresql_using="gist",
+        if_exists=True,
+    )
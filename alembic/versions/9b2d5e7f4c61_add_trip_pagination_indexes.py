@@ -0,0 +1,33 @@
+"""Add (created_at, id) indexes for paging trips
+
+Revision ID: 9b2d5e7f4c61
+Revises: 3f8a6c2e91b4
+Create Date: 2026-10-16 13:41:08.227315
+
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9b2d5e7f4c61"
+down_revision: Union[str, None] = "3f8a6c2e91b4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("idx_trips_created_at_id", "trips", ["created_at", "id"]),
+    ("idx_trips_user_id_created_at_id", "trips", ["user_id", "created_at", "id"]),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in INDEXES:
+        op.drop_index(name, table_name=table, if_exists=True)
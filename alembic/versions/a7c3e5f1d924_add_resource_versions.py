@@ -0,0 +1,48 @@
+"""Add resource_versions, NOTIFYed by triggers on the read-mostly tables
+
+Revision ID: a7c3e5f1d924
+Revises: f2b9d4a6c813
+Create Date: 2026-10-16 21:14:52.306117
+
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a7c3e5f1d924"
+down_revision: Union[str, None] = "f2b9d4a6c813"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("bikes", "cities", "map_zones", "zone_types")
+
+
+def upgrade() -> None:
+    op.execute("CREATE SEQUENCE IF NOT EXISTS resource_versions;")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_resource_version() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify(
+                'resource_versions',
+                TG_TABLE_NAME || ':' || nextval('resource_versions')
+            );
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    for table in TABLES:
+        op.execute(f"""
+            CREATE OR REPLACE TRIGGER {table}_notify_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_resource_version();
+        """)
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_notify_version ON {table};")
+    op.execute("DROP FUNCTION IF EXISTS notify_resource_version();")
+    op.execute("DROP SEQUENCE IF EXISTS resource_versions;")
@@ -0,0 +1,92 @@
+"""Add bike telemetry history and its per minute and per hour rollups
+
+Revision ID: c84e2b6d1f37
+Revises: 5d3a8f1c7e92
+Create Date: 2026-10-16 16:27:53.904117
+
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+import geoalchemy2
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c84e2b6d1f37"
+down_revision: Union[str, None] = "5d3a8f1c7e92"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def rollup_columns() -> list[sa.Column]:
+    """Columns of a bike telemetry rollup table."""
+    return [
+        sa.Column("bike_id", sa.BigInteger(), nullable=False),
+        sa.Column("bucket", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("samples", sa.Integer(), nullable=False),
+        sa.Column("battery_sum", sa.BigInteger(), nullable=False),
+        sa.Column("battery_min", sa.Integer(), nullable=False),
+        sa.Column("battery_max", sa.Integer(), nullable=False),
+        sa.Column(
+            "last_position",
+            geoalchemy2.types.Geometry(
+                geometry_type="POINT", srid=4326, spatial_index=False, from_text="ST_GeomFromEWKT"
+            ),
+            nullable=True,
+        ),
+        sa.Column("last_reported_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("bike_id", "bucket"),
+    ]
+
+
+def upgrade() -> None:
+    # Partitions are created by the API, see TelemetryRepository.ensure_partitions
+    op.create_table(
+        "bike_telemetry",
+        sa.Column("bike_id", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("battery_lvl", sa.Integer(), nullable=False),
+        sa.Column(
+            "last_position",
+            geoalchemy2.types.Geometry(
+                geometry_type="POINT", srid=4326, spatial_index=False, from_text="ST_GeomFromEWKT"
+            ),
+            nullable=True,
+        ),
+        sa.PrimaryKeyConstraint("bike_id", "created_at"),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    op.create_index(
+        "idx_bike_telemetry_created_at",
+        "bike_telemetry",
+        ["created_at"],
+        postgresql_using="brin",
+    )
+
+    op.create_table(
+        "bike_telemetry_1m", *rollup_columns(), postgresql_partition_by="RANGE (bucket)"
+    )
+    op.create_index(
+        "idx_bike_telemetry_1m_bucket", "bike_telemetry_1m", ["bucket"], postgresql_using="brin"
+    )
+
+    op.create_table("bike_telemetry_1h", *rollup_columns())
+    op.create_index("idx_bike_telemetry_1h_bucket", "bike_telemetry_1h", ["bucket"])
+
+
+def downgrade() -> None:
+    # Dropping a partitioned table drops its partitions
+    op.drop_index("idx_bike_telemetry_1h_bucket", table_name="bike_telemetry_1h")
+    op.drop_table("bike_telemetry_1h")
+    op.drop_index("idx_bike_telemetry_1m_bucket", table_name="bike_telemetry_1m")
+    op.drop_table("bike_telemetry_1m")
+    op.drop_index("idx_bike_telemetry_created_at", table_name="bike_telemetry")
+    op.drop_table("bike_telemetry")
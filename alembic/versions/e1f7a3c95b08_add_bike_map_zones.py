@@ -0,0 +1,117 @@
+"""Add bike_map_zones, kept up to date by triggers on bikes and map_zones
+
+Revision ID: e1f7a3c95b08
+Revises: c84e2b6d1f37
+Create Date: 2026-10-16 17:48:12.361594
+
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e1f7a3c95b08"
+down_revision: Union[str, None] = "c84e2b6d1f37"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "bike_map_zones",
+        sa.Column("bike_id", sa.BigInteger(), nullable=False),
+        sa.Column("map_zone_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["bike_id"], ["bikes.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["map_zone_id"], ["map_zones.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("bike_id", "map_zone_id"),
+    )
+    op.create_index("idx_bike_map_zones_map_zone_id", "bike_map_zones", ["map_zone_id"])
+
+    # The point-in-polygon lookups of the triggers need spatial indexes on both sides
+    op.create_index(
+        "idx_bikes_last_position",
+        "bikes",
+        ["last_position"],
+        postgresql_using="gist",
+        if_not_exists=True,
+    )
+    op.create_index(
+        "idx_map_zones_boundary",
+        "map_zones",
+        ["boundary"],
+        postgresql_using="gist",
+        if_not_exists=True,
+    )
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION update_bike_map_zones() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' AND NEW.last_position IS NOT DISTINCT FROM OLD.last_position THEN
+                RETURN NULL;
+            END IF;
+
+            DELETE FROM bike_map_zones AS member
+            WHERE member.bike_id = NEW.id
+                AND NOT EXISTS (
+                    SELECT 1 FROM map_zones AS zone
+                    WHERE zone.id = member.map_zone_id
+                        AND ST_Contains(zone.boundary, NEW.last_position)
+                );
+            INSERT INTO bike_map_zones (bike_id, map_zone_id)
+            SELECT NEW.id, zone.id FROM map_zones AS zone
+            WHERE ST_Contains(zone.boundary, NEW.last_position)
+            ON CONFLICT DO NOTHING;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE OR REPLACE TRIGGER bikes_update_map_zones
+        AFTER INSERT OR UPDATE OF last_position ON bikes
+        FOR EACH ROW EXECUTE FUNCTION update_bike_map_zones();
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION update_map_zone_bikes() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' AND NEW.boundary IS NOT DISTINCT FROM OLD.boundary THEN
+                RETURN NULL;
+            END IF;
+
+            DELETE FROM bike_map_zones AS member
+            USING bikes AS bike
+            WHERE member.map_zone_id = NEW.id
+                AND bike.id = member.bike_id
+                AND NOT ST_Contains(NEW.boundary, bike.last_position);
+            INSERT INTO bike_map_zones (bike_id, map_zone_id)
+            SELECT bike.id, NEW.id FROM bikes AS bike
+            WHERE ST_Contains(NEW.boundary, bike.last_position)
+            ON CONFLICT DO NOTHING;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE OR REPLACE TRIGGER map_zones_update_bikes
+        AFTER INSERT OR UPDATE OF boundary ON map_zones
+        FOR EACH ROW EXECUTE FUNCTION update_map_zone_bikes();
+    """)
+
+    op.execute("""
+        INSERT INTO bike_map_zones (bike_id, map_zone_id)
+        SELECT bike.id, zone.id
+        FROM bikes AS bike
+        JOIN map_zones AS zone ON ST_Contains(zone.boundary, bike.last_position);
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS map_zones_update_bikes ON map_zones;")
+    op.execute("DROP FUNCTION IF EXISTS update_map_zone_bikes();")
+    op.execute("DROP TRIGGER IF EXISTS bikes_update_map_zones ON bikes;")
+    op.execute("DROP FUNCTION IF EXISTS update_bike_map_zones();")
+    op.drop_index("idx_bike_map_zones_map_zone_id", table_name="bike_map_zones")
+    op.drop_table("bike_map_zones")
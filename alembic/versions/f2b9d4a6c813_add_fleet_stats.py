@@ -0,0 +1,211 @@
+"""Add fleet_stats, kept up to date by triggers on bikes and trips
+
+Revision ID: f2b9d4a6c813
+Revises: e1f7a3c95b08
+Create Date: 2026-10-16 19:02:37.518420
+
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f2b9d4a6c813"
+down_revision: Union[str, None] = "e1f7a3c95b08"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "fleet_stats",
+        sa.Column("city_id", sa.Integer(), nullable=False),
+        sa.Column("status", sa.Text(), nullable=False),
+        sa.Column("battery_bucket", sa.SmallInteger(), nullable=False),
+        sa.Column("bikes", sa.Integer(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True),
+        sa.CheckConstraint("status IN ('available', 'in_use', 'unavailable', 'deleted')"),
+        sa.PrimaryKeyConstraint("city_id", "status", "battery_bucket"),
+    )
+    op.create_table(
+        "fleet_stats_members",
+        sa.Column("bike_id", sa.BigInteger(), nullable=False),
+        sa.Column("city_id", sa.Integer(), nullable=False),
+        sa.Column("status", sa.Text(), nullable=False),
+        sa.Column("battery_bucket", sa.SmallInteger(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("bike_id"),
+    )
+    # The triggers look up the active trip of every changed bike
+    op.create_index(
+        "idx_trips_active_bike_id",
+        "trips",
+        ["bike_id"],
+        postgresql_where=sa.text("end_time IS NULL"),
+    )
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION refresh_fleet_stats(bike_ids bigint[]) RETURNS void AS $$
+            WITH latest AS (
+                SELECT
+                    bike.id AS bike_id,
+                    bike.city_id,
+                    CASE
+                        WHEN bike.deleted_at IS NOT NULL THEN 'deleted'
+                        WHEN EXISTS (
+                            SELECT 1 FROM trips AS trip
+                            WHERE trip.bike_id = bike.id AND trip.end_time IS NULL
+                        ) THEN 'in_use'
+                        WHEN bike.is_available THEN 'available'
+                        ELSE 'unavailable'
+                    END AS status,
+                    least(bike.battery_lvl / 10, 9) AS battery_bucket
+                FROM bikes AS bike
+                WHERE bike.id = ANY(bike_ids)
+            ),
+            changed AS (
+                SELECT
+                    coalesce(latest.bike_id, stored.bike_id) AS bike_id,
+                    latest.city_id,
+                    latest.status,
+                    latest.battery_bucket,
+                    stored.city_id AS old_city_id,
+                    stored.status AS old_status,
+                    stored.battery_bucket AS old_battery_bucket
+                FROM latest
+                FULL JOIN (
+                    SELECT * FROM fleet_stats_members WHERE bike_id = ANY(bike_ids)
+                ) AS stored ON stored.bike_id = latest.bike_id
+                WHERE (latest.city_id, latest.status, latest.battery_bucket)
+                    IS DISTINCT FROM (stored.city_id, stored.status, stored.battery_bucket)
+            ),
+            deltas AS (
+                SELECT city_id, status, battery_bucket, sum(delta) AS delta
+                FROM (
+                    SELECT city_id, status, battery_bucket, 1 AS delta
+                    FROM changed WHERE status IS NOT NULL
+                    UNION ALL
+                    SELECT old_city_id, old_status, old_battery_bucket, -1
+                    FROM changed WHERE old_status IS NOT NULL
+                ) AS moves
+                GROUP BY city_id, status, battery_bucket
+                HAVING sum(delta) <> 0
+            ),
+            counted AS (
+                INSERT INTO fleet_stats (city_id, status, battery_bucket, bikes)
+                SELECT city_id, status, battery_bucket, delta FROM deltas
+                ORDER BY city_id, status, battery_bucket
+                ON CONFLICT (city_id, status, battery_bucket)
+                DO UPDATE SET bikes = fleet_stats.bikes + excluded.bikes
+            ),
+            removed AS (
+                DELETE FROM fleet_stats_members
+                WHERE bike_id IN (SELECT bike_id FROM changed WHERE status IS NULL)
+            )
+            INSERT INTO fleet_stats_members (bike_id, city_id, status, battery_bucket)
+            SELECT bike_id, city_id, status, battery_bucket FROM changed
+            WHERE status IS NOT NULL
+            ORDER BY bike_id
+            ON CONFLICT (bike_id) DO UPDATE
+            SET city_id = excluded.city_id,
+                status = excluded.status,
+                battery_bucket = excluded.battery_bucket;
+        $$ LANGUAGE sql;
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION refresh_fleet_stats_of_bikes() RETURNS trigger AS $$
+        BEGIN
+            PERFORM refresh_fleet_stats(ARRAY(SELECT DISTINCT id FROM changed_rows));
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION refresh_fleet_stats_of_trips() RETURNS trigger AS $$
+        BEGIN
+            PERFORM refresh_fleet_stats(ARRAY(SELECT DISTINCT bike_id FROM changed_rows));
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE OR REPLACE TRIGGER bikes_insert_fleet_stats
+        AFTER INSERT ON bikes
+        REFERENCING NEW TABLE AS changed_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION refresh_fleet_stats_of_bikes();
+    """)
+    op.execute("""
+        CREATE OR REPLACE TRIGGER bikes_update_fleet_stats
+        AFTER UPDATE ON bikes
+        REFERENCING NEW TABLE AS changed_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION refresh_fleet_stats_of_bikes();
+    """)
+    op.execute("""
+        CREATE OR REPLACE TRIGGER bikes_delete_fleet_stats
+        AFTER DELETE ON bikes
+        REFERENCING OLD TABLE AS changed_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION refresh_fleet_stats_of_bikes();
+    """)
+    op.execute("""
+        CREATE OR REPLACE TRIGGER trips_insert_fleet_stats
+        AFTER INSERT ON trips
+        REFERENCING NEW TABLE AS changed_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION refresh_fleet_stats_of_trips();
+    """)
+    op.execute("""
+        CREATE OR REPLACE TRIGGER trips_update_fleet_stats
+        AFTER UPDATE ON trips
+        REFERENCING NEW TABLE AS changed_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION refresh_fleet_stats_of_trips();
+    """)
+    op.execute("""
+        CREATE OR REPLACE TRIGGER trips_delete_fleet_stats
+        AFTER DELETE ON trips
+        REFERENCING OLD TABLE AS changed_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION refresh_fleet_stats_of_trips();
+    """)
+
+    op.execute("SELECT refresh_fleet_stats(ARRAY(SELECT id FROM bikes));")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS trips_delete_fleet_stats ON trips;")
+    op.execute("DROP TRIGGER IF EXISTS trips_update_fleet_stats ON trips;")
+    op.execute("DROP TRIGGER IF EXISTS trips_insert_fleet_stats ON trips;")
+    op.execute("DROP FUNCTION IF EXISTS refresh_fleet_stats_of_trips();")
+    op.execute("DROP TRIGGER IF EXISTS bikes_delete_fleet_stats ON bikes;")
+    op.execute("DROP TRIGGER IF EXISTS bikes_update_fleet_stats ON bikes;")
+    op.execute("DROP TRIGGER IF EXISTS bikes_insert_fleet_stats ON bikes;")
+    op.execute("DROP FUNCTION IF EXISTS refresh_fleet_stats_of_bikes();")
+    op.execute("DROP FUNCTION IF EXISTS refresh_fleet_stats(bigint[]);")
+    op.drop_index("idx_trips_active_bike_id", table_name="trips")
+    op.drop_table("fleet_stats_members")
+    op.drop_table("fleet_stats")
@@ -0,0 +1,56 @@
+"""Postgres LISTEN/NOTIFY helpers.
+
+Listening needs a connection that stays open for as long as the process runs, so it
+uses its own asyncpg connection instead of one from the SQLAlchemy pool.
+"""
+
+import asyncio
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Optional
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+
+def asyncpg_dsn(database_url: str) -> str:
+    """Get the asyncpg dsn of an SQLAlchemy database url."""
+    return database_url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+async def listen(
+    dsn: str,
+    channel: str,
+    reconnect_delay: float = 1.0,
+    on_connect: Optional[Callable[[asyncpg.Connection], Awaitable[None]]] = None,
+) -> AsyncIterator[str]:
+    """LISTEN on a channel and yield the payload of every notification.
+
+    Reconnects after reconnect_delay seconds when the connection cannot be made or is
+    lost. Notifications sent while the connection is down are missed, on_connect is
+    awaited with the connection every time it is made so that listeners can catch up."""
+    while True:
+        queue: asyncio.Queue[str] = asyncio.Queue()
+        try:
+            connection = await asyncpg.connect(dsn)
+            await connection.add_listener(
+                channel, lambda _conn, _pid, _channel, payload, put=queue.put_nowait: put(payload)
+            )
+            if on_connect is not None:
+                await on_connect(connection)
+        except (OSError, asyncpg.PostgresError):
+            logger.error("Cannot LISTEN on %s, retrying", channel)
+            await asyncio.sleep(reconnect_delay)
+            continue
+
+        try:
+            while not connection.is_closed():
+                try:
+                    yield await asyncio.wait_for(queue.get(), reconnect_delay)
+                except asyncio.TimeoutError:
+                    continue
+        finally:
+            if not connection.is_closed():
+                await connection.close()
+        logger.error("Lost LISTEN connection on %s, reconnecting", channel)
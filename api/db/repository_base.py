@@ -1,15 +1,35 @@
 """Repository module for database operations."""
 
 import re
-from typing import Any, Generic, TypeVar
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Generic, Optional, TypeVar
 
 from geoalchemy2.shape import to_shape
-from sqlalchemy import BinaryExpression, delete, func, select, update
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import (
+    BinaryExpression,
+    ColumnElement,
+    Select,
+    and_,
+    asc,
+    delete,
+    desc,
+    func,
+    or_,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
 
 from api.models import db_models
+from api.models.models import Cursor
+from api.services.resource_versions import resource_versions
 
-Model = TypeVar("Model", bound=db_models.Base)
+Model = TypeVar("Model", bound=db_models.PlainBase)
+
+# Rows fetched per round trip when streaming rows
+STREAM_BATCH_SIZE = 1000
 
 
 class DatabaseRepository(Generic[Model]):
@@ -26,10 +46,94 @@ class DatabaseRepository(Generic[Model]):
         wkt = to_shape(ewkb).wkt
         return re.sub(r"POINT \(", "POINT(", wkt)
 
+    def _sparse_columns(
+        self, columns: list[Any], fields: Optional[list[str]], *required: str
+    ) -> list[Any]:
+        """Keep only the columns in a sparse fieldset, the id and the required columns.
+
+        Required columns are the ones the resource links or cursors are built from.
+        A geometry column that is left out also leaves out its ST_AsText call."""
+        if fields is None:
+            return columns
+        keep = {"id", *fields, *required}
+        return [column for column in columns if column.key in keep]
+
+    def _paginate(self, stmt: Select, **params: Any) -> tuple[Select, bool]:
+        """Sort and paginate a select, by cursor if one is given and else by offset.
+
+        Rows are sorted by (order_by, id) so that every cursor position is unique, and
+        a cursor becomes a row comparison that an index on (order_by, id) can serve.
+        Returns the statement and whether its rows come in reverse order, which is
+        the case when paging backwards from a cursor."""
+        order_column = getattr(self.model, params.get("order_by", "created_at"))
+        descending = params.get("order_direction") == "desc"
+        cursor = Cursor.decode(params["cursor"]) if params.get("cursor") else None
+
+        backwards = cursor is not None and cursor.before
+        # Query in reverse when paging backwards, the caller flips the rows back
+        reverse = descending != backwards
+        direction = desc if reverse else asc
+        stmt = stmt.order_by(direction(order_column), direction(self.model.id))
+
+        if cursor is None:
+            stmt = stmt.offset(params.get("offset", 0))
+        else:
+            stmt = stmt.where(self._after_cursor(order_column, cursor, reverse))
+        return stmt.limit(params.get("limit", 100)), backwards
+
+    def _sort(self, stmt: Select, **params: Any) -> Select:
+        """Sort a select by (order_by, id) without paginating it."""
+        order_column = getattr(self.model, params.get("order_by", "created_at"))
+        direction = desc if params.get("order_direction") == "desc" else asc
+        return stmt.order_by(direction(order_column), direction(self.model.id))
+
+    async def _stream(self, stmt: Select) -> AsyncResult:
+        """Execute a select on a server-side cursor.
+
+        The rows are fetched STREAM_BATCH_SIZE at a time as the result is iterated, so
+        memory use does not grow with the number of rows. The session has to stay
+        open until the result has been read."""
+        return await self.session.stream(stmt.execution_options(yield_per=STREAM_BATCH_SIZE))
+
+    def _after_cursor(self, order_column: Any, cursor: Cursor, reverse: bool) -> ColumnElement:
+        """Filter for the rows that come after a cursor in the query order.
+
+        Postgres sorts NULLs last ascending and first descending, and row comparisons
+        with NULL are never true, so nullable columns need explicit NULL handling."""
+        value = self._cursor_value(order_column, cursor.value)
+        last_id = cursor.id
+        nullable = self.model.__table__.c[order_column.key].nullable
+
+        if reverse:
+            if value is None:
+                return or_(
+                    and_(order_column.is_(None), self.model.id < last_id),
+                    order_column.is_not(None),
+                )
+            return tuple_(order_column, self.model.id) < tuple_(value, last_id)
+
+        if value is None:
+            return and_(order_column.is_(None), self.model.id > last_id)
+        after = tuple_(order_column, self.model.id) > tuple_(value, last_id)
+        return or_(after, order_column.is_(None)) if nullable else after
+
+    @staticmethod
+    def _cursor_value(order_column: Any, value: Any) -> Any:
+        """Convert a cursor value from JSON back to the python type of its column."""
+        if not isinstance(value, str):
+            return value
+        python_type = order_column.type.python_type
+        if python_type is datetime:
+            return datetime.fromisoformat(value)
+        if python_type is Decimal:
+            return Decimal(value)
+        return value
+
     async def add(self, instance: Model) -> Model:
         """Add a new instance to the database."""
         self.session.add(instance)
         await self.session.commit()
+        resource_versions.bump(self.model.__tablename__)
         await self.session.refresh(instance)
         return instance
 
@@ -59,6 +163,7 @@ class DatabaseRepository(Generic[Model]):
         query = update(self.model).where(self.model.id == pk).values(**data).returning(self.model)
         result = await self.session.execute(query)
         await self.session.commit()
+        resource_versions.bump(self.model.__tablename__)
         return result.scalar_one_or_none()
 
     async def delete(self, pk: int) -> bool:
@@ -66,6 +171,7 @@ class DatabaseRepository(Generic[Model]):
         query = delete(self.model).where(self.model.id == pk)
         result = await self.session.execute(query)
         await self.session.commit()
+        resource_versions.bump(self.model.__tablename__)
         return result.rowcount > 0
 
     async def count(self, *expressions: BinaryExpression) -> int:
@@ -2,14 +2,44 @@
 
 from typing import Any, Optional
 
+from geoalchemy2 import Geography
 from geoalchemy2.functions import ST_AsText
-from sqlalchemy import BinaryExpression, and_, func, select, update
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import (
+    BigInteger,
+    BinaryExpression,
+    Boolean,
+    Float,
+    Integer,
+    Text,
+    and_,
+    cast,
+    column,
+    exists,
+    func,
+    select,
+    text,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
 from sqlalchemy.orm import with_expression
 
+from api.config import settings
 from api.db.repository_base import DatabaseRepository
+from api.db.repository_telemetry import TelemetryRepository
 from api.exceptions import BikeNotFoundException
 from api.models import db_models
+from api.services.fleet_cache import fleet_cache
+from api.services.resource_versions import resource_versions
+from api.services.tile_cache import tile_cache
+from api.services.tiles import WEB_MERCATOR_EXTENT
+
+# Bike fields that are kept in the telemetry history
+TELEMETRY_FIELDS = {"battery_lvl", "last_position"}
+
+# Advisory lock that keeps workers from reconciling the fleet statistics at the same time
+RECONCILE_LOCK_ID = 7_302_017
 
 
 class BikeRepository(DatabaseRepository[db_models.Bike]):
@@ -33,6 +63,19 @@ class BikeRepository(DatabaseRepository[db_models.Bike]):
             ST_AsText(self.model.last_position).label("last_position"),
         ]
 
+    def _get_fleet_columns(self):
+        """Get the columns to select for the fleet cache."""
+        return [
+            self.model.id,
+            self.model.city_id,
+            self.model.battery_lvl,
+            func.ST_X(self.model.last_position).label("lon"),
+            func.ST_Y(self.model.last_position).label("lat"),
+            self.model.is_available,
+            self.model.updated_at,
+            self.model.created_at,
+        ]
+
     def _build_filters(self, **params: dict[str, Any]) -> list[BinaryExpression]:
         """Filter builder for user queries."""
         filter_map = {
@@ -40,6 +83,8 @@ class BikeRepository(DatabaseRepository[db_models.Bike]):
             "city_id": lambda v: self.model.city_id == v,
             "min_battery": lambda v: self.model.battery_lvl > v,
             "max_battery": lambda v: self.model.battery_lvl < v,
+            "battery_gt": lambda v: self.model.battery_lvl > v,
+            "battery_lt": lambda v: self.model.battery_lvl < v,
             "created_at_gt": lambda v: self.model.created_at > v,
             "created_at_lt": lambda v: self.model.created_at < v,
             "updated_at_gt": lambda v: self.model.updated_at > v,
@@ -60,19 +105,174 @@ class BikeRepository(DatabaseRepository[db_models.Bike]):
 
     async def get_bikes(self, **params) -> list[db_models.Bike]:
         """Get bikes with dynamic filters."""
-        stmt = select(*self._get_bike_columns())
+        columns = self._sparse_columns(
+            self._get_bike_columns(),
+            params.get("fields"),
+            "city_id",
+            params.get("order_by", "created_at"),
+        )
+        stmt = select(*columns)
 
         filters = self._build_filters(**params)
         if filters:
             stmt = stmt.where(and_(*filters))
-        order_column = getattr(self.model, params.get("order_by", "created_at"))
-        stmt = stmt.order_by(order_column)
+        stmt, backwards = self._paginate(stmt, **params)
+
+        result = await self.session.execute(stmt)
+        bikes = list(result.mappings().all())
+        return bikes[::-1] if backwards else bikes
+
+    async def export_bikes(self, **params) -> AsyncResult:
+        """Get a streamed result of the columns of all bikes matching dynamic filters,
+        sorted but not paginated."""
+        columns = self._sparse_columns(self._get_bike_columns(), params.get("fields"))
+        stmt = select(*columns).where(*self._build_filters(**params))
+        return await self._stream(self._sort(stmt, **params))
+
+    async def get_nearby_bikes(self, point: str, k: int, max_distance_m: float) -> list[Any]:
+        """Get the k available bikes nearest to a WKT point, within max_distance_m meters.
+
+        Positions are compared as geography, where <-> and ST_DWithin measure meters.
+        The partial GiST index on last_position::geography serves both, so the index
+        scan returns the bikes in distance order and stops after k of them."""
+        target = func.ST_GeogFromText(point)
+        position = cast(self.model.last_position, Geography(geometry_type=None))
+        distance = position.op("<->", return_type=Float)(target)
 
-        stmt = stmt.offset(params.get("offset", 0)).limit(params.get("limit", 100))
+        stmt = (
+            select(*self._get_bike_columns(), distance.label("distance_m"))
+            .where(*self._build_filters(is_available=True))
+            .where(func.ST_DWithin(position, target, max_distance_m))
+            .order_by(distance)
+            .limit(k)
+        )
 
         result = await self.session.execute(stmt)
         return list(result.mappings().all())
 
+    async def get_bike_tile(self, z: int, x: int, y: int) -> bytes:
+        """Get the available bikes in a z/x/y tile as a "bikes" Mapbox Vector Tile layer.
+
+        Bikes are stored in EPSG:4326, so the && check against the tile envelope is
+        done in 4326 where the GiST index on last_position can serve it."""
+        envelope = func.ST_TileEnvelope(z, x, y)
+        position = func.ST_Transform(self.model.last_position, 3857)
+        tile = (
+            select(
+                self.model.id,
+                self.model.city_id,
+                self.model.battery_lvl,
+                func.ST_AsMVTGeom(position, envelope).label("geom"),
+            )
+            .where(*self._build_filters(is_available=True))
+            .where(self.model.last_position.op("&&")(func.ST_Transform(envelope, 4326)))
+            .subquery("tile")
+        )
+        stmt = select(func.ST_AsMVT(tile.table_valued(), "bikes", 4096, "geom"))
+
+        result = await self.session.scalar(stmt)
+        return bytes(result or b"")
+
+    async def get_bike_clusters(
+        self, cell_zoom: int, bounds: tuple[float, float, float, float]
+    ) -> list[Any]:
+        """Count the available bikes per grid cell inside (min_lon, min_lat, max_lon, max_lat)
+        bounds, with their average battery level and mean position.
+
+        The cells are the tiles at cell_zoom. A bike's cell is found from its Web Mercator
+        position, so cell_x and cell_y are the tile x and y of the cell."""
+        cell_size = 2 * WEB_MERCATOR_EXTENT / 2**cell_zoom
+        position = func.ST_Transform(self.model.last_position, 3857)
+        cell_x = func.floor((func.ST_X(position) + WEB_MERCATOR_EXTENT) / cell_size)
+        cell_y = func.floor((WEB_MERCATOR_EXTENT - func.ST_Y(position)) / cell_size)
+
+        # pylint: disable=not-callable
+        stmt = (
+            select(
+                cell_x.label("cell_x"),
+                cell_y.label("cell_y"),
+                func.count().label("count"),
+                func.avg(self.model.battery_lvl).label("avg_battery"),
+                func.avg(func.ST_X(self.model.last_position)).label("lon"),
+                func.avg(func.ST_Y(self.model.last_position)).label("lat"),
+            )
+            .where(*self._build_filters(is_available=True))
+            .where(self.model.last_position.op("&&")(func.ST_MakeEnvelope(*bounds, 4326)))
+            .group_by(cell_x, cell_y)
+        )
+
+        result = await self.session.execute(stmt)
+        return list(result.all())
+
+    async def get_fleet_state(self) -> list[Any]:
+        """Get the compact state of all non-deleted bikes for the fleet cache."""
+        stmt = select(*self._get_fleet_columns()).where(self.model.deleted_at.is_(None))
+        result = await self.session.execute(stmt)
+        return list(result.all())
+
+    async def get_fleet_stats(self, city_id: Optional[int] = None) -> list[Any]:
+        """Get the non-zero fleet statistics counters, of a city or of every city."""
+        counter = db_models.FleetStats
+        stmt = select(counter.city_id, counter.status, counter.battery_bucket, counter.bikes).where(
+            counter.bikes != 0
+        )
+        if city_id is not None:
+            stmt = stmt.where(counter.city_id == city_id)
+
+        result = await self.session.execute(stmt)
+        return list(result.all())
+
+    async def reconcile_fleet_stats(self) -> Optional[int]:
+        """Recount the fleet statistics counters from the bikes and trips tables.
+
+        The counters are locked while they are recounted, which makes bike writes wait.
+        Returns the number of counters that were off, or None if another worker is
+        reconciling."""
+        counter, member = db_models.FleetStats, db_models.FleetStatsMember
+        # pylint: disable=not-callable
+        if not await self.session.scalar(select(func.pg_try_advisory_xact_lock(RECONCILE_LOCK_ID))):
+            return None
+
+        await self.session.execute(text("LOCK TABLE fleet_stats IN SHARE ROW EXCLUSIVE MODE"))
+        await self.session.execute(
+            text(
+                "SELECT refresh_fleet_stats("
+                "ARRAY(SELECT id FROM bikes UNION SELECT bike_id FROM fleet_stats_members))"
+            )
+        )
+
+        counts = select(
+            member.city_id, member.status, member.battery_bucket, func.count().label("bikes")
+        ).group_by(member.city_id, member.status, member.battery_bucket)
+        recount = insert(counter).from_select(
+            ["city_id", "status", "battery_bucket", "bikes"], counts
+        )
+        recount = recount.on_conflict_do_update(
+            index_elements=[counter.city_id, counter.status, counter.battery_bucket],
+            set_={"bikes": recount.excluded.bikes, "updated_at": func.now()},
+            where=counter.bikes != recount.excluded.bikes,
+        ).returning(counter.city_id)
+        corrected = len((await self.session.execute(recount)).all())
+
+        # Counters that no bike is counted in any more
+        emptied = await self.session.execute(
+            update(counter)
+            .where(counter.bikes != 0)
+            .where(
+                ~exists().where(
+                    member.city_id == counter.city_id,
+                    member.status == counter.status,
+                    member.battery_bucket == counter.battery_bucket,
+                )
+            )
+            .values(bikes=0)
+            .returning(counter.city_id)
+        )
+        corrected += len(emptied.all())
+
+        await self.session.commit()
+        return corrected
+
     async def add_bike(self, bike_data: dict[str, Any]) -> db_models.Bike:
         """Add a new bike to the database.
         TODO: Use WKT transformation like in update_bike"""
@@ -81,7 +281,11 @@ class BikeRepository(DatabaseRepository[db_models.Bike]):
         await self.session.commit()
         await self.session.refresh(db_bike)
 
-        db_bike.last_position = self._ewkb_to_wkt(db_bike.last_position)
+        if db_bike.last_position is not None:
+            db_bike.last_position = self._ewkb_to_wkt(db_bike.last_position)
+        fleet_cache.upsert(db_bike)
+        tile_cache.invalidate("bikes")
+        resource_versions.bump("bikes")
         return db_bike
 
     async def update_bike(self, pk: int, data: dict[str, Any]) -> Optional[db_models.Bike]:
@@ -102,8 +306,93 @@ class BikeRepository(DatabaseRepository[db_models.Bike]):
         )
 
         result = await self.session.execute(query)
+        updated_bike = result.mappings().first()
+        if settings.bike_telemetry_history and TELEMETRY_FIELDS & data.keys():
+            await TelemetryRepository(self.session).record(
+                [
+                    {
+                        "bike_id": pk,
+                        "battery_lvl": updated_bike["battery_lvl"],
+                        "last_position": updated_bike["last_position"],
+                    }
+                ]
+            )
         await self.session.commit()
-        return result.mappings().first()
+        fleet_cache.upsert(updated_bike)
+        tile_cache.invalidate("bikes")
+        resource_versions.bump("bikes")
+        return updated_bike
+
+    async def update_bikes_bulk(self, reports: list[dict[str, Any]]) -> set[int]:
+        """Update many bikes with a single UPDATE ... FROM (VALUES ...) statement.
+
+        Fields missing from a report keep their current value. If a bike is reported
+        more than once, the last report wins. Returns the ids of the updated bikes."""
+        latest_reports = {report["bike_id"]: report for report in reports}
+        rows = values(
+            column("bike_id", BigInteger),
+            column("battery_lvl", Integer),
+            column("last_position", Text),
+            column("city_id", Integer),
+            column("is_available", Boolean),
+            column("meta_data", JSONB(none_as_null=True)),
+            name="reports",
+        ).data(
+            [
+                (
+                    bike_id,
+                    report.get("battery_lvl"),
+                    report.get("last_position"),
+                    report.get("city_id"),
+                    report.get("is_available"),
+                    report.get("meta_data"),
+                )
+                for bike_id, report in latest_reports.items()
+            ]
+        )
+
+        stmt = (
+            update(self.model)
+            .where(self.model.id == rows.c.bike_id)
+            .where(self.model.deleted_at.is_(None))
+            # A column that is NULL in every row is typed as text by Postgres, hence the casts
+            .values(
+                battery_lvl=func.coalesce(
+                    cast(rows.c.battery_lvl, Integer), self.model.battery_lvl
+                ),
+                last_position=func.coalesce(
+                    func.ST_GeomFromText(cast(rows.c.last_position, Text), 4326),
+                    self.model.last_position,
+                ),
+                city_id=func.coalesce(cast(rows.c.city_id, Integer), self.model.city_id),
+                is_available=func.coalesce(
+                    cast(rows.c.is_available, Boolean), self.model.is_available
+                ),
+                meta_data=func.coalesce(cast(rows.c.meta_data, JSONB), self.model.meta_data),
+            )
+            .returning(*self._get_fleet_columns())
+        )
+
+        result = await self.session.execute(stmt)
+        updated_bikes = result.all()
+        if settings.bike_telemetry_history:
+            await TelemetryRepository(self.session).record(
+                [
+                    {
+                        "bike_id": bike.id,
+                        "battery_lvl": bike.battery_lvl,
+                        "last_position": (
+                            f"POINT({bike.lon} {bike.lat})" if bike.lon is not None else None
+                        ),
+                    }
+                    for bike in updated_bikes
+                ]
+            )
+        await self.session.commit()
+        fleet_cache.upsert_many(updated_bikes)
+        tile_cache.invalidate("bikes")
+        resource_versions.bump("bikes")
+        return {bike.id for bike in updated_bikes}
 
     async def get_bike(self, pk: int) -> Optional[db_models.Bike]:
         """Get a bike by ID."""
@@ -124,13 +413,14 @@ class BikeRepository(DatabaseRepository[db_models.Bike]):
     async def get_bikes_in_zone(
         self, zone_type_id: int, city_id: int
     ) -> list[tuple[db_models.Bike, int]]:
-        """Get bikes in a given zone and city."""
+        """Get bikes in a given zone and city.
+
+        Zone membership is kept in bike_map_zones, so this is an indexed lookup
+        instead of a point-in-polygon join."""
         stmt = (
-            select(self.model, db_models.MapZone.id.label("map_zone_id"))
-            .join(
-                db_models.MapZone,
-                func.ST_Contains(db_models.MapZone.boundary, self.model.last_position),  # noqa: F821
-            )
+            select(self.model, db_models.BikeMapZone.map_zone_id)
+            .join(db_models.BikeMapZone, db_models.BikeMapZone.bike_id == self.model.id)
+            .join(db_models.MapZone, db_models.MapZone.id == db_models.BikeMapZone.map_zone_id)
             .options(with_expression(self.model.last_position, ST_AsText(self.model.last_position)))  # noqa: F821
             .where(db_models.MapZone.zone_type_id == zone_type_id)
             .where(self.model.city_id == city_id)
@@ -161,4 +451,7 @@ class BikeRepository(DatabaseRepository[db_models.Bike]):
             raise BikeNotFoundException(f"Bike with ID {bike_id} not found")
 
         await self.session.commit()
+        fleet_cache.remove(bike_id)
+        tile_cache.invalidate("bikes")
+        resource_versions.bump("bikes")
         return
@@ -0,0 +1,247 @@
+"""Repository module for the bike telemetry history.
+
+Every bike report adds a row with the state of the bike to bike_telemetry. The rows
+are rolled up incrementally into bike_telemetry_1m and bike_telemetry_1h, and the
+history is read from the coarsest of these tables that the requested resolution
+allows, so that long ranges do not read every report.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from geoalchemy2 import WKTElement
+from geoalchemy2.functions import ST_AsText
+from sqlalchemy import Integer, Select, func, literal, select, text, union_all
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array_agg, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.db.repository_base import DatabaseRepository
+from api.models import db_models
+
+# Rollup tables from the finest to the coarsest, with the date_trunc unit and size
+# of their buckets
+ROLLUPS = [
+    ("minute", timedelta(minutes=1), db_models.BikeTelemetryMinute),
+    ("hour", timedelta(hours=1), db_models.BikeTelemetryHour),
+]
+
+# Tables that are partitioned by month
+PARTITIONED_TABLES = [db_models.BikeTelemetry, db_models.BikeTelemetryMinute]
+
+# Months after the current one that partitions are created for
+PARTITION_MONTHS_AHEAD = 2
+
+# Advisory lock that keeps workers from rolling up at the same time
+ROLLUP_LOCK_ID = 7_302_015
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def month_start(moment: datetime, months: int = 0) -> datetime:
+    """Get the start of the UTC month that is months after the month of a moment."""
+    moment = moment.astimezone(timezone.utc)
+    index = moment.year * 12 + moment.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+class TelemetryRepository(DatabaseRepository[db_models.BikeTelemetry]):
+    """Repository for the bike telemetry history and its rollups."""
+
+    def __init__(self, session: AsyncSession) -> None:
+        """Initialize the repository with the BikeTelemetry model."""
+        super().__init__(db_models.BikeTelemetry, session)
+
+    def _samples(
+        self,
+        model: type[db_models.PlainBase],
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        bike_id: Optional[int] = None,
+    ) -> Select:
+        """Select the rows of a telemetry table between start and end as rollup rows.
+
+        A report is a rollup row of one sample, so reports and rollups can be rolled
+        up further with the same aggregates."""
+        if model is self.model:
+            time = model.created_at
+            columns = [
+                literal(1, Integer).label("samples"),
+                model.battery_lvl.label("battery_sum"),
+                model.battery_lvl.label("battery_min"),
+                model.battery_lvl.label("battery_max"),
+                model.last_position,
+                model.created_at.label("last_reported_at"),
+            ]
+        else:
+            time = model.bucket
+            columns = [
+                model.samples,
+                model.battery_sum,
+                model.battery_min,
+                model.battery_max,
+                model.last_position,
+                model.last_reported_at,
+            ]
+
+        stmt = select(model.bike_id, time.label("time"), *columns)
+        if start is not None:
+            stmt = stmt.where(time >= start)
+        if end is not None:
+            stmt = stmt.where(time < end)
+        if bike_id is not None:
+            stmt = stmt.where(model.bike_id == bike_id)
+        return stmt
+
+    def _aggregates(self, samples: Any) -> list[Any]:
+        """Get the aggregates that roll rollup rows up into a bucket."""
+        # pylint: disable=not-callable
+        return [
+            func.sum(samples.c.samples).label("samples"),
+            func.sum(samples.c.battery_sum).label("battery_sum"),
+            func.min(samples.c.battery_min).label("battery_min"),
+            func.max(samples.c.battery_max).label("battery_max"),
+            # The latest known position, rows without a position sort last
+            array_agg(
+                aggregate_order_by(
+                    samples.c.last_position,
+                    samples.c.last_position.is_(None),
+                    samples.c.last_reported_at.desc(),
+                )
+            )[1].label("last_position"),
+            func.max(samples.c.last_reported_at).label("last_reported_at"),
+        ]
+
+    async def record(self, states: list[dict[str, Any]]) -> None:
+        """Add bike states to the history in one statement, without committing.
+
+        States need bike_id, battery_lvl and last_position as WKT. A bike gets one row
+        per transaction, since rows are keyed on the transaction time."""
+        rows = {
+            state["bike_id"]: {
+                "bike_id": state["bike_id"],
+                "battery_lvl": state["battery_lvl"],
+                "last_position": (
+                    WKTElement(state["last_position"], srid=4326)
+                    if state["last_position"]
+                    else None
+                ),
+            }
+            for state in states
+        }
+        if rows:
+            await self.session.execute(
+                insert(self.model).on_conflict_do_nothing(), list(rows.values())
+            )
+
+    async def ensure_partitions(self, now: datetime) -> None:
+        """Create the monthly partitions from the month of now to PARTITION_MONTHS_AHEAD
+        months ahead.
+
+        There is no default partition, since a partition of a month cannot be created
+        once the default partition holds rows of that month. The months ahead are the
+        margin for a month change while the partitions are not being created."""
+        for model in PARTITIONED_TABLES:
+            table = model.__tablename__
+            for months in range(PARTITION_MONTHS_AHEAD + 1):
+                start, end = month_start(now, months), month_start(now, months + 1)
+                await self.session.execute(
+                    text(
+                        f"CREATE TABLE IF NOT EXISTS {table}_{start:%Y%m} PARTITION OF {table} "
+                        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                    )
+                )
+        await self.session.commit()
+
+    async def roll_up(self) -> bool:
+        """Roll the history up into every rollup table, from the finest to the coarsest.
+
+        A rollup recomputes its buckets from one bucket before its last one, which
+        completes the last bucket and picks up rows that were committed late. Returns
+        False if another worker is rolling up."""
+        # pylint: disable=not-callable
+        if not await self.session.scalar(select(func.pg_try_advisory_xact_lock(ROLLUP_LOCK_ID))):
+            return False
+
+        source = self.model
+        for unit, size, rollup in ROLLUPS:
+            last_bucket = await self.session.scalar(select(func.max(rollup.bucket)))
+            samples = self._samples(
+                source, start=last_bucket - size if last_bucket else None
+            ).subquery("samples")
+            bucket = func.date_trunc(unit, samples.c.time, "UTC")
+            aggregates = self._aggregates(samples)
+
+            stmt = insert(rollup).from_select(
+                ["bike_id", "bucket", *(aggregate.name for aggregate in aggregates)],
+                select(samples.c.bike_id, bucket, *aggregates).group_by(samples.c.bike_id, bucket),
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[rollup.bike_id, rollup.bucket],
+                set_={aggregate.name: stmt.excluded[aggregate.name] for aggregate in aggregates},
+            )
+            await self.session.execute(stmt)
+            source = rollup
+
+        await self.session.commit()
+        return True
+
+    async def get_history(
+        self, bike_id: int, start: datetime, end: datetime, step: Optional[timedelta], limit: int
+    ) -> tuple[str, list[Any]]:
+        """Get the telemetry of a bike from start to end in step long buckets, or every
+        report if step is None.
+
+        Buckets are read from the coarsest rollup whose bucket size divides the step.
+        A rollup is only complete up to its last bucket, so that bucket and later ones
+        are rolled up from the reports. Returns the table that was read and the rows."""
+        source = self.model
+        if step is None:
+            stmt = (
+                self._samples(self.model, start, end, bike_id)
+                .order_by(self.model.created_at)
+                .limit(limit)
+            )
+        else:
+            start = start - (start - EPOCH) % step
+            rollup = next(
+                (rollup for _, size, rollup in reversed(ROLLUPS) if step % size == timedelta(0)),
+                None,
+            )
+            last_bucket = (
+                await self.session.scalar(select(func.max(rollup.bucket)))
+                if rollup is not None
+                else None
+            )
+            if last_bucket is None or last_bucket <= start:
+                parts = [self._samples(self.model, start, end, bike_id)]
+            else:
+                source = rollup
+                parts = [
+                    self._samples(rollup, start, min(end, last_bucket), bike_id),
+                    self._samples(self.model, last_bucket, end, bike_id),
+                ]
+
+            samples = union_all(*parts).subquery("samples")
+            seconds = step.total_seconds()
+            bucket = func.to_timestamp(
+                func.floor(func.extract("epoch", samples.c.time) / seconds) * seconds
+            )
+            stmt = (
+                select(bucket.label("time"), *self._aggregates(samples))
+                .group_by(bucket)
+                .order_by(bucket)
+                .limit(limit)
+            )
+
+        history = stmt.subquery("history")
+        result = await self.session.execute(
+            select(
+                history.c.time,
+                history.c.samples,
+                history.c.battery_sum,
+                history.c.battery_min,
+                history.c.battery_max,
+                ST_AsText(history.c.last_position).label("last_position"),
+            ).order_by(history.c.time)
+        )
+        return source.__tablename__, list(result.all())
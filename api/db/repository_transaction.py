@@ -2,8 +2,8 @@
 
 from typing import Any
 
-from sqlalchemy import BinaryExpression, and_, asc, desc, select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import BinaryExpression, and_, select
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
 from sqlalchemy.sql.expression import update
 
 from api.db.repository_base import DatabaseRepository
@@ -45,15 +45,17 @@ class TransactionRepository(DatabaseRepository[db_models.Transaction]):
         if filters:
             stmt = stmt.where(and_(*filters))  # Use filters, not params
 
-        order_column = getattr(self.model, params.get("order_by", "created_at"))
-        stmt = stmt.order_by(
-            desc(order_column) if params.get("order_direction") == "desc" else asc(order_column)
-        )
-
-        stmt = stmt.offset(params.get("offset", 0)).limit(params.get("limit", 100))
+        stmt, backwards = self._paginate(stmt, **params)
 
         result = await self.session.execute(stmt)
-        return list(result.scalars().unique())
+        transactions = list(result.scalars().unique())
+        return transactions[::-1] if backwards else transactions
+
+    async def export_transactions(self, **params: dict[str, Any]) -> AsyncResult:
+        """Get a streamed result of the columns of all transactions matching filters,
+        sorted but not paginated."""
+        stmt = select(*self.model.__table__.columns).where(*self._build_filters(**params))
+        return await self._stream(self._sort(stmt, **params))
 
     async def get_user_transactions(self, user_id: int) -> list[db_models.Transaction]:
         """Get all transactions for a user."""
@@ -1,13 +1,14 @@
 """Repository module for database operations."""
 
 import decimal
+from collections.abc import AsyncIterator
 from datetime import datetime
 from typing import Any, Optional
 
 from geoalchemy2.functions import ST_AsText
 from sqlalchemy import BinaryExpression, and_, insert, select, update
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
 
 from api.db.repository_base import DatabaseRepository
 from api.exceptions import (
@@ -18,6 +19,9 @@ from api.exceptions import (
 )
 from api.models import db_models
 from api.models.trip_models import TripCreate, TripEndRepoParams
+from api.services.fleet_cache import fleet_cache
+from api.services.resource_versions import resource_versions
+from api.services.tile_cache import tile_cache
 
 
 class TripRepository(DatabaseRepository[db_models.Trip]):
@@ -70,16 +74,52 @@ class TripRepository(DatabaseRepository[db_models.Trip]):
             if key in filter_map and value is not None
         ]
 
+    def _get_sparse_trip_columns(self, **params):
+        """Get the columns to select for a sparse fieldset of trips."""
+        return self._sparse_columns(
+            self._get_trip_columns(),
+            params.get("fields"),
+            "user_id",
+            "bike_id",
+            params.get("order_by", "created_at"),
+        )
+
     async def get_trips(self, **params) -> list[db_models.Trip]:
-        """Get trip with dynamic filters."""
-        stmt = select(*self._get_trip_columns())
+        """Get a page of trips with dynamic filters, by cursor or offset."""
+        stmt = select(*self._get_sparse_trip_columns(**params))
 
         filters = self._build_filters(**params)
         if filters:
             stmt = stmt.where(and_(*filters))
 
+        stmt, backwards = self._paginate(stmt, **params)
+
         result = await self.session.execute(stmt)
-        return list(result.mappings().all())
+        trips = list(result.mappings().all())
+        return trips[::-1] if backwards else trips
+
+    async def stream_trips(self, **params) -> AsyncIterator[Any]:
+        """Stream all trips matching dynamic filters, sorted but not paginated.
+
+        Rows are fetched in batches from a server-side cursor, so memory use does not
+        grow with the number of trips."""
+        stmt = select(*self._get_sparse_trip_columns(**params))
+
+        filters = self._build_filters(**params)
+        if filters:
+            stmt = stmt.where(and_(*filters))
+
+        result = await self._stream(self._sort(stmt, **params))
+        async for trip in result.mappings():
+            yield trip
+
+    async def export_trips(self, **params) -> AsyncResult:
+        """Get a streamed result of the columns of all trips matching dynamic filters,
+        sorted but not paginated."""
+        stmt = select(*self._get_sparse_trip_columns(**params)).where(
+            *self._build_filters(**params)
+        )
+        return await self._stream(self._sort(stmt, **params))
 
     async def get_trip(self, pk: int) -> Optional[db_models.Trip]:
         """Get a trip by ID."""
@@ -105,6 +145,9 @@ class TripRepository(DatabaseRepository[db_models.Trip]):
             )
 
             await self.session.commit()
+            fleet_cache.update(trip_data.bike_id, is_available=False)
+            tile_cache.invalidate("bikes")
+            resource_versions.bump("bikes")
             return result.mappings().one()
         except IntegrityError as e:
             await self.session.rollback()
@@ -195,4 +238,8 @@ class TripRepository(DatabaseRepository[db_models.Trip]):
                 )
 
             await self.session.commit()
+            if is_available:
+                fleet_cache.update(trip.bike_id, is_available=True)
+                tile_cache.invalidate("bikes")
+                resource_versions.bump("bikes")
             return updated_trip
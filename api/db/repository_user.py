@@ -2,9 +2,9 @@
 
 from typing import Any, Optional
 
-from sqlalchemy import BinaryExpression, and_, asc, desc, func, or_, select, update
+from sqlalchemy import BinaryExpression, and_, func, or_, select, update
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
 from sqlalchemy.orm import joinedload, selectinload
 
 from api.db.repository_base import DatabaseRepository
@@ -93,17 +93,18 @@ class UserRepository(DatabaseRepository[db_models.User]):
         if filters:
             stmt = stmt.where(and_(*filters))
 
-        order_column = getattr(self.model, params.get("order_by", "created_at"))
-        stmt = stmt.order_by(
-            desc(order_column) if params.get("order_direction") == "desc" else asc(order_column)
-        )
-
-        stmt = stmt.offset(params.get("offset", 0)).limit(params.get("limit", 100))
+        stmt, backwards = self._paginate(stmt, **params)
 
         result = await self.session.execute(stmt)
         users = list(result.unique().scalars())
 
-        return users
+        return users[::-1] if backwards else users
+
+    async def export_users(self, **params) -> AsyncResult:
+        """Get a streamed result of the columns of all users matching filters, sorted
+        but not paginated."""
+        stmt = select(*self.model.__table__.columns).where(*self._build_filters(**params))
+        return await self._stream(self._sort(stmt, **params))
 
     async def get_user(self, user_id: int) -> db_models.User:
         """Get a user by ID with relationships eagerly loaded."""
@@ -3,7 +3,7 @@
 from typing import Any, Optional
 
 from geoalchemy2.functions import ST_AsText
-from sqlalchemy import BinaryExpression, and_, asc, desc, func, select, update
+from sqlalchemy import BinaryExpression, and_, func, select, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload, with_expression
@@ -15,6 +15,9 @@ from api.exceptions import (
     ZoneTypeNotFoundException,
 )
 from api.models import db_models
+from api.services.resource_versions import resource_versions
+from api.services.tile_cache import tile_cache
+from api.services.zone_index import zone_index
 
 
 class ZoneTypeRepository(DatabaseRepository[db_models.ZoneType]):
@@ -36,6 +39,7 @@ class ZoneTypeRepository(DatabaseRepository[db_models.ZoneType]):
             zone_type = db_models.ZoneType(**zone_type_data)
             self.session.add(zone_type)
             await self.session.commit()
+            resource_versions.bump("zone_types")
 
             await self.session.refresh(zone_type)
             return zone_type
@@ -67,6 +71,9 @@ class ZoneTypeRepository(DatabaseRepository[db_models.ZoneType]):
             if not updated_zone:
                 raise ZoneTypeNotFoundException(f"Zone type with ID {zone_type_id} not found.")
 
+            tile_cache.invalidate("zones")
+            resource_versions.bump("zone_types")
+            await MapZoneRepository(self.session).rebuild_zone_index()
             return updated_zone
 
         except IntegrityError as e:
@@ -92,6 +99,9 @@ class ZoneTypeRepository(DatabaseRepository[db_models.ZoneType]):
         if not deleted_zone:
             raise ZoneTypeNotFoundException(f"Zone type with ID {zone_type_id} not found.")
         await self.session.commit()
+        tile_cache.invalidate("zones")
+        resource_versions.bump("zone_types")
+        await MapZoneRepository(self.session).rebuild_zone_index()
         return deleted_zone
 
 
@@ -134,21 +144,82 @@ class MapZoneRepository(DatabaseRepository[db_models.MapZone]):
 
     async def get_map_zones(self, **params: dict[str, Any]) -> list[db_models.MapZone]:
         """Get all map zones from the database."""
-        stmt = select(*self._get_map_zone_columns())
+        columns = self._sparse_columns(
+            self._get_map_zone_columns(), params.get("fields"), params.get("order_by", "city_id")
+        )
+        stmt = select(*columns)
 
         filters = self._build_filters(**params)
         if filters:
             stmt = stmt.where(and_(*filters))
 
-        order_column = getattr(self.model, params.get("order_by", "created_at"))
-        stmt = stmt.order_by(
-            desc(order_column) if params.get("order_direction") == "desc" else asc(order_column)
+        stmt, backwards = self._paginate(stmt, **params)
+
+        result = await self.session.execute(stmt)
+        zones = list(result.mappings().all())
+        return zones[::-1] if backwards else zones
+
+    async def get_map_zone_tile(self, z: int, x: int, y: int) -> bytes:
+        """Get the map zones in a z/x/y tile as Mapbox Vector Tile layers, one layer
+        per zone type named zones_<type_name>.
+
+        Tiles with layers of the same extent can be concatenated, so every zone type
+        is encoded by its own ST_AsMVT aggregate and the results are joined."""
+        envelope = func.ST_TileEnvelope(z, x, y)
+        boundary = func.ST_Transform(self.model.boundary, 3857)
+        tile = (
+            select(
+                self.model.id,
+                self.model.zone_name,
+                self.model.city_id,
+                self.model.zone_type_id,
+                db_models.ZoneType.type_name,
+                func.ST_AsMVTGeom(boundary, envelope).label("geom"),
+            )
+            .join(db_models.ZoneType, db_models.ZoneType.id == self.model.zone_type_id)
+            .where(db_models.ZoneType.deleted_at.is_(None))
+            .where(self.model.boundary.op("&&")(func.ST_Transform(envelope, 4326)))
+            .subquery("tile")
+        )
+        stmt = (
+            select(
+                func.ST_AsMVT(
+                    tile.table_valued(), func.concat("zones_", tile.c.type_name), 4096, "geom"
+                )
+            )
+            .group_by(tile.c.type_name)
+            .order_by(tile.c.type_name)
         )
 
-        stmt = stmt.offset(params.get("offset", 0)).limit(params.get("limit", 100))
+        result = await self.session.scalars(stmt)
+        return b"".join(bytes(layer) for layer in result if layer)
 
+    async def get_indexed_zones(self) -> list[Any]:
+        """Get every map zone of a zone type that is not deleted, with its zone type and
+        its boundary as WKT, for the zone index."""
+        zone_type = db_models.ZoneType
+        stmt = (
+            select(
+                self.model.id,
+                self.model.zone_name,
+                self.model.city_id,
+                self.model.zone_type_id,
+                zone_type.type_name,
+                zone_type.speed_limit,
+                zone_type.start_fee,
+                zone_type.end_fee,
+                ST_AsText(self.model.boundary).label("boundary"),
+            )
+            .join(zone_type, zone_type.id == self.model.zone_type_id)
+            .where(zone_type.deleted_at.is_(None))
+            .order_by(self.model.id)
+        )
         result = await self.session.execute(stmt)
-        return list(result.mappings().all())
+        return list(result.all())
+
+    async def rebuild_zone_index(self) -> None:
+        """Reload the zone index from the database."""
+        zone_index.load(await self.get_indexed_zones())
 
     async def get_map_zone(self, pk: int) -> Optional[db_models.MapZone]:
         """Get a map zone by ID with relationships."""
@@ -179,6 +250,9 @@ class MapZoneRepository(DatabaseRepository[db_models.MapZone]):
 
             await self.session.refresh(map_zone)
             map_zone.boundary = self._ewkb_to_wkt(map_zone.boundary)
+            tile_cache.invalidate("zones")
+            resource_versions.bump("map_zones")
+            await self.rebuild_zone_index()
             return map_zone
         except IntegrityError:
             await self.session.rollback()
@@ -201,6 +275,9 @@ class MapZoneRepository(DatabaseRepository[db_models.MapZone]):
             if not updated_zone:
                 raise MapZoneNotFoundException(f"Map zone with ID {pk} not found.")
 
+            tile_cache.invalidate("zones")
+            resource_versions.bump("map_zones")
+            await self.rebuild_zone_index()
             return updated_zone
 
         except IntegrityError:
@@ -218,5 +295,8 @@ class MapZoneRepository(DatabaseRepository[db_models.MapZone]):
 
         await self.session.delete(zone)
         await self.session.commit()
+        tile_cache.invalidate("zones")
+        resource_versions.bump("map_zones")
+        await self.rebuild_zone_index()
 
         return
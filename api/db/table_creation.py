@@ -4,6 +4,20 @@ from sqlalchemy import text
 
 from api.config import settings
 from api.db.database import sessionmanager
+from api.db.triggers import (
+    CREATE_BIKE_CHANGE_FUNCTION,
+    CREATE_BIKE_CHANGE_TRIGGER,
+    CREATE_BIKE_MAP_ZONES_FUNCTION,
+    CREATE_BIKE_MAP_ZONES_TRIGGER,
+    CREATE_FLEET_STATS_FUNCTION,
+    CREATE_FLEET_STATS_TRIGGER_FUNCTIONS,
+    CREATE_FLEET_STATS_TRIGGERS,
+    CREATE_MAP_ZONE_BIKES_FUNCTION,
+    CREATE_MAP_ZONE_BIKES_TRIGGER,
+    CREATE_RESOURCE_VERSION_FUNCTION,
+    CREATE_RESOURCE_VERSION_TRIGGERS,
+    CREATE_RESOURCE_VERSIONS_SEQUENCE,
+)
 from api.models.db_models import Base
 
 
@@ -26,6 +40,27 @@ async def load_tables():
             """)
         )
 
+        # NOTIFY the API of changes to bikes, also when made outside the API
+        await conn.execute(text(CREATE_BIKE_CHANGE_FUNCTION))
+        await conn.execute(text(CREATE_BIKE_CHANGE_TRIGGER))
+
+        # Keep bike_map_zones up to date when bikes move or zone boundaries change
+        await conn.execute(text(CREATE_BIKE_MAP_ZONES_FUNCTION))
+        await conn.execute(text(CREATE_BIKE_MAP_ZONES_TRIGGER))
+        await conn.execute(text(CREATE_MAP_ZONE_BIKES_FUNCTION))
+        await conn.execute(text(CREATE_MAP_ZONE_BIKES_TRIGGER))
+
+        # Keep the fleet statistics counters up to date when bikes or trips change
+        await conn.execute(text(CREATE_FLEET_STATS_FUNCTION))
+        for statement in CREATE_FLEET_STATS_TRIGGER_FUNCTIONS + CREATE_FLEET_STATS_TRIGGERS:
+            await conn.execute(text(statement))
+
+        # NOTIFY the API of a new version of the read-mostly tables on every write
+        await conn.execute(text(CREATE_RESOURCE_VERSIONS_SEQUENCE))
+        await conn.execute(text(CREATE_RESOURCE_VERSION_FUNCTION))
+        for statement in CREATE_RESOURCE_VERSION_TRIGGERS:
+            await conn.execute(text(statement))
+
 
 async def main():
     """Main function to init the session manager and load the tables."""
@@ -0,0 +1,248 @@
+"""Module for the database triggers of the API
+
+The triggers run for every change, so changes made outside the API, like admin SQL
+or batch jobs, are covered too. They are created by table_creation and by the
+alembic migrations.
+"""
+
+# The bikes table NOTIFYs the bike_changes channel of every change. A change record
+# is a JSON object with the op, the bike id, the changed columns and the current
+# city, battery, availability, deletion and position of the bike. Updates that
+# change nothing but updated_at are not sent.
+BIKE_CHANGES_CHANNEL = "bike_changes"
+
+CREATE_BIKE_CHANGE_FUNCTION = f"""
+    CREATE OR REPLACE FUNCTION notify_bike_change() RETURNS trigger AS $$
+    DECLARE
+        bike bikes;
+        changed text[];
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            bike := OLD;
+        ELSE
+            bike := NEW;
+            SELECT array_agg(new.key ORDER BY new.key) INTO changed
+            FROM jsonb_each(to_jsonb(NEW)) AS new
+            WHERE new.key NOT IN ('created_at', 'updated_at')
+                AND (TG_OP = 'INSERT' OR new.value IS DISTINCT FROM to_jsonb(OLD) -> new.key);
+            IF changed IS NULL AND TG_OP = 'UPDATE' THEN
+                RETURN NULL;
+            END IF;
+        END IF;
+
+        PERFORM pg_notify(
+            '{BIKE_CHANGES_CHANNEL}',
+            json_build_object(
+                'op', lower(TG_OP),
+                'id', bike.id,
+                'changed', coalesce(changed, ARRAY[]::text[]),
+                'city_id', bike.city_id,
+                'battery_lvl', bike.battery_lvl,
+                'is_available', bike.is_available,
+                'deleted', bike.deleted_at IS NOT NULL,
+                'lon', ST_X(bike.last_position),
+                'lat', ST_Y(bike.last_position),
+                'updated_at', bike.updated_at
+            )::text
+        );
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+CREATE_BIKE_CHANGE_TRIGGER = """
+    CREATE OR REPLACE TRIGGER bikes_notify_change
+    AFTER INSERT OR UPDATE OR DELETE ON bikes
+    FOR EACH ROW EXECUTE FUNCTION notify_bike_change();
+"""
+
+# bike_map_zones holds the map zones that contain the position of every bike. It is
+# updated when a bike moves and when a zone is added or its boundary changes, with
+# point-in-polygon lookups that the GiST indexes on the geometries serve. Rows are
+# only written when the membership changes.
+CREATE_BIKE_MAP_ZONES_FUNCTION = """
+    CREATE OR REPLACE FUNCTION update_bike_map_zones() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND NEW.last_position IS NOT DISTINCT FROM OLD.last_position THEN
+            RETURN NULL;
+        END IF;
+
+        DELETE FROM bike_map_zones AS member
+        WHERE member.bike_id = NEW.id
+            AND NOT EXISTS (
+                SELECT 1 FROM map_zones AS zone
+                WHERE zone.id = member.map_zone_id
+                    AND ST_Contains(zone.boundary, NEW.last_position)
+            );
+        INSERT INTO bike_map_zones (bike_id, map_zone_id)
+        SELECT NEW.id, zone.id FROM map_zones AS zone
+        WHERE ST_Contains(zone.boundary, NEW.last_position)
+        ON CONFLICT DO NOTHING;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+CREATE_BIKE_MAP_ZONES_TRIGGER = """
+    CREATE OR REPLACE TRIGGER bikes_update_map_zones
+    AFTER INSERT OR UPDATE OF last_position ON bikes
+    FOR EACH ROW EXECUTE FUNCTION update_bike_map_zones();
+"""
+
+CREATE_MAP_ZONE_BIKES_FUNCTION = """
+    CREATE OR REPLACE FUNCTION update_map_zone_bikes() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND NEW.boundary IS NOT DISTINCT FROM OLD.boundary THEN
+            RETURN NULL;
+        END IF;
+
+        DELETE FROM bike_map_zones AS member
+        USING bikes AS bike
+        WHERE member.map_zone_id = NEW.id
+            AND bike.id = member.bike_id
+            AND NOT ST_Contains(NEW.boundary, bike.last_position);
+        INSERT INTO bike_map_zones (bike_id, map_zone_id)
+        SELECT bike.id, NEW.id FROM bikes AS bike
+        WHERE ST_Contains(NEW.boundary, bike.last_position)
+        ON CONFLICT DO NOTHING;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+CREATE_MAP_ZONE_BIKES_TRIGGER = """
+    CREATE OR REPLACE TRIGGER map_zones_update_bikes
+    AFTER INSERT OR UPDATE OF boundary ON map_zones
+    FOR EACH ROW EXECUTE FUNCTION update_map_zone_bikes();
+"""
+
+# fleet_stats counts the bikes per city, status and battery bucket, and
+# fleet_stats_members holds the counted key of every bike. refresh_fleet_stats
+# recomputes the key of bikes, and only moves a bike between counters when its key
+# changed. It runs once per statement that changes bikes or trips, with the rows the
+# statement changed. Counters are updated in key order, so that concurrent
+# statements do not deadlock. The statuses and the battery buckets of 10 % match
+# FleetStatsAttributes.
+CREATE_FLEET_STATS_FUNCTION = """
+    CREATE OR REPLACE FUNCTION refresh_fleet_stats(bike_ids bigint[]) RETURNS void AS $$
+        WITH latest AS (
+            SELECT
+                bike.id AS bike_id,
+                bike.city_id,
+                CASE
+                    WHEN bike.deleted_at IS NOT NULL THEN 'deleted'
+                    WHEN EXISTS (
+                        SELECT 1 FROM trips AS trip
+                        WHERE trip.bike_id = bike.id AND trip.end_time IS NULL
+                    ) THEN 'in_use'
+                    WHEN bike.is_available THEN 'available'
+                    ELSE 'unavailable'
+                END AS status,
+                least(bike.battery_lvl / 10, 9) AS battery_bucket
+            FROM bikes AS bike
+            WHERE bike.id = ANY(bike_ids)
+        ),
+        changed AS (
+            SELECT
+                coalesce(latest.bike_id, stored.bike_id) AS bike_id,
+                latest.city_id,
+                latest.status,
+                latest.battery_bucket,
+                stored.city_id AS old_city_id,
+                stored.status AS old_status,
+                stored.battery_bucket AS old_battery_bucket
+            FROM latest
+            FULL JOIN (
+                SELECT * FROM fleet_stats_members WHERE bike_id = ANY(bike_ids)
+            ) AS stored ON stored.bike_id = latest.bike_id
+            WHERE (latest.city_id, latest.status, latest.battery_bucket)
+                IS DISTINCT FROM (stored.city_id, stored.status, stored.battery_bucket)
+        ),
+        deltas AS (
+            SELECT city_id, status, battery_bucket, sum(delta) AS delta
+            FROM (
+                SELECT city_id, status, battery_bucket, 1 AS delta
+                FROM changed WHERE status IS NOT NULL
+                UNION ALL
+                SELECT old_city_id, old_status, old_battery_bucket, -1
+                FROM changed WHERE old_status IS NOT NULL
+            ) AS moves
+            GROUP BY city_id, status, battery_bucket
+            HAVING sum(delta) <> 0
+        ),
+        counted AS (
+            INSERT INTO fleet_stats (city_id, status, battery_bucket, bikes)
+            SELECT city_id, status, battery_bucket, delta FROM deltas
+            ORDER BY city_id, status, battery_bucket
+            ON CONFLICT (city_id, status, battery_bucket)
+            DO UPDATE SET bikes = fleet_stats.bikes + excluded.bikes
+        ),
+        removed AS (
+            DELETE FROM fleet_stats_members
+            WHERE bike_id IN (SELECT bike_id FROM changed WHERE status IS NULL)
+        )
+        INSERT INTO fleet_stats_members (bike_id, city_id, status, battery_bucket)
+        SELECT bike_id, city_id, status, battery_bucket FROM changed
+        WHERE status IS NOT NULL
+        ORDER BY bike_id
+        ON CONFLICT (bike_id) DO UPDATE
+        SET city_id = excluded.city_id,
+            status = excluded.status,
+            battery_bucket = excluded.battery_bucket;
+    $$ LANGUAGE sql;
+"""
+
+CREATE_FLEET_STATS_TRIGGER_FUNCTIONS = [
+    f"""
+    CREATE OR REPLACE FUNCTION refresh_fleet_stats_of_{table}() RETURNS trigger AS $$
+    BEGIN
+        PERFORM refresh_fleet_stats(ARRAY(SELECT DISTINCT {column} FROM changed_rows));
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """
+    for table, column in (("bikes", "id"), ("trips", "bike_id"))
+]
+
+# Triggers with transition tables can only have one event each
+CREATE_FLEET_STATS_TRIGGERS = [
+    f"""
+    CREATE OR REPLACE TRIGGER {table}_{event.lower()}_fleet_stats
+    AFTER {event} ON {table}
+    REFERENCING {"OLD" if event == "DELETE" else "NEW"} TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_fleet_stats_of_{table}();
+    """
+    for table in ("bikes", "trips")
+    for event in ("INSERT", "UPDATE", "DELETE")
+]
+
+# Writes to the read-mostly tables NOTIFY the resource_versions channel with
+# <table>:<version>, where the version is a new value of the resource_versions
+# sequence. The triggers run once per statement, and a sequence is not locked until
+# commit like a counter row would be, so concurrent writes do not wait on each other.
+RESOURCE_VERSIONS_CHANNEL = "resource_versions"
+
+VERSIONED_TABLES = ("bikes", "cities", "map_zones", "zone_types")
+
+CREATE_RESOURCE_VERSIONS_SEQUENCE = "CREATE SEQUENCE IF NOT EXISTS resource_versions;"
+
+CREATE_RESOURCE_VERSION_FUNCTION = f"""
+    CREATE OR REPLACE FUNCTION notify_resource_version() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify(
+            '{RESOURCE_VERSIONS_CHANNEL}',
+            TG_TABLE_NAME || ':' || nextval('resource_versions')
+        );
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+CREATE_RESOURCE_VERSION_TRIGGERS = [
+    f"""
+    CREATE OR REPLACE TRIGGER {table}_notify_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_resource_version();
+    """
+    for table in VERSIONED_TABLES
+]
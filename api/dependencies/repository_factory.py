@@ -10,7 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from api.db import database, repository_base
 from api.models import db_models
 
-Model = TypeVar("Model", bound=db_models.Base)
+Model = TypeVar("Model", bound=db_models.PlainBase)
 Repo = TypeVar("Repo", bound=repository_base.DatabaseRepository)
 
 
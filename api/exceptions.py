@@ -114,6 +114,13 @@ class TripAlreadyEndedException(ApiException):
     title = "Trip Already Ended"
 
 
+class TileNotFoundException(ApiException):
+    """Exception raised when a tile is outside the tile grid of its zoom level."""
+
+    status_code = status.HTTP_404_NOT_FOUND
+    title = "Tile Not Found"
+
+
 class TransactionFailedException(ApiException):
     """Exception raised when a transaction fails."""
 
@@ -1,5 +1,6 @@
 """Main API file used to start server."""
 
+import contextlib
 from contextlib import asynccontextmanager
 
 import socketio
@@ -9,27 +10,102 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import ValidationError
 
 from api.config import settings
-from api.db.database import sessionmanager
+from api.db.database import DatabaseError, sessionmanager
+from api.db.repository_bike import BikeRepository
+from api.db.repository_zone import MapZoneRepository
 from api.exceptions import (
     ApiException,
     api_exception_handler,
     validation_exception_handler,
 )
-from api.routes import admin, bikes, cities, me, oauth, stripe, transactions, trips, users, zones
-from api.services.socket import socket
+from api.routes import (
+    admin,
+    bikes,
+    cities,
+    export,
+    me,
+    oauth,
+    stripe,
+    tiles,
+    transactions,
+    trips,
+    users,
+    zones,
+)
+from api.services.bike_feed import bike_change_feed
+from api.services.bike_write_buffer import bike_write_buffer
+from api.services.compression import CompressionMiddleware
+from api.services.fleet_cache import fleet_cache
+from api.services.fleet_stats import fleet_stats_reconciler
+from api.services.periodic import PeriodicTask
+from api.services.resource_versions import resource_versions
+from api.services.socket import bike_emitter, socket
+from api.services.telemetry_rollup import telemetry_rollup
 
 sessionmanager.init(settings.database_url)
 
 
+async def sync_fleet_cache():
+    """Reload the fleet cache from the database."""
+    async with sessionmanager.session() as session:
+        fleet_cache.load(await BikeRepository(session).get_fleet_state())
+
+
+async def sync_zone_index():
+    """Reload the zone index from the database."""
+    async with sessionmanager.session() as session:
+        await MapZoneRepository(session).rebuild_zone_index()
+
+
+# The last fleet snapshot and zone index are served while the database is unavailable
+fleet_cache_sync = PeriodicTask(
+    settings.fleet_cache_sync_interval, sync_fleet_cache, "fleet_cache_sync_errors_total"
+)
+zone_index_sync = PeriodicTask(
+    settings.zone_index_sync_interval, sync_zone_index, "zone_index_sync_errors_total"
+)
+
+
 @asynccontextmanager
 async def lifespan(application: FastAPI):  # pylint: disable=unused-argument
     """Context manager for the lifespan of the application."""
+    # Routes fall back to the database until the fleet cache has been seeded
+    with contextlib.suppress(DatabaseError):
+        await sync_fleet_cache()
+    fleet_cache_sync.start()
+    # Point-in-zone lookups load the index on demand until it has been loaded
+    with contextlib.suppress(DatabaseError):
+        await sync_zone_index()
+    zone_index_sync.start()
+    bike_emitter.start()
+    fleet_stats_reconciler.start()
+    if settings.bike_write_behind:
+        bike_write_buffer.start()
+    if settings.bike_change_feed:
+        bike_change_feed.start()
+    if settings.bike_telemetry_history:
+        # Reports need the partition of the current month
+        with contextlib.suppress(DatabaseError):
+            await telemetry_rollup.ensure_partitions()
+        telemetry_rollup.start()
+    if settings.etags:
+        resource_versions.start()
     yield
+    await resource_versions.stop()
+    await bike_change_feed.stop()
+    await telemetry_rollup.stop()
+    await fleet_stats_reconciler.stop()
+    # Write buffered bike reports before the database connections are closed
+    await bike_write_buffer.stop()
+    await bike_emitter.stop()
+    await zone_index_sync.stop()
+    await fleet_cache_sync.stop()
     if sessionmanager.is_initialized:
         await sessionmanager.close()
 
 
 app = FastAPI(
+    lifespan=lifespan,
     title="Scooty Doo API",
     summary="Everything you need to make a custom app with the Scooty Doo API",
 )
@@ -49,6 +125,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.compression:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        content_types=settings.compression_content_types,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+        thread_size=settings.compression_thread_size,
+    )
+
 app.include_router(bikes.router)
 app.include_router(zones.router)
 app.include_router(users.router)
@@ -59,6 +145,8 @@ app.include_router(stripe.router)
 app.include_router(me.router)
 app.include_router(admin.router)
 app.include_router(cities.router)
+app.include_router(tiles.router)
+app.include_router(export.router)
 
 # Add exception handlers
 app.add_exception_handler(ApiException, api_exception_handler)
@@ -75,9 +163,3 @@ async def welcome():
 socket_app = socketio.ASGIApp(socket)
 
 app.mount("/", socket_app)
-
-
-@socket.event
-async def connect(sid: int, _):
-    """Function for when client connects to socket."""
-    await socket.enter_room(sid, "bike_updates")
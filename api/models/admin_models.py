@@ -53,3 +53,17 @@ class AdminGetRequestParams(BaseModel):
     name_search: Optional[str] = Field(None, min_length=3)
     email_search: Optional[str] = Field(None, min_length=3)
     github_login_search: Optional[GitHubUsername] = None
+
+
+class MetricsAttributes(BaseModel):
+    """Metrics attributes for JSON:API response."""
+
+    values: dict[str, float]
+
+
+class MetricsResource(BaseModel):
+    """JSON:API resource object for runtime metrics of the API process."""
+
+    id: str = "api"
+    type: str = "metrics"
+    attributes: MetricsAttributes
@@ -1,12 +1,50 @@
 """Models for bikes"""
 
-from datetime import datetime
-from typing import Any, Literal, Optional, Union
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, Any, Literal, Optional, Union
+
+from fastapi import Query
+from pydantic import (
+    AliasChoices,
+    BaseModel,
+    ConfigDict,
+    Field,
+    field_validator,
+    model_validator,
+)
+
+from api.models.models import (
+    CursorPageParams,
+    JsonApiLinks,
+    check_fieldset,
+    fieldset_param,
+    validate_attributes,
+)
+from api.models.wkt_models import WKTPoint
+from api.services.tiles import MAX_LATITUDE, tile_count, tiles_in_bbox
 
-from pydantic import AliasChoices, BaseModel, ConfigDict, Field, field_validator
+# Largest number of map tiles a bike cluster bbox may cover at its zoom level
+MAX_CLUSTER_TILES = 64
 
-from api.models.models import JsonApiLinks
-from api.models.wkt_models import WKTPoint
+# Bucket sizes of the bike telemetry history, raw being every report
+TELEMETRY_RESOLUTIONS: dict[str, Optional[timedelta]] = {
+    "raw": None,
+    "1m": timedelta(minutes=1),
+    "5m": timedelta(minutes=5),
+    "15m": timedelta(minutes=15),
+    "1h": timedelta(hours=1),
+    "6h": timedelta(hours=6),
+    "1d": timedelta(days=1),
+}
+
+# Most buckets, or reports, the bike telemetry history returns
+MAX_TELEMETRY_POINTS = 1000
+
+# Bikes below this battery level count as low on battery in the fleet statistics
+LOW_BATTERY_LEVEL = 20
+
+# Battery levels per bucket of the fleet statistics, matching refresh_fleet_stats
+BATTERY_BUCKET_SIZE = 10
 
 
 class UserBikeAttributes(BaseModel):
@@ -44,19 +82,23 @@ class BikeResource(BaseModel):
 
     id: str
     type: str = "bikes"
-    attributes: Union[UserBikeAttributes, AdminBikeAttributes]
+    # A dict holds the attributes of a sparse fieldset
+    attributes: Union[UserBikeAttributes, AdminBikeAttributes, dict[str, Any]]
     relationships: Optional[Union[BikeRelationships, BikeZoneRelationships]] = None
     links: Optional[JsonApiLinks] = None
 
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
 
     @classmethod
-    def from_db_model(cls, bike: Any, request_url: str, is_admin: bool) -> "BikeResource":
-        """Create a BikeResource from a database model."""
+    def from_db_model(
+        cls, bike: Any, request_url: str, is_admin: bool, fields: Optional[list[str]] = None
+    ) -> "BikeResource":
+        """Create a BikeResource from a database model, with only the attributes in
+        fields if it is given."""
         attributes_model = AdminBikeAttributes if is_admin else UserBikeAttributes
         return cls(
             id=str(bike.id),
-            attributes=attributes_model.model_validate(bike),
+            attributes=validate_attributes(attributes_model, bike, fields),
             relationships=BikeRelationships(
                 city={"data": {"type": "cities", "id": str(bike.city_id)}}
             ),
@@ -71,7 +113,7 @@ class BikeResource(BaseModel):
         attributes_model = AdminBikeAttributes if is_admin else UserBikeAttributes
         return cls(
             id=str(bike.id),
-            attributes=attributes_model.model_validate(bike),
+            attributes=validate_attributes(attributes_model, bike),
             relationships=BikeZoneRelationships(
                 zone={"data": {"type": "zones", "id": str(map_zone_id)}}
             ),
@@ -79,12 +121,22 @@ class BikeResource(BaseModel):
         )
 
 
-class BikeGetRequestParams(BaseModel):
-    """Model for query params for getting bikes"""
+class NearbyBikeResource(BikeResource):
+    """JSON:API resource object for bikes near a point."""
 
-    # Pagination defaults to 100 users per page
-    limit: int = Field(300, gt=0)
-    offset: int = Field(0, ge=0)
+    meta: dict[str, Any]
+
+    @classmethod
+    def from_nearby_model(cls, bike: Any, request_url: str) -> "NearbyBikeResource":
+        """Create a NearbyBikeResource from a database row with a distance_m column."""
+        return cls(
+            **BikeResource.from_db_model(bike, request_url, False).model_dump(),
+            meta={"distance_m": round(bike.distance_m, 1)},
+        )
+
+
+class BikeFilterParams(BaseModel):
+    """Model for filtering and sorting bikes"""
 
     # Sorting
     order_by: Literal["id", "created_at", "updated_at", "city_id", "is_available"] = "created_at"
@@ -100,6 +152,25 @@ class BikeGetRequestParams(BaseModel):
     updated_at_lt: Optional[datetime] = None
     include_deleted: Optional[bool] = False
 
+    # Sparse fieldset, e.g. fields[bikes]=battery_lvl,last_position
+    fields: Optional[list[str]] = fieldset_param("bikes")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    @field_validator("fields")
+    @classmethod
+    def check_fields(cls, value: Optional[list[str]]) -> Optional[list[str]]:
+        """Check that the sparse fieldset only names bike attributes"""
+        return check_fieldset(value, AdminBikeAttributes)
+
+
+class BikeGetRequestParams(CursorPageParams, BikeFilterParams):
+    """Model for query params for getting bikes"""
+
+    # Pagination defaults to 100 users per page
+    limit: int = Field(300, gt=0)
+    offset: int = Field(0, ge=0)
+
 
 class UserBikeGetRequestParams(BaseModel):
     """Model for query params for getting bikes"""
@@ -117,6 +188,108 @@ class UserBikeGetRequestParams(BaseModel):
     battery_lt: Optional[float] = None
 
 
+class NearbyBikeGetRequestParams(BaseModel):
+    """Model for query params for getting the bikes nearest to a point"""
+
+    point: WKTPoint
+    k: int = Field(20, gt=0, le=100)
+    max_distance_m: float = Field(500, gt=0, le=10000)
+
+
+class BikeClusterGetRequestParams(BaseModel):
+    """Model for query params for getting bike clusters"""
+
+    bbox: str = Field(
+        ...,
+        pattern=r"^-?[\d.]+,-?[\d.]+,-?[\d.]+,-?[\d.]+$",
+        description="min_lon,min_lat,max_lon,max_lat, e.g. '12.9,55.5,13.2,55.7'",
+    )
+    zoom: int = Field(..., ge=0, le=18)
+
+    @model_validator(mode="after")
+    def check_bbox(self) -> "BikeClusterGetRequestParams":
+        """Check that the bbox is a valid box and does not cover too many tiles"""
+        min_lon, min_lat, max_lon, max_lat = self.bounds
+        if not (-180 <= min_lon < max_lon <= 180 and -90 <= min_lat < max_lat <= 90):
+            raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+        # Count the tiles from the corner tiles, since a large bbox at a high zoom
+        # would cover too many tiles to list
+        if tile_count(self.tile_bounds, self.zoom) > MAX_CLUSTER_TILES:
+            raise ValueError(f"bbox covers more than {MAX_CLUSTER_TILES} tiles at zoom {self.zoom}")
+        return self
+
+    @property
+    def bounds(self) -> tuple[float, float, float, float]:
+        """The bbox as (min_lon, min_lat, max_lon, max_lat)"""
+        return tuple(float(value) for value in self.bbox.split(","))
+
+    @property
+    def tile_bounds(self) -> tuple[float, float, float, float]:
+        """The bbox clamped to the latitudes of the map tiles"""
+        min_lon, min_lat, max_lon, max_lat = self.bounds
+        # Web Mercator tiles stop short of the poles
+        return min_lon, max(min_lat, -MAX_LATITUDE), max_lon, min(max_lat, MAX_LATITUDE)
+
+    @property
+    def tiles(self) -> list[tuple[int, int]]:
+        """The x and y of the map tiles at zoom that the bbox overlaps"""
+        return tiles_in_bbox(self.tile_bounds, self.zoom)
+
+
+class BikeTelemetryHistoryGetRequestParams(BaseModel):
+    """Model for query params for getting the telemetry history of a bike
+
+    Times without a timezone are UTC. Without a resolution, the finest bucket size
+    that covers the range in MAX_TELEMETRY_POINTS buckets is used."""
+
+    # Declared with Query for the reason given in fieldset_param
+    from_: datetime = Query(..., alias="from", validation_alias="from")
+    to: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    resolution: Optional[Literal["raw", "1m", "5m", "15m", "1h", "6h", "1d"]] = None
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    @field_validator("from_", "to")
+    @classmethod
+    def assume_utc(cls, value: datetime) -> datetime:
+        """Treat times without a timezone as UTC"""
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+    @model_validator(mode="after")
+    def check_range(self) -> "BikeTelemetryHistoryGetRequestParams":
+        """Check the range, and pick or check the resolution"""
+        if self.from_ >= self.to:
+            raise ValueError("from must be before to")
+        duration = self.to - self.from_
+        if self.resolution is None:
+            self.resolution = next(
+                (
+                    resolution
+                    for resolution, step in TELEMETRY_RESOLUTIONS.items()
+                    if step and duration / step <= MAX_TELEMETRY_POINTS
+                ),
+                None,
+            )
+            if self.resolution is None:
+                raise ValueError("range is too long for the telemetry history")
+        elif self.step and duration / self.step > MAX_TELEMETRY_POINTS:
+            raise ValueError(
+                f"range has more than {MAX_TELEMETRY_POINTS} buckets at {self.resolution}"
+            )
+        return self
+
+    @property
+    def step(self) -> Optional[timedelta]:
+        """The bucket size, None for every report"""
+        return TELEMETRY_RESOLUTIONS[self.resolution]
+
+
+class FleetStatsGetRequestParams(BaseModel):
+    """Model for query params for getting fleet statistics"""
+
+    city_id: Optional[int] = Field(None, gt=0)
+
+
 class ZoneBikeGetRequestParams(BaseModel):
     """ "Model for bike zone request parameters"""
 
@@ -124,6 +297,110 @@ class ZoneBikeGetRequestParams(BaseModel):
     city_id: int = Field(gt=0)
 
 
+class BikeClusterAttributes(BaseModel):
+    """Bike cluster attributes for JSON:API response."""
+
+    count: int
+    avg_battery: float
+    centroid: WKTPoint
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class BikeClusterResource(BaseModel):
+    """JSON:API resource object for the available bikes in a grid cell, with the
+    cell as a z/x/y tile id."""
+
+    id: str
+    type: str = "bike_clusters"
+    attributes: BikeClusterAttributes
+
+    @classmethod
+    def from_cluster(cls, cluster: Any) -> "BikeClusterResource":
+        """Create a BikeClusterResource from a BikeCluster."""
+        return cls(id=cluster.id, attributes=validate_attributes(BikeClusterAttributes, cluster))
+
+
+class BikeTelemetryHistoryAttributes(BaseModel):
+    """Bike telemetry bucket attributes for JSON:API response."""
+
+    time: datetime
+    samples: int
+    battery_avg: float
+    battery_min: int
+    battery_max: int
+    last_position: Optional[WKTPoint] = None
+
+
+class BikeTelemetryHistoryResource(BaseModel):
+    """JSON:API resource object for the telemetry of a bike in a time bucket, or a
+    single report, with the start of the bucket as id."""
+
+    id: str
+    type: str = "bike_telemetry"
+    attributes: BikeTelemetryHistoryAttributes
+
+    @classmethod
+    def from_row(cls, row: Any) -> "BikeTelemetryHistoryResource":
+        """Create a BikeTelemetryHistoryResource from a TelemetryRepository.get_history row."""
+        return cls(
+            id=row.time.isoformat(),
+            attributes=validate_attributes(
+                BikeTelemetryHistoryAttributes,
+                {
+                    "time": row.time,
+                    "samples": row.samples,
+                    "battery_avg": round(float(row.battery_sum) / row.samples, 1),
+                    "battery_min": row.battery_min,
+                    "battery_max": row.battery_max,
+                    "last_position": row.last_position,
+                },
+            ),
+        )
+
+
+class FleetStatsAttributes(BaseModel):
+    """Fleet statistics attributes for JSON:API response.
+
+    The battery histogram and the low battery count leave out deleted bikes. The
+    histogram has a bucket per 10 % of battery level, the last one being 90-100 %."""
+
+    available: int = 0
+    in_use: int = 0
+    unavailable: int = 0
+    deleted: int = 0
+    low_battery: int = 0
+    battery_histogram: list[int] = Field(default_factory=lambda: [0] * (100 // BATTERY_BUCKET_SIZE))
+
+
+class FleetStatsResource(BaseModel):
+    """JSON:API resource object for the statistics of the bikes of a city, with the
+    city id as id."""
+
+    id: str
+    type: str = "fleet_stats"
+    attributes: FleetStatsAttributes
+
+    @classmethod
+    def from_counters(
+        cls, counters: list[Any], city_id: Optional[int] = None
+    ) -> list["FleetStatsResource"]:
+        """Create a FleetStatsResource per city from BikeRepository.get_fleet_stats
+        counters. A given city gets a resource even without bikes."""
+        cities: dict[int, FleetStatsAttributes] = {}
+        if city_id is not None:
+            cities[city_id] = FleetStatsAttributes()
+        for counter in counters:
+            stats = cities.setdefault(counter.city_id, FleetStatsAttributes())
+            setattr(stats, counter.status, getattr(stats, counter.status) + counter.bikes)
+            if counter.status == "deleted":
+                continue
+            stats.battery_histogram[counter.battery_bucket] += counter.bikes
+            if counter.battery_bucket < LOW_BATTERY_LEVEL // BATTERY_BUCKET_SIZE:
+                stats.low_battery += counter.bikes
+        return [cls(id=str(city), attributes=stats) for city, stats in sorted(cities.items())]
+
+
 class BikeCreate(BaseModel):
     """Model for creating a new bike
     TODO: Either convert battery_lvl to battery_level or update the database column name
@@ -163,7 +440,41 @@ class BikeUpdate(BaseModel):
     @classmethod
     def cast_float_to_int(cls, value: float) -> int:
         """Casts battery_lvl to int"""
-        return int(value)
+        return int(value) if value is not None else None
+
+
+class BikeTelemetryReport(BikeUpdate):
+    """Model for a single bike report in a telemetry batch"""
+
+    bike_id: int = Field(gt=0)
+
+
+class BikeTelemetryBatch(BaseModel):
+    """Model for a batch of bike telemetry reports"""
+
+    reports: list[BikeTelemetryReport] = Field(min_length=1, max_length=1000)
+
+
+class BikeTelemetryResultAttributes(BaseModel):
+    """Outcome of a single report in a telemetry batch."""
+
+    status: Literal["updated", "not_found"]
+
+
+class BikeTelemetryResult(BaseModel):
+    """JSON:API resource object for telemetry batch results."""
+
+    id: str
+    type: str = "bikes"
+    attributes: BikeTelemetryResultAttributes
+
+    @classmethod
+    def from_bike_id(cls, bike_id: int, updated: bool) -> "BikeTelemetryResult":
+        """Create a BikeTelemetryResult for a bike id."""
+        return cls(
+            id=str(bike_id),
+            attributes=BikeTelemetryResultAttributes(status="updated" if updated else "not_found"),
+        )
 
 
 class BikeSocket(BikeUpdate):
@@ -172,6 +483,22 @@ class BikeSocket(BikeUpdate):
     bike_id: int
 
 
+class BikeSubscription(BaseModel):
+    """Socket subscription to bike updates by city, by map tile (z/x/y) or for all bikes"""
+
+    all_bikes: bool = False
+    city_ids: list[int] = Field(default_factory=list, max_length=50)
+    tiles: list[Annotated[str, Field(pattern=r"^\d{1,2}/\d+/\d+$")]] = Field(
+        default_factory=list, max_length=256
+    )
+
+
+class BikeResync(BaseModel):
+    """Socket request for a full snapshot of bikes, by id or for every subscribed room"""
+
+    bike_ids: list[int] = Field(default_factory=list, max_length=1000)
+
+
 class BikeSocketStartEnd(BikeSocket):
     """Socket output model for start/end trip"""
 
@@ -5,7 +5,7 @@ from typing import Any, Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
-from api.models.models import JsonApiLinks
+from api.models.models import JsonApiLinks, validate_attributes
 from api.models.wkt_models import WKTPoint
 
 
@@ -34,7 +34,7 @@ class CityResource(BaseModel):
         """Create a CityResource from a database model."""
         return cls(
             id=str(city.id),
-            attributes=CityAttributes.model_validate(city),
+            attributes=validate_attributes(CityAttributes, city),
             links=JsonApiLinks(self_link=f"{base_url}/v1/bikes/available?city_id={city.id}"),
         )
 
@@ -10,10 +10,13 @@ from sqlalchemy import (
     CheckConstraint,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     Numeric,
+    SmallInteger,
     Text,
     func,
+    text,
 )
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.asyncio import AsyncAttrs
@@ -21,9 +24,15 @@ from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
 # pylint: disable=too-few-public-methods
-class Base(AsyncAttrs, DeclarativeBase):
+class PlainBase(AsyncAttrs, DeclarativeBase):
+    """Base of every database model, without the audit and soft delete columns."""
+
+
+class Base(PlainBase):
     """Base database model."""
 
+    __abstract__ = True
+
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         server_default=func.now(),  # pylint: disable=not-callable
@@ -81,6 +90,9 @@ class User(Base):
     trips: Mapped[list["Trip"]] = relationship(back_populates="user", lazy="raise")
     transactions: Mapped[list["Transaction"]] = relationship(back_populates="user", lazy="raise")
 
+    # Keyset pagination on the default sort order
+    __table_args__ = (Index("idx_users_created_at_id", "created_at", "id"),)
+
 
 class PaymentProvider(Base):
     """Payment provider database model."""
@@ -133,9 +145,89 @@ class Bike(Base):
 
     __table_args__ = (
         CheckConstraint("battery_lvl >= 0 AND battery_lvl <= 100", name="battery_level_check"),
+        # Partial GiST index for && box lookups of available bikes
+        Index(
+            "idx_bikes_available_last_position",
+            "last_position",
+            postgresql_using="gist",
+            postgresql_where=text("is_available AND deleted_at IS NULL"),
+        ),
+        # Partial GiST index for nearest available bike (KNN) lookups in meters
+        Index(
+            "idx_bikes_available_last_position_geography",
+            text("(last_position::geography)"),
+            postgresql_using="gist",
+            postgresql_where=text("is_available AND deleted_at IS NULL"),
+        ),
+        # Keyset pagination on the default sort order
+        Index("idx_bikes_created_at_id", "created_at", "id"),
+    )
+
+
+class BikeTelemetry(PlainBase):
+    """Bike telemetry history database model.
+
+    One row per bike report, with the state of the bike after the report. Partitioned
+    by month of created_at, the report time, the partitions are created by
+    TelemetryRepository. Rows are never updated or soft deleted, so the time series
+    tables have no audit columns."""
+
+    __tablename__ = "bike_telemetry"
+
+    bike_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        primary_key=True,
+        server_default=func.now(),  # pylint: disable=not-callable
+    )
+    battery_lvl: Mapped[int] = mapped_column(Integer, nullable=False)
+    last_position: Mapped[Geometry] = mapped_column(
+        Geometry("POINT", srid=4326, spatial_index=False), nullable=True
+    )
+
+    __table_args__ = (
+        # Rollups scan the latest rows, rows are appended in created_at order
+        Index("idx_bike_telemetry_created_at", "created_at", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+
+class BikeTelemetryRollupMixin:
+    """Columns of a bike telemetry rollup, one row per bike and time bucket.
+
+    Sums are kept instead of averages, so that a rollup can be rolled up further."""
+
+    bike_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    samples: Mapped[int] = mapped_column(Integer, nullable=False)
+    battery_sum: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    battery_min: Mapped[int] = mapped_column(Integer, nullable=False)
+    battery_max: Mapped[int] = mapped_column(Integer, nullable=False)
+    last_position: Mapped[Geometry] = mapped_column(
+        Geometry("POINT", srid=4326, spatial_index=False), nullable=True
+    )
+    last_reported_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+
+class BikeTelemetryMinute(BikeTelemetryRollupMixin, PlainBase):
+    """Bike telemetry per minute database model, partitioned by month of bucket."""
+
+    __tablename__ = "bike_telemetry_1m"
+
+    __table_args__ = (
+        Index("idx_bike_telemetry_1m_bucket", "bucket", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (bucket)"},
     )
 
 
+class BikeTelemetryHour(BikeTelemetryRollupMixin, PlainBase):
+    """Bike telemetry per hour database model."""
+
+    __tablename__ = "bike_telemetry_1h"
+
+    __table_args__ = (Index("idx_bike_telemetry_1h_bucket", "bucket"),)
+
+
 class Trip(Base):
     """Trip database model."""
 
@@ -163,6 +255,14 @@ class Trip(Base):
     user: Mapped["User"] = relationship(back_populates="trips")
     transaction: Mapped["Transaction"] = relationship(back_populates="trip")
 
+    __table_args__ = (
+        # Keyset pagination on the default sort order, overall and per user
+        Index("idx_trips_created_at_id", "created_at", "id"),
+        Index("idx_trips_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Active trip of a bike, for the fleet statistics
+        Index("idx_trips_active_bike_id", "bike_id", postgresql_where=text("end_time IS NULL")),
+    )
+
 
 class ZoneType(Base):
     """Zone type database model."""
@@ -195,6 +295,57 @@ class MapZone(Base):
     zone_type: Mapped["ZoneType"] = relationship(back_populates="zones", lazy="raise")
     city: Mapped["City"] = relationship(back_populates="map_zones", lazy="raise")
 
+    # Keyset pagination on the default sort order
+    __table_args__ = (Index("idx_map_zones_city_id_id", "city_id", "id"),)
+
+
+class BikeMapZone(PlainBase):
+    """Association of bikes with the map zones that contain their position.
+
+    Kept up to date by database triggers when a bike moves or a zone boundary
+    changes, see api/db/triggers.py. Rows are deleted when a bike leaves a zone."""
+
+    __tablename__ = "bike_map_zones"
+
+    bike_id: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("bikes.id", ondelete="CASCADE"), primary_key=True
+    )
+    map_zone_id: Mapped[int] = mapped_column(
+        ForeignKey("map_zones.id", ondelete="CASCADE"), primary_key=True
+    )
+
+    # Bikes by zone
+    __table_args__ = (Index("idx_bike_map_zones_map_zone_id", "map_zone_id"),)
+
+
+class FleetStats(Base):
+    """Fleet statistics counter database model.
+
+    Counts the bikes of a city with a status and a battery level bucket. Kept up to
+    date by database triggers, see api/db/triggers.py."""
+
+    __tablename__ = "fleet_stats"
+
+    city_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    status: Mapped[str] = mapped_column(
+        Text,
+        CheckConstraint("status IN ('available', 'in_use', 'unavailable', 'deleted')"),
+        primary_key=True,
+    )
+    battery_bucket: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    bikes: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class FleetStatsMember(Base):
+    """The fleet statistics counter that a bike is counted in."""
+
+    __tablename__ = "fleet_stats_members"
+
+    bike_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    city_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    status: Mapped[str] = mapped_column(Text, nullable=False)
+    battery_bucket: Mapped[int] = mapped_column(SmallInteger, nullable=False)
+
 
 class Transaction(Base):
     """Transaction database model."""
@@ -218,6 +369,9 @@ class Transaction(Base):
     trip: Mapped["Trip"] = relationship(back_populates="transaction")
     payment_method: Mapped["PaymentMethod"] = relationship(back_populates="transactions")
 
+    # Keyset pagination on the default sort order
+    __table_args__ = (Index("idx_transactions_created_at_id", "created_at", "id"),)
+
 
 class Admin(Base):
     """Admin database model."""
@@ -0,0 +1,34 @@
+"""Module for export models"""
+
+from typing import Literal
+
+from pydantic import BaseModel
+
+from api.models.bike_models import BikeFilterParams
+from api.models.transaction_models import TransactionFilterParams
+from api.models.trip_models import TripFilterParams
+from api.models.user_models import UserFilterParams
+
+ExportFormat = Literal["ndjson", "csv"]
+
+
+class ExportParams(BaseModel):
+    """Model for the format of an export"""
+
+    format: ExportFormat = "ndjson"
+
+
+class BikeExportParams(ExportParams, BikeFilterParams):
+    """Model for query params for exporting bikes"""
+
+
+class TripExportParams(ExportParams, TripFilterParams):
+    """Model for query params for exporting trips"""
+
+
+class UserExportParams(ExportParams, UserFilterParams):
+    """Model for query params for exporting users"""
+
+
+class TransactionExportParams(ExportParams, TransactionFilterParams):
+    """Model for query params for exporting transactions"""
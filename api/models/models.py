@@ -5,9 +5,22 @@ https://fastapi-jsonapi.readthedocs.io/en/latest/
 """
 
 # pylint: disable=too-few-public-methods
-from typing import Generic, Optional, TypeVar
+import base64
+from functools import lru_cache
+from typing import Any, Generic, Optional, TypeVar
 
-from pydantic import BaseModel, ConfigDict, Field
+from fastapi import Query
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    SerializerFunctionWrapHandler,
+    create_model,
+    model_serializer,
+    model_validator,
+)
+
+from api.models.wkt_models import DATABASE_CONTEXT
 
 
 class JsonApiLinks(BaseModel):
@@ -18,6 +31,168 @@ class JsonApiLinks(BaseModel):
     model_config = ConfigDict(populate_by_name=True)
 
 
+class JsonApiPaginationLinks(JsonApiLinks):
+    """JSON:API links object with links to the next and previous page."""
+
+    next: Optional[str] = None
+    prev: Optional[str] = None
+
+    @model_serializer(mode="wrap")
+    def drop_missing_pages(self, handler: SerializerFunctionWrapHandler) -> dict[str, Any]:
+        """Leave out next and prev on the first and last page."""
+        links = handler(self)
+        return {key: value for key, value in links.items() if value is not None}
+
+    @classmethod
+    def from_page(
+        cls, self_link: str, request_url: Any, items: list[Any], params: "CursorPageParams"
+    ) -> "JsonApiPaginationLinks":
+        """Create links for a page of items, with cursors at the first and last item.
+
+        request_url is the starlette URL of the request, so that the page links keep
+        the filters and sorting of the request."""
+        cursor = Cursor.decode(params.cursor) if params.cursor else None
+        before = cursor is not None and cursor.before
+        if before:
+            has_next, has_prev = bool(items), len(items) == params.limit
+        else:
+            has_next = len(items) == params.limit
+            has_prev = bool(items) and (cursor is not None or getattr(params, "offset", 0) > 0)
+
+        def page_link(item: Any, before: bool) -> str:
+            token = Cursor.from_item(item, params, before).encode()
+            return str(request_url.remove_query_params("offset").include_query_params(cursor=token))
+
+        return cls(
+            self_link=self_link,
+            next=page_link(items[-1], False) if has_next else None,
+            prev=page_link(items[0], True) if has_prev else None,
+        )
+
+
+class Cursor(BaseModel):
+    """Keyset pagination position: the (order column, id) values of a row, and whether
+    the page is after or before it. Encoded as an opaque url safe token."""
+
+    order_by: str
+    order_direction: str
+    value: Any
+    id: int
+    before: bool = False
+
+    @classmethod
+    def from_item(cls, item: Any, params: "CursorPageParams", before: bool) -> "Cursor":
+        """Create a cursor at an item of a page."""
+        return cls(
+            order_by=params.order_by,
+            order_direction=params.order_direction,
+            value=getattr(item, params.order_by),
+            id=item.id,
+            before=before,
+        )
+
+    def encode(self) -> str:
+        """Encode the cursor as a token."""
+        return base64.urlsafe_b64encode(self.model_dump_json().encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "Cursor":
+        """Decode a cursor token.
+
+        Raises:
+            ValueError: If the token is not a valid cursor
+        """
+        try:
+            return cls.model_validate_json(
+                base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            )
+        except ValueError as e:
+            raise ValueError("Invalid cursor") from e
+
+
+class CursorPageParams(BaseModel):
+    """Query params for paging by cursor instead of offset.
+
+    The cursor comes from links.next or links.prev of a previous page, and takes
+    precedence over offset. Subclasses define limit, order_by and order_direction."""
+
+    cursor: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_cursor(self) -> "CursorPageParams":
+        """Check that the cursor is valid and was created with the same sorting."""
+        if self.cursor is not None:
+            cursor = Cursor.decode(self.cursor)
+            if (cursor.order_by, cursor.order_direction) != (
+                getattr(self, "order_by", None),
+                getattr(self, "order_direction", None),
+            ):
+                raise ValueError("cursor does not match order_by and order_direction")
+        return self
+
+
+def attribute_names(attributes_model: type[BaseModel]) -> set[str]:
+    """Names of the attributes of a resource as they appear in responses."""
+    return {info.alias or name for name, info in attributes_model.model_fields.items()}
+
+
+def fieldset_param(resource_type: str) -> Any:
+    """Declare the sparse fieldset query parameter of a resource, fields[type].
+
+    FastAPI validates the fields of a query parameter model against their FieldInfo,
+    where pydantic warns that the alias of a plain Field has no effect, so the alias
+    is declared with Query. Unlike Field, Query does not derive the validation alias
+    from the alias."""
+    alias = f"fields[{resource_type}]"
+    return Query(None, alias=alias, validation_alias=alias)
+
+
+def check_fieldset(
+    fields: Optional[list[str]], attributes_model: type[BaseModel]
+) -> Optional[list[str]]:
+    """Split a JSON:API sparse fieldset (fields[type]=a,b) into attribute names.
+
+    Raises:
+        ValueError: If a name is not an attribute of the resource
+    """
+    if fields is None:
+        return None
+    names = [name.strip() for value in fields for name in value.split(",") if name.strip()]
+    unknown = sorted(set(names) - attribute_names(attributes_model))
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    return names
+
+
+@lru_cache(maxsize=128)
+def _sparse_model(attributes_model: type[BaseModel], fields: frozenset[str]) -> type[BaseModel]:
+    """Copy of an attributes model with only the attributes in a sparse fieldset."""
+    return create_model(
+        f"Sparse{attributes_model.__name__}",
+        __config__=attributes_model.model_config,
+        **{
+            name: (info.annotation, info)
+            for name, info in attributes_model.model_fields.items()
+            if (info.alias or name) in fields
+        },
+    )
+
+
+def validate_attributes(
+    attributes_model: type[BaseModel], obj: Any, fields: Optional[list[str]] = None
+) -> BaseModel | dict[str, Any]:
+    """Validate the attributes of a resource read from the database, or only those in
+    a sparse fieldset.
+
+    A sparse fieldset gives a dict of the requested attributes, the others are not
+    read from obj or validated at all. WKT attributes are not parsed again, see
+    DATABASE_CONTEXT."""
+    if fields is None:
+        return attributes_model.model_validate(obj, context=DATABASE_CONTEXT)
+    sparse_model = _sparse_model(attributes_model, frozenset(fields))
+    return sparse_model.model_validate(obj, context=DATABASE_CONTEXT).model_dump(by_alias=True)
+
+
 class JsonApiError(BaseModel):
     """JSON:API error object."""
 
@@ -40,3 +215,15 @@ class JsonApiResponse(BaseModel, Generic[T]):
 
     data: T | list[T]
     links: JsonApiLinks
+
+
+class JsonApiMetaResponse(JsonApiResponse[T], Generic[T]):
+    """JSON:API response wrapper with a meta object."""
+
+    meta: Optional[dict[str, Any]] = None
+
+
+class JsonApiPageResponse(JsonApiResponse[T], Generic[T]):
+    """JSON:API response wrapper for a page of a collection."""
+
+    links: JsonApiPaginationLinks
@@ -6,7 +6,7 @@ from typing import Any, Literal, Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
-from api.models.models import JsonApiLinks
+from api.models.models import CursorPageParams, JsonApiLinks
 
 
 class UserBalance(BaseModel):
@@ -80,12 +80,8 @@ class TransactionResourceWithBalance(BaseModel):
         )
 
 
-class TransactionGetRequestParams(BaseModel):
-    """Model for getting a transaction"""
-
-    # Pagination defaults to 100 transactions per page
-    limit: int = Field(300, gt=0)
-    offset: int = Field(0, ge=0)
+class TransactionFilterParams(BaseModel):
+    """Model for filtering and sorting transactions"""
 
     # Sorting
     order_by: Literal["created_at", "updated_at", "amount", "transaction_type"] = "created_at"
@@ -98,3 +94,11 @@ class TransactionGetRequestParams(BaseModel):
     created_at_lt: Optional[datetime] = None
     updated_at_gt: Optional[datetime] = None
     updated_at_lt: Optional[datetime] = None
+
+
+class TransactionGetRequestParams(CursorPageParams, TransactionFilterParams):
+    """Model for getting a transaction"""
+
+    # Pagination defaults to 100 transactions per page
+    limit: int = Field(300, gt=0)
+    offset: int = Field(0, ge=0)
@@ -1,11 +1,17 @@
 """Module for trip models"""
 
 from datetime import datetime
-from typing import Annotated, Any, Literal, Optional
+from typing import Annotated, Any, Literal, Optional, Union
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
-from api.models.models import JsonApiLinks
+from api.models.models import (
+    CursorPageParams,
+    JsonApiLinks,
+    check_fieldset,
+    fieldset_param,
+    validate_attributes,
+)
 from api.models.wkt_models import WKTLineString, WKTPoint
 
 TripId = Annotated[int, Field(gt=0, description="Trip ID")]
@@ -46,15 +52,19 @@ class TripResource(BaseModel):
 
     id: int
     type: str = "trips"
-    attributes: TripAttributes
+    # A dict holds the attributes of a sparse fieldset
+    attributes: Union[TripAttributes, dict[str, Any]]
     relationships: Optional[TripRelationships] = None
     links: Optional[JsonApiLinks] = None
 
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
 
     @classmethod
-    def from_db_model(cls, trip: Any, request_url: str) -> "TripResource":
-        """Create a TripResource from a database model."""
+    def from_db_model(
+        cls, trip: Any, request_url: str, fields: Optional[list[str]] = None
+    ) -> "TripResource":
+        """Create a TripResource from a database model, with only the attributes in
+        fields if it is given."""
         relationships = {
             "user": {"data": {"type": "users", "id": str(trip.user_id)}},
             "bike": {"data": {"type": "bikes", "id": str(trip.bike_id)}},
@@ -68,7 +78,7 @@ class TripResource(BaseModel):
 
         return cls(
             id=str(trip.id),
-            attributes=TripAttributes.model_validate(trip),
+            attributes=validate_attributes(TripAttributes, trip, fields),
             relationships=TripRelationships(**relationships),
             # Add links to user/bike/transaction?
             links=JsonApiLinks(self_link=f"{request_url}{trip.id}"),
@@ -161,12 +171,8 @@ class BikeTripStartRequest(BaseModel):
     trip_id: int
 
 
-class TripGetRequestParams(BaseModel):
-    """Model for getting queriyng trips"""
-
-    # Pagination defaults to 300 trips per page
-    limit: int = Field(300, gt=0)
-    offset: int = Field(0, ge=0)
+class TripFilterParams(BaseModel):
+    """Model for filtering and sorting trips"""
 
     # Sorting
     order_by: Literal[
@@ -185,3 +191,22 @@ class TripGetRequestParams(BaseModel):
     updated_at_lt: Optional[datetime] = None
     updated_at_gt: Optional[datetime] = None
     created_at_lt: Optional[datetime] = None
+
+    # Sparse fieldset, e.g. fields[trips]=start_time,total_fee
+    fields: Optional[list[str]] = fieldset_param("trips")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    @field_validator("fields")
+    @classmethod
+    def check_fields(cls, value: Optional[list[str]]) -> Optional[list[str]]:
+        """Check that the sparse fieldset only names trip attributes"""
+        return check_fieldset(value, TripAttributes)
+
+
+class TripGetRequestParams(CursorPageParams, TripFilterParams):
+    """Model for getting queriyng trips"""
+
+    # Pagination defaults to 300 trips per page
+    limit: int = Field(300, gt=0, le=1000)
+    offset: int = Field(0, ge=0)
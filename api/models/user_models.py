@@ -6,7 +6,7 @@ from typing import Annotated, Any, Literal, Optional, Union
 
 from pydantic import BaseModel, ConfigDict, EmailStr, Field
 
-from api.models.models import JsonApiLinks
+from api.models.models import CursorPageParams, JsonApiLinks
 
 GitHubUsername = Annotated[
     str,
@@ -115,12 +115,8 @@ class UserResource(BaseModel):
         )
 
 
-class UserGetRequestParams(BaseModel):
-    """Model for getting a user"""
-
-    # Pagination defaults to 100 users per page
-    limit: int = Field(300, gt=0)
-    offset: int = Field(0, ge=0)
+class UserFilterParams(BaseModel):
+    """Model for filtering and sorting users"""
 
     # Sorting
     order_by: Literal["created_at", "updated_at", "full_name", "email", "balance"] = "created_at"
@@ -139,6 +135,14 @@ class UserGetRequestParams(BaseModel):
     include_deleted: Optional[bool] = False
 
 
+class UserGetRequestParams(CursorPageParams, UserFilterParams):
+    """Model for getting a user"""
+
+    # Pagination defaults to 100 users per page
+    limit: int = Field(300, gt=0)
+    offset: int = Field(0, ge=0)
+
+
 class UserCreate(BaseModel):
     """Model for payload to create a user"""
 
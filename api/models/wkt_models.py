@@ -5,77 +5,169 @@ https://fastapi-jsonapi.readthedocs.io/en/latest/
 """
 
 # pylint: disable=too-few-public-methods
-from typing import Annotated, Optional
+from functools import cached_property
+from typing import Annotated, Any, ClassVar, Optional
 
-from pydantic import BeforeValidator, Field
-from shapely import wkt
+import numpy as np
+import shapely
+from pydantic import Field, GetCoreSchemaHandler
+from pydantic_core import core_schema
 from shapely.errors import ShapelyError
+from shapely.geometry.base import BaseGeometry
 
+# Validation context for values read from the database. The WKT that PostGIS writes
+# with ST_AsText is valid, so it is kept as is and only parsed if it is used.
+DATABASE_CONTEXT = {"trusted_wkt": True}
 
-def validate_coordinates(coords: list[tuple[float, float]]) -> None:
-    """Validate coordinate bounds for longitude/latitude pairs"""
-    for x, y in coords:
-        if not (-180 <= x <= 180 and -90 <= y <= 90):
-            raise ValueError(
-                f"Invalid coordinates ({x}, {y}). "
-                "Longitude must be between -180 and 180, "
-                "Latitude must be between -90 and 90"
-            )
 
+def validate_coordinates(coords: Any) -> None:
+    """Validate coordinate bounds for longitude/latitude pairs, all at once"""
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    # Written so that NaN is out of bounds too
+    valid = (np.abs(coords[:, 0]) <= 180) & (np.abs(coords[:, 1]) <= 90)
+    if not valid.all():
+        x, y = coords[np.argmin(valid)]
+        raise ValueError(
+            f"Invalid coordinates ({x}, {y}). "
+            "Longitude must be between -180 and 180, "
+            "Latitude must be between -90 and 90"
+        )
 
-def validate_wkt_base(value: Optional[str], geom_type: str) -> Optional[str]:
-    """Base WKT geometry validator"""
-    try:
-        geom = wkt.loads(value)
-        if geom.geom_type != geom_type:
-            raise ValueError(f"Geometry must be a {geom_type}")
-        return value
-    except ShapelyError as e:
-        raise ValueError(f"Invalid WKT format: {str(e)}") from e
-    except Exception as e:
-        raise ValueError(f"Invalid {geom_type}: {str(e)}") from e
 
+class WKTGeometry(str):
+    """WKT string of a geometry that is parsed once, when it is validated.
 
-def validate_wkt_point(value: Optional[str]) -> Optional[str]:
+    The value is the WKT string itself, so it can be used wherever the string was,
+    and it keeps the parsed shapely geometry and its coordinates. WKB and GeoJSON
+    are only built when they are used."""
+
+    geom_type: ClassVar[str] = ""
+
+    @classmethod
+    def parse(cls, value: Optional[str]) -> "WKTGeometry":
+        """Parse and validate a WKT string, unless it already is a geometry of cls."""
+        if isinstance(value, cls):
+            return value
+        try:
+            geometry = shapely.from_wkt(value)
+        except ShapelyError as e:
+            raise ValueError(f"Invalid WKT format: {str(e)}") from e
+        except Exception as e:
+            raise ValueError(f"Invalid {cls.geom_type}: {str(e)}") from e
+        if geometry is None or geometry.geom_type != cls.geom_type:
+            raise ValueError(f"Invalid {cls.geom_type}: Geometry must be a {cls.geom_type}")
+        if geometry.is_empty:
+            raise ValueError(f"Invalid {cls.geom_type}: Geometry must not be empty")
+
+        coordinates = shapely.get_coordinates(geometry)
+        validate_coordinates(coordinates)
+
+        parsed = cls(value)
+        parsed.__dict__.update(geometry=geometry, coordinates=coordinates)
+        return parsed
+
+    @cached_property
+    def geometry(self) -> BaseGeometry:
+        """The shapely geometry."""
+        return shapely.from_wkt(str(self))
+
+    @cached_property
+    def coordinates(self) -> np.ndarray:
+        """The (x, y) coordinates of every vertex, as an n by 2 array."""
+        return shapely.get_coordinates(self.geometry)
+
+    @cached_property
+    def wkb(self) -> bytes:
+        """The geometry as WKB."""
+        return shapely.to_wkb(self.geometry)
+
+    @cached_property
+    def geojson(self) -> str:
+        """The geometry as a GeoJSON geometry object."""
+        return shapely.to_geojson(self.geometry)
+
+    @classmethod
+    def _validate(
+        cls,
+        value: Any,
+        handler: core_schema.ValidatorFunctionWrapHandler,
+        info: core_schema.ValidationInfo,
+    ) -> "WKTGeometry":
+        """Validate a string with parse, or without parsing it in DATABASE_CONTEXT.
+
+        Geometries of cls are kept as they are, since the string validator would
+        make them plain strings again."""
+        if isinstance(value, cls):
+            return value
+        value = handler(value)
+        if info.context and info.context.get("trusted_wkt"):
+            return cls(value)
+        return cls.parse(value)
+
+    @classmethod
+    def __get_pydantic_core_schema__(
+        cls, _source: Any, _handler: GetCoreSchemaHandler
+    ) -> core_schema.CoreSchema:
+        """Validate a string with _validate, and serialize to JSON as the WKT string."""
+        return core_schema.with_info_wrap_validator_function(
+            cls._validate,
+            core_schema.str_schema(),
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                str, return_schema=core_schema.str_schema(), when_used="json"
+            ),
+        )
+
+
+class WKTPointGeometry(WKTGeometry):
+    """WKT Point that is parsed once."""
+
+    geom_type = "Point"
+
+
+class WKTLineStringGeometry(WKTGeometry):
+    """WKT LineString that is parsed once."""
+
+    geom_type = "LineString"
+
+
+class WKTPolygonGeometry(WKTGeometry):
+    """WKT Polygon that is parsed once."""
+
+    geom_type = "Polygon"
+
+
+def parse_wkt(value: str) -> BaseGeometry:
+    """Get the shapely geometry of a WKT string, without parsing it again if it was
+    validated as a WKT geometry."""
+    if isinstance(value, WKTGeometry):
+        return value.geometry
+    return shapely.from_wkt(value)
+
+
+def validate_wkt_point(value: Optional[str]) -> WKTPointGeometry:
     """Validate WKT Point geometry and coordinates"""
-    value = validate_wkt_base(value, "Point")
-    if value:
-        geom = wkt.loads(value)
-        validate_coordinates([geom.coords[0]])
-    return value
+    return WKTPointGeometry.parse(value)
 
 
-def validate_wkt_linestring(value: Optional[str]) -> Optional[str]:
+def validate_wkt_linestring(value: Optional[str]) -> WKTLineStringGeometry:
     """Validate WKT LineString geometry and coordinates"""
-    value = validate_wkt_base(value, "LineString")
-    if value:
-        geom = wkt.loads(value)
-        validate_coordinates(list(geom.coords))
-    return value
+    return WKTLineStringGeometry.parse(value)
 
 
-def validate_wkt_polygon(value: Optional[str]) -> Optional[str]:
+def validate_wkt_polygon(value: Optional[str]) -> WKTPolygonGeometry:
     """Validate WKT Polygon geometry and coordinates"""
-    value = validate_wkt_base(value, "Polygon")
-    if value:
-        geom = wkt.loads(value)
-        validate_coordinates(list(geom.exterior.coords))
-        for interior in geom.interiors:
-            validate_coordinates(list(interior.coords))
-    return value
+    return WKTPolygonGeometry.parse(value)
 
 
 WKTPoint = Annotated[
-    str,
-    BeforeValidator(validate_wkt_point),
+    WKTPointGeometry,
     Field(
         description="WKT POINT format with longitude (-180 to 180) and latitude (-90 to 90)",
         json_schema_extra={"format": "WKT POINT", "examples": ["POINT(11.9746 57.7089)"]},
     ),
 ]
 WKTLineString = Annotated[
-    str,
-    BeforeValidator(validate_wkt_linestring),
+    WKTLineStringGeometry,
     Field(
         description=(
             "WKT LineString format with longitude (-180 to 180) and latitude "
@@ -89,8 +181,7 @@ WKTLineString = Annotated[
 ]
 
 WKTPolygon = Annotated[
-    str,
-    BeforeValidator(validate_wkt_polygon),
+    WKTPolygonGeometry,
     Field(
         description=(
             "WKT Polygon format with longitude (-180 to 180) and latitude (-90 to 90) coordinates"
@@ -1,12 +1,21 @@
 """Models for zone types and map zones."""
 
 from datetime import datetime
-from typing import Any, Literal, Optional
+from typing import Any, Literal, Optional, Union
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
 
-from api.models.models import JsonApiLinks
-from api.models.wkt_models import WKTPolygon
+from api.models.models import (
+    CursorPageParams,
+    JsonApiLinks,
+    check_fieldset,
+    fieldset_param,
+    validate_attributes,
+)
+from api.models.wkt_models import WKTLineString, WKTPoint, WKTPolygon, validate_coordinates
+
+# Points per zone classification request
+MAX_CLASSIFY_POINTS = 100_000
 
 
 class ZoneTypeAttributes(BaseModel):
@@ -92,17 +101,21 @@ class MapZoneResourceMinimal(BaseModel):
 
     id: str
     type: str = "map_zones"
-    attributes: MapZoneAttributes
+    # A dict holds the attributes of a sparse fieldset
+    attributes: Union[MapZoneAttributes, dict[str, Any]]
     links: Optional[JsonApiLinks] = None
 
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
 
     @classmethod
-    def from_db_model(cls, map_zone: Any, request_url: str) -> "MapZoneResourceMinimal":
-        """Create a minimal MapZoneResource from a database model."""
+    def from_db_model(
+        cls, map_zone: Any, request_url: str, fields: Optional[list[str]] = None
+    ) -> "MapZoneResourceMinimal":
+        """Create a minimal MapZoneResource from a database model, with only the
+        attributes in fields if it is given."""
         return cls(
             id=str(map_zone.id),
-            attributes=MapZoneAttributes.model_validate(map_zone),
+            attributes=validate_attributes(MapZoneAttributes, map_zone, fields),
             links=JsonApiLinks(self_link=f"{request_url}"),
         )
 
@@ -134,13 +147,13 @@ class MapZoneResource(BaseModel):
 
         return cls(
             id=str(map_zone.id),
-            attributes=MapZoneAttributes.model_validate(map_zone),
+            attributes=validate_attributes(MapZoneAttributes, map_zone),
             relationships=relationships,
             links=JsonApiLinks(self_link=request_url),
         )
 
 
-class MapZoneGetRequestParams(BaseModel):
+class MapZoneGetRequestParams(CursorPageParams):
     """Model for request parameters for getting map zones."""
 
     # Pagination and offset
@@ -162,6 +175,17 @@ class MapZoneGetRequestParams(BaseModel):
     updated_at_gt: Optional[datetime] = None
     updated_at_lt: Optional[datetime] = None
 
+    # Sparse fieldset, e.g. fields[map_zones]=zone_name,city_id
+    fields: Optional[list[str]] = fieldset_param("map_zones")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    @field_validator("fields")
+    @classmethod
+    def check_fields(cls, value: Optional[list[str]]) -> Optional[list[str]]:
+        """Check that the sparse fieldset only names map zone attributes"""
+        return check_fieldset(value, MapZoneAttributes)
+
 
 class MapZoneCreate(BaseModel):
     """Model for creating a map zone."""
@@ -179,3 +203,81 @@ class MapZoneUpdate(BaseModel):
     zone_type_id: Optional[int] = None
     city_id: Optional[int] = None
     boundary: Optional[WKTPolygon] = None
+
+
+class PointInZoneRequest(BaseModel):
+    """Model for looking up the zones that contain a point."""
+
+    point: WKTPoint
+    # Zones of every city are checked without a city
+    city_id: Optional[int] = Field(None, gt=0)
+
+
+class PointInZoneAttributes(BaseModel):
+    """Attributes of a map zone that contains a point, with its zone type and fees."""
+
+    zone_name: str
+    city_id: int
+    zone_type_id: int
+    type_name: str
+    speed_limit: Optional[int] = None
+    start_fee: float
+    end_fee: float
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class PointInZoneResource(BaseModel):
+    """JSON:API resource object for a map zone that contains a point."""
+
+    id: str
+    type: str = "map_zones"
+    attributes: PointInZoneAttributes
+    links: Optional[JsonApiLinks] = None
+
+    @classmethod
+    def from_indexed_zone(cls, zone: Any, collection_url: str) -> "PointInZoneResource":
+        """Create a PointInZoneResource from a zone of the zone index."""
+        return cls(
+            id=str(zone.id),
+            attributes=PointInZoneAttributes.model_validate(zone),
+            links=JsonApiLinks(self_link=f"{collection_url}/{zone.id}"),
+        )
+
+
+class ZoneClassifyRequest(BaseModel):
+    """Model for classifying many points by the zones that contain them.
+
+    Either points as [lon, lat] pairs, or a path as a WKT LineString whose vertices
+    are classified."""
+
+    points: Optional[list[tuple[float, float]]] = Field(None, max_length=MAX_CLASSIFY_POINTS)
+    path: Optional[WKTLineString] = None
+    # Zones of every city are checked without a city
+    city_id: Optional[int] = Field(None, gt=0)
+
+    @model_validator(mode="after")
+    def check_points(self) -> "ZoneClassifyRequest":
+        """Check that there are either points or a path, and that points are lon/lat."""
+        if (self.points is None) == (self.path is None):
+            raise ValueError("give either points or path")
+        if self.points is not None:
+            validate_coordinates(self.points)
+        return self
+
+    def coordinates(self) -> Any:
+        """The (lon, lat) coordinates to classify."""
+        if self.points is not None:
+            return self.points
+        return self.path.coordinates
+
+
+class ZoneClassifyResponse(BaseModel):
+    """Response of a zone classification.
+
+    data has the ids of the zones that contain each point, in the order of the
+    points, and included has those zones."""
+
+    data: list[list[int]]
+    included: list[PointInZoneResource]
+    links: JsonApiLinks
@@ -7,11 +7,17 @@ from fastapi import APIRouter, Depends, Query, Request, Security
 from api.db.repository_admin import AdminRepository as AdminRepoClass
 from api.dependencies.repository_factory import get_repository
 from api.models import db_models
-from api.models.admin_models import AdminGetRequestParams, AdminResource
+from api.models.admin_models import (
+    AdminGetRequestParams,
+    AdminResource,
+    MetricsAttributes,
+    MetricsResource,
+)
 from api.models.models import (
     JsonApiLinks,
     JsonApiResponse,
 )
+from api.services.metrics import metrics
 from api.services.oauth import security_check
 
 router = APIRouter(
@@ -61,3 +67,15 @@ async def get_admins(
         data=[AdminResource.from_db_model(admin, resource_url) for admin in admin],
         links=JsonApiLinks(self_link=resource_url),
     )
+
+
+@router.get("/metrics", response_model=JsonApiResponse[MetricsResource])
+async def get_metrics(
+    _: Annotated[int, Security(security_check, scopes=["admin"])],
+    request: Request,
+) -> JsonApiResponse[MetricsResource]:
+    """Get runtime metrics of this API process, like the socket emit queue depth"""
+    return JsonApiResponse(
+        data=MetricsResource(attributes=MetricsAttributes(values=metrics.snapshot())),
+        links=JsonApiLinks(self_link=str(request.url)),
+    )
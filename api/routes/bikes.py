@@ -12,19 +12,41 @@
 # TODO: Error handling
 # TODO: Efficient query param handling
 
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Request, Security, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    Security,
+    status,
+)
 
 from api.db.repository_bike import BikeRepository as BikeRepoClass
+from api.db.repository_telemetry import TelemetryRepository as TelemetryRepoClass
 from api.dependencies.repository_factory import get_repository
 from api.models import db_models
 from api.models.bike_models import (
+    MAX_TELEMETRY_POINTS,
+    AdminBikeAttributes,
+    BikeClusterGetRequestParams,
+    BikeClusterResource,
     BikeCreate,
     BikeGetRequestParams,
     BikeResource,
     BikeSocket,
+    BikeTelemetryBatch,
+    BikeTelemetryHistoryGetRequestParams,
+    BikeTelemetryHistoryResource,
+    BikeTelemetryResult,
     BikeUpdate,
+    FleetStatsGetRequestParams,
+    FleetStatsResource,
+    NearbyBikeGetRequestParams,
+    NearbyBikeResource,
     UserBikeGetRequestParams,
     ZoneBikeGetRequestParams,
 )
@@ -32,10 +54,25 @@ from api.models.models import (
     JsonApiError,
     JsonApiErrorResponse,
     JsonApiLinks,
+    JsonApiMetaResponse,
+    JsonApiPageResponse,
+    JsonApiPaginationLinks,
     JsonApiResponse,
 )
+from api.services.bike_clusters import (
+    CLUSTER_LAYER,
+    cell_zoom,
+    cluster_cache,
+    cluster_fleet,
+    cluster_rows,
+)
+from api.services.bike_write_buffer import bike_write_buffer
+from api.services.fleet_cache import FleetBike, fleet_cache
+from api.services.jsonapi import ResourceEncoder, jsonapi_response
 from api.services.oauth import security_check
-from api.services.socket import emit_update
+from api.services.resource_versions import not_modified
+from api.services.socket import emit_update, emit_updates_batch
+from api.services.tiles import tiles_bounds
 
 router = APIRouter(
     prefix="/v1/bikes",
@@ -47,6 +84,20 @@ BikeRepository = Annotated[
     Depends(get_repository(db_models.Bike, repository_class=BikeRepoClass)),
 ]
 
+TelemetryRepository = Annotated[
+    TelemetryRepoClass,
+    Depends(get_repository(db_models.BikeTelemetry, repository_class=TelemetryRepoClass)),
+]
+
+admin_bike_encoder = ResourceEncoder(
+    "bikes", AdminBikeAttributes, relationships={"city": ("cities", "city_id")}
+)
+
+# Bikes change all the time, so clients check them with If-None-Match on every use
+BIKE_CACHE_CONTROL = "private, no-cache"
+
+BikesNotModified = Annotated[Optional[Response], Depends(not_modified("bikes", BIKE_CACHE_CONTROL))]
+
 
 def raise_not_found(detail: str):
     """Raise a 404 error in JSON:API format.
@@ -81,49 +132,144 @@ async def get_bikes_in_zone(
     )
 
 
-@router.get("/", response_model=JsonApiResponse[BikeResource])
+@router.get("/", response_model=JsonApiPageResponse[BikeResource])
 async def get_all_bikes(
     _: Annotated[int, Security(security_check, scopes=["admin"])],
     request: Request,
     bike_repository: BikeRepository,
     query_params: Annotated[BikeGetRequestParams, Query()],
-) -> JsonApiResponse[BikeResource]:
-    """Get all bikes (admin only)."""
+) -> Response:
+    """Get all bikes (admin only). Page with the cursors in links.next and links.prev."""
     bikes = await bike_repository.get_bikes(**query_params.model_dump(exclude_none=True))
     base_url = str(request.base_url).rstrip("/") + request.url.path
 
-    return JsonApiResponse(
-        data=[BikeResource.from_db_model(bike, base_url, True) for bike in bikes],
-        links=JsonApiLinks(self_link=base_url.rsplit("/", 1)[0]),
+    return jsonapi_response(
+        admin_bike_encoder.encode(bikes, base_url, query_params.fields),
+        JsonApiPaginationLinks.from_page(
+            base_url.rsplit("/", 1)[0], request.url, bikes, query_params
+        ),
     )
 
 
-@router.get("/available", response_model=JsonApiResponse[BikeResource])
+@router.get("/available", response_model=JsonApiMetaResponse[BikeResource])
 async def get_available_bikes(
     request: Request,
     bike_repository: BikeRepository,
     query_params: Annotated[UserBikeGetRequestParams, Query()],
-) -> JsonApiResponse[BikeResource]:
-    """Get available bikes (user endpoint)."""
+) -> JsonApiMetaResponse[BikeResource]:
+    """Get available bikes (user endpoint). Served from the fleet cache when it is loaded."""
     params = query_params.model_dump(exclude_none=True)
-    params["is_available"] = True
-    bikes = await bike_repository.get_bikes(**params)
+    if fleet_cache.is_loaded:
+        bikes = fleet_cache.get_available_bikes(**params)
+        meta = fleet_cache.staleness()
+    else:
+        params["is_available"] = True
+        bikes = await bike_repository.get_bikes(**params)
+        meta = {"source": "database"}
     base_url = str(request.base_url).rstrip("/") + request.url.path
 
-    return JsonApiResponse(
+    return JsonApiMetaResponse(
         data=[BikeResource.from_db_model(bike, base_url, False) for bike in bikes],
         links=JsonApiLinks(self_link=base_url.rsplit("/", 1)[0]),
+        meta=meta,
     )
 
 
-@router.get("/{bike_id}", response_model=JsonApiResponse[BikeResource])
+@router.get("/nearby", response_model=JsonApiResponse[NearbyBikeResource])
+async def get_nearby_bikes(
+    request: Request,
+    bike_repository: BikeRepository,
+    query_params: Annotated[NearbyBikeGetRequestParams, Query()],
+) -> JsonApiResponse[NearbyBikeResource]:
+    """Get the available bikes nearest to a point, closest first (user endpoint)."""
+    bikes = await bike_repository.get_nearby_bikes(**query_params.model_dump())
+    base_url = str(request.base_url).rstrip("/") + "/v1/bikes/"
+
+    return JsonApiResponse(
+        data=[NearbyBikeResource.from_nearby_model(bike, base_url) for bike in bikes],
+        links=JsonApiLinks(self_link=str(request.url)),
+    )
+
+
+@router.get("/clusters", response_model=JsonApiMetaResponse[BikeClusterResource])
+async def get_bike_clusters(
+    request: Request,
+    bike_repository: BikeRepository,
+    query_params: Annotated[BikeClusterGetRequestParams, Query()],
+) -> JsonApiMetaResponse[BikeClusterResource]:
+    """Get the available bikes in a bbox clustered into grid cells (user endpoint).
+
+    The cell size follows the zoom level, and clusters are computed for every map tile
+    that the bbox overlaps, so cells near the edges may reach outside the bbox."""
+    zoom = query_params.zoom
+    tiles = query_params.tiles
+    clusters = {tile: cluster_cache.get(CLUSTER_LAYER, zoom, *tile) for tile in tiles}
+    missing = {tile for tile, tile_clusters in clusters.items() if tile_clusters is None}
+
+    if missing:
+        version = cluster_cache.version(CLUSTER_LAYER)
+        if fleet_cache.is_loaded:
+            computed = cluster_fleet(fleet_cache.bikes(), zoom, missing)
+            meta = fleet_cache.staleness()
+        else:
+            # Query the whole of every missing tile, since the clusters are cached per tile
+            bounds = tiles_bounds(zoom, missing)
+            rows = await bike_repository.get_bike_clusters(cell_zoom(zoom), bounds)
+            computed = cluster_rows(rows, zoom, missing)
+            meta = {"source": "database"}
+        for tile, tile_clusters in computed.items():
+            cluster_cache.put(CLUSTER_LAYER, zoom, *tile, tile_clusters, version)
+        clusters.update(computed)
+    else:
+        meta = {"source": "cluster_cache"}
+
+    return JsonApiMetaResponse(
+        data=[
+            BikeClusterResource.from_cluster(cluster)
+            for tile in tiles
+            for cluster in clusters[tile]
+        ],
+        links=JsonApiLinks(self_link=str(request.url)),
+        meta=meta | {"zoom": zoom, "cell_zoom": cell_zoom(zoom)},
+    )
+
+
+@router.get("/stats", response_model=JsonApiResponse[FleetStatsResource])
+async def get_fleet_stats(
+    _: Annotated[int, Security(security_check, scopes=["admin"])],
+    request: Request,
+    bike_repository: BikeRepository,
+    query_params: Annotated[FleetStatsGetRequestParams, Query()],
+) -> JsonApiResponse[FleetStatsResource]:
+    """Get the bike counts per status, the battery histogram and the low battery count
+    of a city, or of every city (admin only).
+
+    Served from counters that are kept up to date by the database, so it does not
+    scan the bikes table."""
+    counters = await bike_repository.get_fleet_stats(query_params.city_id)
+
+    return JsonApiResponse(
+        data=FleetStatsResource.from_counters(counters, query_params.city_id),
+        links=JsonApiLinks(self_link=str(request.url)),
+    )
+
+
+@router.get(
+    "/{bike_id}",
+    response_model=JsonApiResponse[BikeResource],
+    responses={304: {"description": "Not modified"}},
+)
 async def get_bike(
     _: Annotated[int, Security(security_check, scopes=["admin"])],
     request: Request,
+    unchanged: BikesNotModified,
     bike_id: int,
     bike_repository: BikeRepository,
 ) -> JsonApiResponse[BikeResource]:
     """Get a bike by ID."""
+    if unchanged is not None:
+        return unchanged
+
     bike = await bike_repository.get_bike(bike_id)
 
     base_url = str(request.base_url).rstrip("/") + request.url.path
@@ -136,6 +282,35 @@ async def get_bike(
     )
 
 
+@router.get(
+    "/{bike_id}/telemetry", response_model=JsonApiMetaResponse[BikeTelemetryHistoryResource]
+)
+async def get_bike_telemetry(
+    _: Annotated[int, Security(security_check, scopes=["admin"])],
+    request: Request,
+    bike_id: int,
+    telemetry_repository: TelemetryRepository,
+    query_params: Annotated[BikeTelemetryHistoryGetRequestParams, Query()],
+) -> JsonApiMetaResponse[BikeTelemetryHistoryResource]:
+    """Get the telemetry history of a bike, per time bucket or every report (admin only).
+
+    Buckets start at multiples of the resolution since the Unix epoch, in UTC, so the
+    first bucket may start before from. Reports are kept with BIKE_TELEMETRY_HISTORY."""
+    source, rows = await telemetry_repository.get_history(
+        bike_id,
+        query_params.from_,
+        query_params.to,
+        query_params.step,
+        MAX_TELEMETRY_POINTS,
+    )
+
+    return JsonApiMetaResponse(
+        data=[BikeTelemetryHistoryResource.from_row(row) for row in rows],
+        links=JsonApiLinks(self_link=str(request.url)),
+        meta={"resolution": query_params.resolution, "source": source},
+    )
+
+
 @router.post("/", response_model=JsonApiResponse[BikeResource], status_code=status.HTTP_201_CREATED)
 async def add_bike(
     _: Annotated[int, Security(security_check, scopes=["admin"])],
@@ -158,22 +333,39 @@ async def add_bike(
 async def update_bike(
     _: Annotated[int, Security(security_check, scopes=["admin"])],
     request: Request,
+    response: Response,
     bike_id: int,
     bike_update: BikeUpdate,
     bike_repository: BikeRepository,
 ) -> JsonApiResponse[BikeResource]:
-    """Update a bike."""
+    """Update a bike.
+
+    With write-behind enabled the update is buffered and written to the database in
+    bulk later. The response is then 202 Accepted with the bike from the fleet cache."""
+    update_data = bike_update.model_dump(exclude={"speed"}, exclude_unset=True)
+    base_url = str(request.base_url).rstrip("/") + request.url.path.rsplit("/", 1)[0]
+    if bike_write_buffer.is_running and fleet_cache.is_loaded:
+        cached = fleet_cache.get(bike_id)
+        if cached is None:
+            raise_not_found(f"Bike with ID {bike_id} not found")
+        # Bikes that the change feed added since the last sync have no created_at in
+        # the cache, so they are updated in the database
+        if cached.created_at is not None:
+            buffer_bike_update(cached, bike_update, update_data)
+            response.status_code = status.HTTP_202_ACCEPTED
+            return JsonApiResponse(
+                data=BikeResource.from_db_model(cached, base_url, True),
+                links=JsonApiLinks(self_link=base_url),
+            )
+
     bike = await bike_repository.get(bike_id)
     if bike is None:
         raise_not_found(f"Bike with ID {bike_id} not found")
-    update_data = bike_update.model_dump(exclude={"speed"}, exclude_unset=True)
     updated_bike = await bike_repository.update_bike(bike_id, update_data)
     if updated_bike is None:
         raise_not_found(f"Failed to update bike with ID {bike_id}")
 
-    base_url = str(request.base_url).rstrip("/") + request.url.path.rsplit("/", 1)[0]
-
-    await emit_update(BikeSocket(**bike_update.model_dump(), bike_id=bike_id))
+    emit_update(BikeSocket(**bike_update.model_dump(), bike_id=bike_id))
 
     return JsonApiResponse(
         data=BikeResource.from_db_model(updated_bike, base_url, True),
@@ -181,6 +373,47 @@ async def update_bike(
     )
 
 
+def buffer_bike_update(cached: FleetBike, bike_update: BikeUpdate, update_data: dict) -> None:
+    """Buffer a bike update in the write-behind buffer and write it through to the
+    fleet cache, without a database round trip."""
+    bike_write_buffer.enqueue(cached.id, update_data)
+    fleet_cache.update(
+        cached.id, **{key: value for key, value in update_data.items() if key != "meta_data"}
+    )
+    emit_update(BikeSocket(**bike_update.model_dump(), bike_id=cached.id))
+
+
+@router.post("/telemetry:batch", response_model=JsonApiResponse[BikeTelemetryResult])
+async def ingest_telemetry_batch(
+    _: Annotated[int, Security(security_check, scopes=["admin"])],
+    request: Request,
+    batch: BikeTelemetryBatch,
+    bike_repository: BikeRepository,
+) -> JsonApiResponse[BikeTelemetryResult]:
+    """Apply a batch of bike reports in one transaction (admin only)."""
+    reports = [
+        report.model_dump(exclude={"speed"}, exclude_unset=True) | {"bike_id": report.bike_id}
+        for report in batch.reports
+    ]
+    updated_ids = await bike_repository.update_bikes_bulk(reports)
+
+    emit_updates_batch(
+        [
+            BikeSocket(**report.model_dump())
+            for report in batch.reports
+            if report.bike_id in updated_ids
+        ]
+    )
+
+    return JsonApiResponse(
+        data=[
+            BikeTelemetryResult.from_bike_id(bike_id, bike_id in updated_ids)
+            for bike_id in dict.fromkeys(report.bike_id for report in batch.reports)
+        ],
+        links=JsonApiLinks(self_link=str(request.url)),
+    )
+
+
 @router.delete("/{bike_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def remove_bike(
     _: Annotated[int, Security(security_check, scopes=["admin"])],
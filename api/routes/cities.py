@@ -1,8 +1,8 @@
 """Module for the /cities routes"""
 
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Request, Response
 
 from api.db.repository_city import (
     CityRepository as CityRepoClass,
@@ -17,6 +17,10 @@ from api.models.models import (
     JsonApiLinks,
     JsonApiResponse,
 )
+from api.services.resource_versions import not_modified
+
+# Cities are seldom added, clients can keep them for a few minutes before checking
+CITIES_CACHE_CONTROL = "public, max-age=300"
 
 router = APIRouter(
     prefix="/v1/cities",
@@ -29,14 +33,26 @@ CityRepository = Annotated[
     Depends(get_repository(db_models.City, repository_class=CityRepoClass)),
 ]
 
+CitiesNotModified = Annotated[
+    Optional[Response], Depends(not_modified("cities", CITIES_CACHE_CONTROL))
+]
+
 
-@router.get("/", response_model=JsonApiResponse[CityResource])
+@router.get(
+    "/",
+    response_model=JsonApiResponse[CityResource],
+    responses={304: {"description": "Not modified"}},
+)
 async def get_cities(
     request: Request,
+    unchanged: CitiesNotModified,
     city_repository: CityRepository,
     query_params: CityGetRequestParams = Depends(),
 ) -> JsonApiResponse[CityResource]:
-    """Get cities from the db"""
+    """Get cities from the db, or 304 if If-None-Match has the current ETag"""
+    if unchanged is not None:
+        return unchanged
+
     cities = await city_repository.get_cities(**query_params.model_dump(exclude_none=True))
     base_url = str(request.base_url).rstrip("/")
     collection_url = f"{base_url}/v1/cities"
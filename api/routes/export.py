@@ -0,0 +1,107 @@
+"""Module for the /export routes"""
+
+from collections.abc import Awaitable, Callable
+from typing import Annotated
+
+from fastapi import APIRouter, Query, Security
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
+
+from api.db.database import sessionmanager
+from api.db.repository_bike import BikeRepository
+from api.db.repository_transaction import TransactionRepository
+from api.db.repository_trip import TripRepository
+from api.db.repository_user import UserRepository
+from api.models.export_models import (
+    BikeExportParams,
+    ExportFormat,
+    TransactionExportParams,
+    TripExportParams,
+    UserExportParams,
+)
+from api.services.export import MEDIA_TYPES, encode_rows
+from api.services.oauth import security_check
+
+router = APIRouter(
+    prefix="/v1/export",
+    tags=["export"],
+    responses={404: {"description": "Not found"}},
+)
+
+EXPORT_RESPONSES = {200: {"content": {media_type: {} for media_type in MEDIA_TYPES.values()}}}
+
+
+def export_response(
+    resource: str,
+    export_format: ExportFormat,
+    export: Callable[[AsyncSession], Awaitable[AsyncResult]],
+) -> StreamingResponse:
+    """Stream the rows of an export query as an attachment in the export format."""
+
+    async def chunks():
+        # The request session is closed before a streaming body is sent, so use our own
+        async with sessionmanager.session() as session:
+            async for chunk in encode_rows(await export(session), export_format):
+                yield chunk
+
+    return StreamingResponse(
+        chunks(),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{resource}.{export_format}"'},
+    )
+
+
+@router.get("/bikes", response_class=StreamingResponse, responses=EXPORT_RESPONSES)
+async def export_bikes(
+    _: Annotated[int, Security(security_check, scopes=["admin"])],
+    query_params: Annotated[BikeExportParams, Query()],
+) -> StreamingResponse:
+    """Export every matching bike as NDJSON or CSV (admin only)."""
+    params = query_params.model_dump(exclude_none=True)
+    return export_response(
+        "bikes",
+        query_params.format,
+        lambda session: BikeRepository(session).export_bikes(**params),
+    )
+
+
+@router.get("/trips", response_class=StreamingResponse, responses=EXPORT_RESPONSES)
+async def export_trips(
+    _: Annotated[int, Security(security_check, scopes=["admin"])],
+    query_params: Annotated[TripExportParams, Query()],
+) -> StreamingResponse:
+    """Export every matching trip as NDJSON or CSV (admin only)."""
+    params = query_params.model_dump(exclude_none=True)
+    return export_response(
+        "trips",
+        query_params.format,
+        lambda session: TripRepository(session).export_trips(**params),
+    )
+
+
+@router.get("/users", response_class=StreamingResponse, responses=EXPORT_RESPONSES)
+async def export_users(
+    _: Annotated[int, Security(security_check, scopes=["admin"])],
+    query_params: Annotated[UserExportParams, Query()],
+) -> StreamingResponse:
+    """Export every matching user as NDJSON or CSV (admin only)."""
+    params = query_params.model_dump(exclude_none=True)
+    return export_response(
+        "users",
+        query_params.format,
+        lambda session: UserRepository(session).export_users(**params),
+    )
+
+
+@router.get("/transactions", response_class=StreamingResponse, responses=EXPORT_RESPONSES)
+async def export_transactions(
+    _: Annotated[int, Security(security_check, scopes=["admin"])],
+    query_params: Annotated[TransactionExportParams, Query()],
+) -> StreamingResponse:
+    """Export every matching transaction as NDJSON or CSV (admin only)."""
+    params = query_params.model_dump(exclude_none=True)
+    return export_response(
+        "transactions",
+        query_params.format,
+        lambda session: TransactionRepository(session).export_transactions(**params),
+    )
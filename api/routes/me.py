@@ -2,7 +2,7 @@
 
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Request, Security, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Security, status
 
 from api.db.repository_transaction import TransactionRepository as TransactionRepoClass
 from api.db.repository_trip import TripRepository as TripRepoClass
@@ -13,10 +13,13 @@ from api.models.models import (
     JsonApiError,
     JsonApiErrorResponse,
     JsonApiLinks,
+    JsonApiPageResponse,
+    JsonApiPaginationLinks,
     JsonApiResponse,
 )
 from api.models.transaction_models import TransactionResourceMinimal
 from api.models.trip_models import (
+    TripGetRequestParams,
     TripResource,
 )
 from api.models.user_models import UserResource, UserUpdate
@@ -93,22 +96,25 @@ async def update_my_user(
     )
 
 
-@router.get("/trips", response_model=JsonApiResponse[TripResource])
+@router.get("/trips", response_model=JsonApiPageResponse[TripResource])
 async def get_my_trips(
     user_id: Annotated[int, Security(security_check, scopes=["user"])],
     trip_repository: TripRepository,
     request: Request,
-) -> JsonApiResponse[TripResource]:
-    """Get all trips for your user"""
-    filter_dict = {"user_id": user_id}
-    user = await trip_repository.get_trips(**filter_dict)
+    query_params: Annotated[TripGetRequestParams, Query()],
+) -> JsonApiPageResponse[TripResource]:
+    """Get a page of trips for your user"""
+    params = query_params.model_dump(exclude_none=True) | {"user_id": user_id}
+    trips = await trip_repository.get_trips(**params)
 
     base_url = str(request.base_url).rstrip("/")
     resource_url = f"{base_url}/v1/me/trips"
 
-    return JsonApiResponse(
-        data=[TripResource.from_db_model(trip, resource_url) for trip in user],
-        links=JsonApiLinks(self_link=resource_url),
+    return JsonApiPageResponse(
+        data=[
+            TripResource.from_db_model(trip, resource_url, query_params.fields) for trip in trips
+        ],
+        links=JsonApiPaginationLinks.from_page(resource_url, request.url, trips, query_params),
     )
 
 
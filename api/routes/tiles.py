@@ -0,0 +1,76 @@
+"""Module for the /tiles routes"""
+
+import hashlib
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends, Header, Path, Response, status
+
+from api.db.repository_bike import BikeRepository as BikeRepoClass
+from api.db.repository_zone import MapZoneRepository as MapZoneRepoClass
+from api.dependencies.repository_factory import get_repository
+from api.exceptions import TileNotFoundException
+from api.models import db_models
+from api.services.tile_cache import tile_cache
+from api.services.tiles import is_valid_tile
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+router = APIRouter(
+    prefix="/v1/tiles",
+    tags=["tiles"],
+    responses={404: {"description": "Not found"}},
+)
+
+BikeRepository = Annotated[
+    BikeRepoClass,
+    Depends(get_repository(db_models.Bike, repository_class=BikeRepoClass)),
+]
+
+MapZoneRepository = Annotated[
+    MapZoneRepoClass,
+    Depends(get_repository(db_models.MapZone, repository_class=MapZoneRepoClass)),
+]
+
+
+def tile_etag(tile: bytes) -> str:
+    """Strong ETag of an encoded tile."""
+    return f'"{hashlib.blake2b(tile, digest_size=16).hexdigest()}"'
+
+
+@router.get(
+    "/{z}/{x}/{y}.mvt",
+    response_class=Response,
+    responses={200: {"content": {MVT_MEDIA_TYPE: {}}}, 304: {"description": "Not modified"}},
+)
+async def get_tile(
+    bike_repository: BikeRepository,
+    map_zone_repository: MapZoneRepository,
+    z: int = Path(..., ge=0, le=22),
+    x: int = Path(..., ge=0),
+    y: int = Path(..., ge=0),
+    if_none_match: Annotated[Optional[str], Header()] = None,
+) -> Response:
+    """Get a Mapbox Vector Tile with a "bikes" layer of available bikes and a
+    zones_<type_name> layer of map zone boundaries per zone type."""
+    if not is_valid_tile(z, x, y):
+        raise TileNotFoundException(f"Tile {z}/{x}/{y} is outside the tile grid")
+
+    layers = []
+    for layer, build in (
+        ("bikes", bike_repository.get_bike_tile),
+        ("zones", map_zone_repository.get_map_zone_tile),
+    ):
+        tile = tile_cache.get(layer, z, x, y)
+        if tile is None:
+            version = tile_cache.version(layer)
+            tile = await build(z, x, y)
+            tile_cache.put(layer, z, x, y, tile, version)
+        layers.append(tile)
+
+    tile = b"".join(layers)
+    etag = tile_etag(tile)
+    # Clients keep the tile but check it with If-None-Match before using it again
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=tile, media_type=MVT_MEDIA_TYPE, headers=headers)
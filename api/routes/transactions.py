@@ -11,6 +11,8 @@ from api.dependencies.repository_factory import get_repository
 from api.models import db_models
 from api.models.models import (
     JsonApiLinks,
+    JsonApiPageResponse,
+    JsonApiPaginationLinks,
     JsonApiResponse,
 )
 from api.models.transaction_models import (
@@ -32,13 +34,13 @@ TransactionRepository = Annotated[
 ]
 
 
-@router.get("/", response_model=JsonApiResponse[TransactionResourceMinimal])
+@router.get("/", response_model=JsonApiPageResponse[TransactionResourceMinimal])
 async def get_transactions(
     _: Annotated[int, Security(security_check, scopes=["admin"])],
     transaction_repository: TransactionRepository,
     request: Request,
     query_params: Annotated[TransactionGetRequestParams, Query()],
-) -> JsonApiResponse[TransactionResourceMinimal]:
+) -> JsonApiPageResponse[TransactionResourceMinimal]:
     """Get transactions from the db. Defaults to showing first 100 transactions"""
     transactions = await transaction_repository.get_transactions(
         **query_params.model_dump(exclude_none=True)
@@ -46,14 +48,16 @@ async def get_transactions(
     base_url = str(request.base_url).rstrip("/")
     collection_url = f"{base_url}/v1/transactions"
 
-    return JsonApiResponse(
+    return JsonApiPageResponse(
         data=[
             TransactionResourceMinimal.from_db_model(
                 transaction, f"{collection_url}/{transaction.id}"
             )
             for transaction in transactions
         ],
-        links=JsonApiLinks(self_link=collection_url),
+        links=JsonApiPaginationLinks.from_page(
+            collection_url, request.url, transactions, query_params
+        ),
     )
 
 
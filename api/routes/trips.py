@@ -2,9 +2,11 @@
 
 from typing import Annotated
 
-from fastapi import APIRouter, Body, Depends, Path, Query, Request, Security, status
+from fastapi import APIRouter, Body, Depends, Path, Query, Request, Response, Security, status
+from fastapi.responses import StreamingResponse
 from tsidpy import TSID
 
+from api.db.database import sessionmanager
 from api.db.repository_bike import BikeRepository as BikeRepoClass
 from api.db.repository_trip import TripRepository as TripRepoClass
 from api.db.repository_user import UserRepository as UserRepoClass
@@ -16,17 +18,22 @@ from api.models import db_models
 from api.models.bike_models import BikeSocketStartEnd
 from api.models.models import (
     JsonApiLinks,
+    JsonApiPageResponse,
+    JsonApiPaginationLinks,
     JsonApiResponse,
 )
 from api.models.trip_models import (
+    TripAttributes,
     TripCreate,
     TripEndRepoParams,
+    TripFilterParams,
     TripGetRequestParams,
     TripId,
     TripResource,
     UserTripStart,
 )
 from api.services.bike_caller import get_bike_service
+from api.services.jsonapi import ResourceEncoder, jsonapi_response
 from api.services.oauth import security_check
 from api.services.socket import emit_update_start_end
 
@@ -50,26 +57,62 @@ BikeRepository = Annotated[
     BikeRepoClass,
     Depends(get_repository(db_models.Bike, repository_class=BikeRepoClass)),
 ]
+
+# Trips are selected without their transaction, so it is always null in pages
+trip_encoder = ResourceEncoder(
+    "trips",
+    TripAttributes,
+    relationships={"user": ("users", "user_id"), "bike": ("bikes", "bike_id"), "transaction": None},
+    string_id=False,
+)
+
 # TODO: Error handling
 
 
-@router.get("/", response_model=JsonApiResponse[TripResource])
+@router.get("/", response_model=JsonApiPageResponse[TripResource])
 async def get_trips(
     _: Annotated[int, Security(security_check, scopes=["admin"])],
     request: Request,
     trip_repository: TripRepository,
     query_params: Annotated[TripGetRequestParams, Query()],
-) -> JsonApiResponse[TripResource]:
-    """Get all trips from the database."""
+) -> Response:
+    """Get a page of trips from the database."""
     trips = await trip_repository.get_trips(**query_params.model_dump(exclude_none=True))
     base_url = str(request.base_url).rstrip("/") + request.url.path
 
-    return JsonApiResponse(
-        data=[TripResource.from_db_model(trip, base_url) for trip in trips],
-        links=JsonApiLinks(self_link=base_url.rsplit("/", 1)[0]),
+    return jsonapi_response(
+        trip_encoder.encode(trips, base_url, query_params.fields),
+        JsonApiPaginationLinks.from_page(
+            base_url.rsplit("/", 1)[0], request.url, trips, query_params
+        ),
     )
 
 
+@router.get(
+    "/stream",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+)
+async def stream_trips(
+    _: Annotated[int, Security(security_check, scopes=["admin"])],
+    request: Request,
+    query_params: Annotated[TripFilterParams, Query()],
+) -> StreamingResponse:
+    """Stream every matching trip as newline delimited JSON:API resources (admin only)."""
+    params = query_params.model_dump(exclude_none=True)
+    base_url = str(request.base_url).rstrip("/") + "/v1/trips/"
+
+    async def trip_lines():
+        # The request session is closed before a streaming body is sent, so use our own
+        async with sessionmanager.session() as session:
+            async for trip in TripRepoClass(session).stream_trips(**params):
+                resource = TripResource.from_db_model(trip, base_url, query_params.fields)
+                yield resource.model_dump_json(by_alias=True)
+                yield "\n"
+
+    return StreamingResponse(trip_lines(), media_type="application/x-ndjson")
+
+
 @router.get("/{trip_id}", response_model=JsonApiResponse[TripResource])
 async def get_trip(
     _: Annotated[int, Security(security_check, scopes=["admin"])],
@@ -121,7 +164,7 @@ async def start_trip(
     created_trip = await trip_repository.add_trip(trip_data)
 
     # Emit bike status to socket
-    await emit_update_start_end(
+    emit_update_start_end(
         BikeSocketStartEnd(**bike_data.log.model_dump(), **bike_data.report.model_dump()),
         "bike_update_start",
     )
@@ -172,7 +215,7 @@ async def end_trip(
     updated_trip = await trip_repository.end_trip(repo_params, bike_response.report.is_available)
 
     # Emit bike status to socket
-    await emit_update_start_end(
+    emit_update_start_end(
         BikeSocketStartEnd(**bike_response.report.model_dump(), **bike_response.log.model_dump()),
         "bike_update_end",
     )
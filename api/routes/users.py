@@ -11,12 +11,15 @@ from api.dependencies.repository_factory import get_repository
 from api.models import db_models
 from api.models.models import (
     JsonApiLinks,
+    JsonApiPageResponse,
+    JsonApiPaginationLinks,
     JsonApiResponse,
 )
 from api.models.transaction_models import (
     TransactionResourceMinimal,
 )
 from api.models.trip_models import (
+    TripGetRequestParams,
     TripResource,
 )
 from api.models.user_models import (
@@ -69,24 +72,24 @@ async def get_user(
     )
 
 
-@router.get("/", response_model=JsonApiResponse[UserResourceMinimal])
+@router.get("/", response_model=JsonApiPageResponse[UserResourceMinimal])
 async def get_users(
     _: Annotated[db_models.User, Security(security_check, scopes=["admin"])],
     request: Request,
     user_repository: UserRepository,
     query_params: Annotated[UserGetRequestParams, Query()],
-) -> JsonApiResponse[UserResourceMinimal]:
+) -> JsonApiPageResponse[UserResourceMinimal]:
     """Get users from the db. Defaults to showing first 100 users"""
     users = await user_repository.get_users(**query_params.model_dump(exclude_none=True))
     base_url = str(request.base_url).rstrip("/")
     collection_url = f"{base_url}/v1/users"
 
-    return JsonApiResponse(
+    return JsonApiPageResponse(
         data=[
             UserResourceMinimal.from_db_model_deleted(user, f"{collection_url}/{user.id}")
             for user in users
         ],
-        links=JsonApiLinks(self_link=collection_url),
+        links=JsonApiPaginationLinks.from_page(collection_url, request.url, users, query_params),
     )
 
 
@@ -133,23 +136,26 @@ async def update_user(
     )
 
 
-@router.get("/{user_id}/trips", response_model=JsonApiResponse[TripResource])
+@router.get("/{user_id}/trips", response_model=JsonApiPageResponse[TripResource])
 async def get_user_trips(
     _: Annotated[db_models.User, Security(security_check, scopes=["admin"])],
     trip_repository: TripRepository,
     request: Request,
+    query_params: Annotated[TripGetRequestParams, Query()],
     user_id: int = Path(..., ge=1),
-) -> JsonApiResponse[TripResource]:
-    """Get all trips for a user"""
-    filter_dict = {"user_id": user_id}
-    user = await trip_repository.get_trips(filter_dict)
+) -> JsonApiPageResponse[TripResource]:
+    """Get a page of trips for a user"""
+    params = query_params.model_dump(exclude_none=True) | {"user_id": user_id}
+    trips = await trip_repository.get_trips(**params)
 
     base_url = str(request.base_url).rstrip("/")
     resource_url = f"{base_url}/v1/users/{user_id}/trips"
 
-    return JsonApiResponse(
-        data=[TripResource.from_db_model(trip, resource_url) for trip in user],
-        links=JsonApiLinks(self_link=resource_url),
+    return JsonApiPageResponse(
+        data=[
+            TripResource.from_db_model(trip, resource_url, query_params.fields) for trip in trips
+        ],
+        links=JsonApiPaginationLinks.from_page(resource_url, request.url, trips, query_params),
     )
 
 
@@ -1,8 +1,8 @@
 """Module for the /zones routes"""
 
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, Path, Query, Request, Security, status
+from fastapi import APIRouter, Depends, Path, Query, Request, Response, Security, status
 
 from api.db.repository_zone import (
     MapZoneRepository as MapZoneRepoClass,
@@ -14,20 +14,29 @@ from api.dependencies.repository_factory import get_repository
 from api.models import db_models
 from api.models.models import (
     JsonApiLinks,
+    JsonApiPageResponse,
+    JsonApiPaginationLinks,
     JsonApiResponse,
 )
-from api.models.wkt_models import WKTPoint
 from api.models.zone_models import (
+    MapZoneAttributes,
     MapZoneCreate,
     MapZoneGetRequestParams,
     MapZoneResource,
     MapZoneResourceMinimal,
     MapZoneUpdate,
+    PointInZoneRequest,
+    PointInZoneResource,
+    ZoneClassifyRequest,
+    ZoneClassifyResponse,
     ZoneTypeCreate,
     ZoneTypeResource,
     ZoneTypeUpdate,
 )
+from api.services.jsonapi import ResourceEncoder, jsonapi_response
 from api.services.oauth import security_check
+from api.services.resource_versions import not_modified
+from api.services.zone_index import zone_index
 
 router = APIRouter(
     prefix="/v1/zones",
@@ -45,32 +54,64 @@ MapZoneRepository = Annotated[
     Depends(get_repository(db_models.MapZone, repository_class=MapZoneRepoClass)),
 ]
 
+map_zone_encoder = ResourceEncoder("map_zones", MapZoneAttributes)
 
-@router.get("/", response_model=JsonApiResponse[MapZoneResourceMinimal])
+# Clients check zones with If-None-Match after a minute, zone types after a few
+MAP_ZONES_CACHE_CONTROL = "public, max-age=60"
+ZONE_TYPES_CACHE_CONTROL = "public, max-age=300"
+
+MapZonesNotModified = Annotated[
+    Optional[Response], Depends(not_modified("map_zones", MAP_ZONES_CACHE_CONTROL))
+]
+
+ZoneTypesNotModified = Annotated[
+    Optional[Response], Depends(not_modified("zone_types", ZONE_TYPES_CACHE_CONTROL))
+]
+
+
+@router.get(
+    "/",
+    response_model=JsonApiPageResponse[MapZoneResourceMinimal],
+    responses={304: {"description": "Not modified"}},
+)
 async def get_zones(
     request: Request,
+    response: Response,
+    unchanged: MapZonesNotModified,
     map_zone_repository: MapZoneRepository,
     query_params: Annotated[MapZoneGetRequestParams, Query()],
-) -> JsonApiResponse[MapZoneResourceMinimal]:
+) -> Response:
     """Get zones from the db. Defaults to showing first 100 zones"""
+    if unchanged is not None:
+        return unchanged
+
     zones = await map_zone_repository.get_map_zones(**query_params.model_dump(exclude_none=True))
     base_url = str(request.base_url).rstrip("/")
     collection_url = f"{base_url}/v1/zones"
 
-    return JsonApiResponse(
-        data=[
-            MapZoneResourceMinimal.from_db_model(zone, f"{collection_url}/{zone.id}")
-            for zone in zones
-        ],
-        links=JsonApiLinks(self_link=collection_url),
+    page = jsonapi_response(
+        map_zone_encoder.encode(zones, f"{collection_url}/", query_params.fields),
+        JsonApiPaginationLinks.from_page(collection_url, request.url, zones, query_params),
     )
+    # The headers of the response param are not sent with a returned Response
+    page.headers.update(response.headers)
+    return page
 
 
-@router.get("/types", response_model=JsonApiResponse[ZoneTypeResource])
+@router.get(
+    "/types",
+    response_model=JsonApiResponse[ZoneTypeResource],
+    responses={304: {"description": "Not modified"}},
+)
 async def get_zone_types(
-    request: Request, zone_type_repository: ZoneTypeRepository
+    request: Request,
+    unchanged: ZoneTypesNotModified,
+    zone_type_repository: ZoneTypeRepository,
 ) -> JsonApiResponse[ZoneTypeResource]:
     """Get all zone types"""
+    if unchanged is not None:
+        return unchanged
+
     zone_types = await zone_type_repository.get_zone_types()
 
     base_url = str(request.base_url).rstrip("/")
@@ -211,20 +252,45 @@ async def delete_zone_type(
     return
 
 
-@router.post("/point_in_zone", response_model=JsonApiResponse[MapZoneResource])
+@router.post("/point_in_zone", response_model=JsonApiResponse[PointInZoneResource])
 async def get_point_in_zone(
     _: Annotated[db_models.User, Security(security_check, scopes=["admin"])],
     map_zone_repository: MapZoneRepository,
     request: Request,
-    point: WKTPoint,
-) -> JsonApiResponse[MapZoneResource]:
-    """Get a zone by point"""
-    zone = await map_zone_repository.check_if_point_in_zones(point)
+    lookup: PointInZoneRequest,
+) -> JsonApiResponse[PointInZoneResource]:
+    """Get every zone that contains a point, from the in-process zone index"""
+    if not zone_index.is_loaded:
+        await map_zone_repository.rebuild_zone_index()
+    zones = zone_index.find(lookup.point, lookup.city_id)
 
     base_url = str(request.base_url).rstrip("/")
-    resource_url = f"{base_url}/v1/zones/{zone.id}"
+    collection_url = f"{base_url}/v1/zones"
 
     return JsonApiResponse(
-        data=MapZoneResource.from_db_model(zone, resource_url),
-        links=JsonApiLinks(self_link=resource_url),
+        data=[PointInZoneResource.from_indexed_zone(zone, collection_url) for zone in zones],
+        links=JsonApiLinks(self_link=f"{collection_url}/point_in_zone"),
+    )
+
+
+@router.post("/classify", response_model=ZoneClassifyResponse)
+async def classify_points(
+    _: Annotated[db_models.User, Security(security_check, scopes=["admin"])],
+    map_zone_repository: MapZoneRepository,
+    request: Request,
+    classify: ZoneClassifyRequest,
+) -> ZoneClassifyResponse:
+    """Get the zones that contain each of many points, or each vertex of a path,
+    from the in-process zone index"""
+    if not zone_index.is_loaded:
+        await map_zone_repository.rebuild_zone_index()
+    zone_ids, zones = zone_index.classify(classify.coordinates(), classify.city_id)
+
+    base_url = str(request.base_url).rstrip("/")
+    collection_url = f"{base_url}/v1/zones"
+
+    return ZoneClassifyResponse(
+        data=zone_ids,
+        included=[PointInZoneResource.from_indexed_zone(zone, collection_url) for zone in zones],
+        links=JsonApiLinks(self_link=f"{collection_url}/classify"),
     )
@@ -0,0 +1,118 @@
+"""Module for clustering bikes into grid cells for zoomed-out maps
+
+A cluster counts the available bikes in one grid cell. The cells of a map tile at
+a zoom level are the tiles CELL_ZOOM_OFFSET zoom levels further in, so every map
+tile is split into a fixed grid of cells and the cell size follows the zoom level.
+Clusters are computed per map tile and cached per tile with a short max age.
+"""
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from api.config import settings
+from api.services.fleet_cache import FleetBike
+from api.services.tile_cache import TileCache
+from api.services.tiles import lonlat_to_tile
+
+# Every map tile is split into 2**CELL_ZOOM_OFFSET by 2**CELL_ZOOM_OFFSET cells
+CELL_ZOOM_OFFSET = 3
+
+# Cache layer of the bike clusters
+CLUSTER_LAYER = "bike_clusters"
+
+
+@dataclass(slots=True)
+class BikeCluster:
+    """Available bikes in a grid cell, the cell being the tile x/y at cell_zoom."""
+
+    cell_zoom: int
+    x: int
+    y: int
+    count: int
+    avg_battery: float
+    lon: float
+    lat: float
+
+    @property
+    def id(self) -> str:
+        """The cell as a z/x/y tile."""
+        return f"{self.cell_zoom}/{self.x}/{self.y}"
+
+    @property
+    def centroid(self) -> str:
+        """Mean position of the bikes as a WKT point."""
+        return f"POINT({self.lon} {self.lat})"
+
+
+def cell_zoom(zoom: int) -> int:
+    """Get the zoom level of the grid cells for a map zoom level."""
+    return zoom + CELL_ZOOM_OFFSET
+
+
+def cluster_fleet(
+    bikes: Iterable[FleetBike], zoom: int, tiles: set[tuple[int, int]]
+) -> dict[tuple[int, int], list[BikeCluster]]:
+    """Cluster the available bikes of the fleet cache that are in the given map tiles."""
+    cells_zoom = cell_zoom(zoom)
+    totals: dict[tuple[int, int], list[float]] = {}
+    for bike in bikes:
+        if not bike.is_available or bike.lon is None or bike.lat is None:
+            continue
+        cell = lonlat_to_tile(bike.lon, bike.lat, cells_zoom)
+        if (cell[0] >> CELL_ZOOM_OFFSET, cell[1] >> CELL_ZOOM_OFFSET) not in tiles:
+            continue
+        total = totals.setdefault(cell, [0, 0.0, 0.0, 0.0])
+        total[0] += 1
+        total[1] += bike.battery_lvl
+        total[2] += bike.lon
+        total[3] += bike.lat
+
+    return clusters_by_tile(
+        (
+            BikeCluster(cells_zoom, x, y, count, battery / count, lon / count, lat / count)
+            for (x, y), (count, battery, lon, lat) in totals.items()
+        ),
+        tiles,
+    )
+
+
+def cluster_rows(
+    rows: Iterable[Any], zoom: int, tiles: set[tuple[int, int]]
+) -> dict[tuple[int, int], list[BikeCluster]]:
+    """Create clusters from BikeRepository.get_bike_clusters rows, grouped by map tile."""
+    cells_zoom = cell_zoom(zoom)
+    return clusters_by_tile(
+        (
+            BikeCluster(
+                cells_zoom,
+                int(row.cell_x),
+                int(row.cell_y),
+                row.count,
+                float(row.avg_battery),
+                row.lon,
+                row.lat,
+            )
+            for row in rows
+        ),
+        tiles,
+    )
+
+
+def clusters_by_tile(
+    clusters: Iterable[BikeCluster], tiles: set[tuple[int, int]]
+) -> dict[tuple[int, int], list[BikeCluster]]:
+    """Group clusters by the map tile their cell is in. Every tile gets an entry, so
+    that tiles without bikes are cached too."""
+    by_tile: dict[tuple[int, int], list[BikeCluster]] = {tile: [] for tile in tiles}
+    for cluster in clusters:
+        tile = (cluster.x >> CELL_ZOOM_OFFSET, cluster.y >> CELL_ZOOM_OFFSET)
+        if tile in by_tile:
+            by_tile[tile].append(cluster)
+    return by_tile
+
+
+# Global cache of the bike clusters per map tile
+cluster_cache: TileCache[list[BikeCluster]] = TileCache(
+    settings.tile_cache_size, settings.bike_cluster_cache_max_age
+)
@@ -0,0 +1,105 @@
+"""Module for the bike change feed
+
+The bikes table NOTIFYs the bike_changes channel of every change, see
+api/db/triggers.py. BikeChangeFeed LISTENs on the channel and applies the change
+records to the fleet cache, the bike tile cache and the socket emitter. So changes
+made outside the API, like admin SQL or batch jobs, reach socket clients and cached
+reads without polling.
+
+Changes made by the API are applied twice, once write-through and once from the
+feed. The socket emitter only sends fields that changed since the last update of a
+bike, so clients do not get them twice.
+"""
+
+import json
+import re
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from api.config import settings
+from api.db.notifications import asyncpg_dsn, listen
+from api.db.triggers import BIKE_CHANGES_CHANNEL
+from api.models.bike_models import BikeSocket
+from api.services.fleet_cache import FleetBike, fleet_cache
+from api.services.metrics import metrics
+from api.services.periodic import BackgroundTask
+from api.services.socket import bike_emitter
+from api.services.tile_cache import tile_cache
+
+# Columns of a change record that are sent to socket clients
+SOCKET_FIELDS = ("battery_lvl", "city_id", "is_available")
+
+# Fractional seconds of a timestamp, which Postgres sends without trailing zeros
+FRACTION = re.compile(r"\.(\d+)")
+
+
+def _timestamp(value: str) -> datetime:
+    """Parse a timestamp of a change record. Before Python 3.11, fromisoformat only
+    parses 3 or 6 fractional digits, so the fraction is padded to 6 digits."""
+    return datetime.fromisoformat(
+        FRACTION.sub(lambda match: "." + match[1][:6].ljust(6, "0"), value, count=1)
+    )
+
+
+def _position(record: dict[str, Any]) -> Optional[str]:
+    """Get the position of a change record as a WKT point."""
+    if record["lon"] is None or record["lat"] is None:
+        return None
+    return f"POINT({record['lon']} {record['lat']})"
+
+
+class BikeChangeFeed(BackgroundTask):
+    """Applies the change records of the bike_changes channel from a background task."""
+
+    def __init__(self, database_url: str) -> None:
+        super().__init__()
+        self.dsn = asyncpg_dsn(database_url)
+
+    def apply(self, record: dict[str, Any]) -> None:
+        """Apply a change record to the fleet cache, tile cache and socket emitter."""
+        bike_id = record["id"]
+        removed = record["op"] == "delete" or record["deleted"]
+        position = _position(record)
+
+        changes = {field: record[field] for field in SOCKET_FIELDS if field in record["changed"]}
+        if "last_position" in record["changed"] and position is not None:
+            changes["last_position"] = position
+        if removed:
+            bike_emitter.enqueue(BikeSocket(bike_id=bike_id, **changes), "bike_deleted")
+            fleet_cache.remove(bike_id)
+        else:
+            updated_at = record["updated_at"]
+            # Change records have no created_at, the cached one is kept
+            cached = fleet_cache.get(bike_id)
+            fleet_cache.upsert_many(
+                [
+                    FleetBike(
+                        id=bike_id,
+                        city_id=record["city_id"],
+                        battery_lvl=record["battery_lvl"],
+                        lon=record["lon"],
+                        lat=record["lat"],
+                        is_available=record["is_available"],
+                        updated_at=(
+                            _timestamp(updated_at) if updated_at else datetime.now(timezone.utc)
+                        ),
+                        created_at=cached.created_at if cached is not None else None,
+                    )
+                ]
+            )
+            if changes:
+                bike_emitter.enqueue(BikeSocket(bike_id=bike_id, **changes))
+        tile_cache.invalidate("bikes")
+        metrics.inc("bike_feed_records_total")
+
+    async def run(self) -> None:
+        """Apply the change records of the channel until cancelled."""
+        async for payload in listen(self.dsn, BIKE_CHANGES_CHANNEL):
+            try:
+                self.apply(json.loads(payload))
+            except Exception:  # pylint: disable=broad-exception-caught
+                # A bad record is skipped, the periodic fleet cache sync catches up
+                metrics.inc("bike_feed_errors_total")
+
+
+bike_change_feed = BikeChangeFeed(settings.database_url)
@@ -0,0 +1,98 @@
+"""Module for the write-behind buffer of bike reports
+
+With write-behind enabled, bike reports from PATCH /v1/bikes/{bike_id} are not
+committed one by one. The latest reported state of every bike is kept in memory and
+written to the bikes table in one bulk UPDATE every interval, or as soon as max_updates
+reports are waiting. At most one interval, or max_updates reports, are lost if the
+process dies. The fleet cache is updated when a report is buffered, so reads served
+from it see the report straight away.
+"""
+
+import asyncio
+import contextlib
+import time
+from typing import Any, Optional
+
+from api.config import settings
+from api.db.database import sessionmanager
+from api.db.repository_bike import BikeRepository
+from api.services.metrics import metrics
+from api.services.periodic import PeriodicTask
+
+
+class BikeWriteBuffer(PeriodicTask):
+    """Coalesces bike reports in memory and writes them to the database in bulk.
+
+    Reports are merged per bike, so a flush writes one row per bike with the latest
+    value of every reported field. A flush that fails keeps its reports for the next
+    flush, below any report that was buffered in the meantime.
+    """
+
+    def __init__(self, interval: float, max_updates: int) -> None:
+        # The reports of a failed flush are kept and written by the next flush
+        super().__init__(interval, self.flush, "bike_write_buffer_errors_total")
+        self.max_updates = max_updates
+        self._pending: dict[int, dict[str, Any]] = {}
+        self._updates = 0
+        self._oldest: Optional[float] = None
+        self._full = asyncio.Event()
+
+    @property
+    def pending_bikes(self) -> int:
+        """Number of bikes with reports waiting to be written."""
+        return len(self._pending)
+
+    def enqueue(self, bike_id: int, changes: dict[str, Any]) -> None:
+        """Buffer a bike report, merged into the reports that are waiting for the bike."""
+        self._pending.setdefault(bike_id, {}).update(changes)
+        self._updates += 1
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        if self._updates >= self.max_updates:
+            self._full.set()
+        metrics.inc("bike_write_buffer_enqueued_total")
+        metrics.set("bike_write_buffer_pending", self.pending_bikes)
+
+    async def flush(self) -> None:
+        """Write every buffered report in one bulk update."""
+        self._full.clear()
+        if not self._pending:
+            return
+        pending, oldest = self._pending, self._oldest
+        self._pending, self._updates, self._oldest = {}, 0, None
+
+        started = time.perf_counter()
+        try:
+            async with sessionmanager.session() as session:
+                await BikeRepository(session).update_bikes_bulk(
+                    [{"bike_id": bike_id, **changes} for bike_id, changes in pending.items()]
+                )
+        except Exception:
+            for bike_id, changes in pending.items():
+                self._pending[bike_id] = changes | self._pending.get(bike_id, {})
+            self._updates += len(pending)
+            self._oldest = oldest if self._oldest is None else min(oldest, self._oldest)
+            raise
+        finally:
+            metrics.set("bike_write_buffer_pending", self.pending_bikes)
+
+        metrics.inc("bike_write_buffer_flushes_total")
+        metrics.set("bike_write_buffer_flush_size", len(pending))
+        metrics.max("bike_write_buffer_flush_max_size", len(pending))
+        metrics.set("bike_write_buffer_flush_lag_seconds", time.monotonic() - oldest)
+        metrics.set("bike_write_buffer_flush_seconds", time.perf_counter() - started)
+
+    async def wait(self) -> None:
+        """Wait an interval, or until max_updates reports are waiting."""
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self._full.wait(), self.interval)
+
+    async def stop(self) -> None:
+        """Stop the background task and write what is left in the buffer."""
+        await super().stop()
+        await self.flush()
+
+
+bike_write_buffer = BikeWriteBuffer(
+    settings.bike_write_behind_interval_ms / 1000, settings.bike_write_behind_max_updates
+)
@@ -0,0 +1,178 @@
+"""Module for the response compression middleware
+
+Trip paths and zone boundaries are WKT text, which compresses well. Responses are
+compressed with brotli if the client accepts it and the brotli package is
+installed, and else with gzip. Only responses of the allowed content types are
+compressed, and complete bodies only above a minimum size. Streamed bodies are
+compressed chunk by chunk and flushed after every chunk, so that they keep
+streaming. Chunks above a size are compressed in a worker thread, so that large
+pages do not block the event loop.
+"""
+
+import asyncio
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# zlib window bits that write a gzip header and trailer
+GZIP_WBITS = zlib.MAX_WBITS | 16
+
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """Get the encodings of an Accept-Encoding header that have a quality above 0."""
+    encodings = set()
+    for part in accept_encoding.split(","):
+        encoding, _, params = part.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if encoding:
+            encodings.add(encoding.strip().lower())
+    return encodings
+
+
+class Compressor:
+    """Incremental gzip or brotli compressor of a response body."""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int) -> None:
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gzip = zlib.compressobj(gzip_level, zlib.DEFLATED, GZIP_WBITS)
+
+    def compress(self, data: bytes, last: bool) -> bytes:
+        """Compress a chunk of the body, and end the stream if it is the last chunk.
+
+        Other chunks are flushed, so the client can decode everything sent so far."""
+        if self.encoding == "br":
+            end = self._brotli.finish if last else self._brotli.flush
+            return self._brotli.process(data) + end()
+        mode = zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+        return self._gzip.compress(data) + self._gzip.flush(mode)
+
+
+class CompressionMiddleware:
+    """ASGI middleware that compresses responses with brotli or gzip."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        content_types: Optional[list[str]] = None,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        thread_size: int = 65536,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.content_types = set(content_types or ["application/json"])
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.thread_size = thread_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encodings = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if brotli is not None and "br" in encodings:
+            encoding = "br"
+        elif "gzip" in encodings:
+            encoding = "gzip"
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        responder = CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class CompressionResponder:
+    """Compresses the messages of one response before they are sent."""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send) -> None:
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self._start: Optional[Message] = None
+        self._compressor: Optional[Compressor] = None
+        self._passthrough = False
+
+    def _compressible(self, headers: Headers) -> bool:
+        """Check if a response is of an allowed content type and not encoded yet."""
+        content_type = headers.get("content-type", "").split(";", 1)[0].strip().lower()
+        return content_type in self.middleware.content_types and "content-encoding" not in headers
+
+    async def _compress(self, data: bytes, last: bool) -> bytes:
+        """Compress a chunk, in a worker thread if it is at least thread_size bytes."""
+        if len(data) >= self.middleware.thread_size:
+            return await asyncio.to_thread(self._compressor.compress, data, last)
+        return self._compressor.compress(data, last)
+
+    async def send(self, message: Message) -> None:
+        """Hold the response start until the first body chunk shows if the response is
+        compressed, then compress every body chunk."""
+        if self._passthrough:
+            await self._send(message)
+            return
+
+        if message["type"] == "http.response.start":
+            self._start = message
+            if not self._compressible(Headers(raw=message["headers"])):
+                self._passthrough = True
+                await self._send(message)
+            return
+
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body: bytes = message.get("body", b"")
+        more_body: bool = message.get("more_body", False)
+        if self._compressor is None:
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self._passthrough = True
+                await self._send(self._start)
+                await self._send(message)
+                return
+
+            self._compressor = Compressor(
+                self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality
+            )
+            headers = MutableHeaders(raw=self._start["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            # A compressed body is another representation, so it needs another strong ETag
+            etag = headers.get("ETag")
+            if etag is not None and not etag.startswith("W/"):
+                headers["ETag"] = f'{etag[:-1]}-{self.encoding}"'
+            if more_body:
+                del headers["Content-Length"]
+                await self._send(self._start)
+            else:
+                body = await self._compress(body, True)
+                headers["Content-Length"] = str(len(body))
+                await self._send(self._start)
+                await self._send({"type": "http.response.body", "body": body})
+                return
+
+        await self._send(
+            {
+                "type": "http.response.body",
+                "body": await self._compress(body, not more_body),
+                "more_body": more_body,
+            }
+        )
@@ -0,0 +1,66 @@
+"""Module for encoding exported rows
+
+Exports stream the rows of a server-side cursor straight to NDJSON or CSV, one
+batch of rows per chunk, without building pydantic resources. Only one batch is in
+memory at a time, whatever the size of the export.
+"""
+
+import csv
+import io
+import json
+from collections.abc import AsyncIterator, Sequence
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncResult
+
+from api.models.export_models import ExportFormat
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _json_value(value: Any) -> Any:
+    """Convert a value that json cannot encode."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        # Numeric(10, 2) columns have fewer digits than a float keeps exactly
+        return float(value)
+    raise TypeError(f"Cannot export {type(value).__name__}")
+
+
+def _csv_value(value: Any) -> Any:
+    """Convert a value to the text of a CSV field."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    return value
+
+
+def encode_ndjson(keys: Sequence[str], rows: Sequence[Sequence[Any]]) -> str:
+    """Encode rows as a JSON object per line."""
+    return "".join(
+        json.dumps(dict(zip(keys, row)), default=_json_value, separators=(",", ":")) + "\n"
+        for row in rows
+    )
+
+
+def encode_csv(rows: Sequence[Sequence[Any]]) -> str:
+    """Encode rows as CSV lines, with NULL as an empty field."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+async def encode_rows(result: AsyncResult, export_format: ExportFormat) -> AsyncIterator[str]:
+    """Encode a streamed result in the export format, a chunk per batch of rows.
+
+    CSV starts with a header line of the column names."""
+    keys = list(result.keys())
+    if export_format == "csv":
+        yield encode_csv([keys])
+    async for rows in result.partitions():
+        yield encode_ndjson(keys, rows) if export_format == "ndjson" else encode_csv(rows)
@@ -0,0 +1,181 @@
+"""Module for the in-memory fleet state cache
+
+Keeps a compact record per bike so that read-heavy endpoints, like the available
+bikes listing, can be served without a database round trip. The cache is seeded at
+startup, updated write-through by the repositories and periodically re-synced from
+the database to pick up changes made outside this process.
+"""
+
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from api.models.wkt_models import parse_wkt
+
+
+@dataclass(slots=True)
+class FleetBike:
+    """Compact per-bike record kept in the fleet cache."""
+
+    id: int
+    city_id: int
+    battery_lvl: int
+    lon: Optional[float]
+    lat: Optional[float]
+    is_available: bool
+    updated_at: datetime
+    # Unknown for bikes that the change feed added since the last sync
+    created_at: Optional[datetime] = None
+
+    @property
+    def last_position(self) -> Optional[str]:
+        """Position as a WKT point, matching the format of ST_AsText."""
+        if self.lon is None or self.lat is None:
+            return None
+        return f"POINT({self.lon} {self.lat})"
+
+
+def _record_from_row(row: Any) -> FleetBike:
+    """Create a FleetBike from a row with lon and lat columns."""
+    return FleetBike(
+        id=row.id,
+        city_id=row.city_id,
+        battery_lvl=row.battery_lvl,
+        lon=row.lon,
+        lat=row.lat,
+        is_available=row.is_available,
+        updated_at=row.updated_at,
+        created_at=row.created_at,
+    )
+
+
+def _parse_point(value: Optional[str]) -> tuple[Optional[float], Optional[float]]:
+    """Parse a WKT point into a (lon, lat) tuple."""
+    if value is None:
+        return None, None
+    point = parse_wkt(value)
+    return point.x, point.y
+
+
+class FleetCache:
+    """Process-local cache of the current state of every non-deleted bike."""
+
+    def __init__(self) -> None:
+        self._bikes: dict[int, FleetBike] = {}
+        self._synced_at: Optional[datetime] = None
+        self._synced_monotonic: Optional[float] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        """Check if the cache has been seeded from the database."""
+        return self._synced_at is not None
+
+    def __len__(self) -> int:
+        return len(self._bikes)
+
+    def get(self, bike_id: int) -> Optional[FleetBike]:
+        """Get the cached record of a bike."""
+        return self._bikes.get(bike_id)
+
+    def load(self, rows: Iterable[Any]) -> None:
+        """Replace the cache with a snapshot from the database.
+
+        Rows need id, city_id, battery_lvl, lon, lat, is_available, updated_at and
+        created_at.
+        Records that were written through after the snapshot was taken are kept.
+        """
+        bikes = {}
+        for row in rows:
+            bike = _record_from_row(row)
+            cached = self._bikes.get(bike.id)
+            bikes[bike.id] = cached if cached and cached.updated_at > bike.updated_at else bike
+
+        self._bikes = bikes
+        self._synced_at = datetime.now(timezone.utc)
+        self._synced_monotonic = time.monotonic()
+
+    def upsert(self, bike: Any) -> None:
+        """Write through a bike row with the last position as WKT."""
+        if bike.deleted_at is not None:
+            self.remove(bike.id)
+            return
+        lon, lat = _parse_point(bike.last_position)
+        self._bikes[bike.id] = FleetBike(
+            id=bike.id,
+            city_id=bike.city_id,
+            battery_lvl=bike.battery_lvl,
+            lon=lon,
+            lat=lat,
+            is_available=bike.is_available,
+            updated_at=bike.updated_at or datetime.now(timezone.utc),
+            created_at=bike.created_at,
+        )
+
+    def upsert_many(self, rows: Iterable[Any]) -> None:
+        """Write through many bike rows with lon and lat columns."""
+        for row in rows:
+            self._bikes[row.id] = _record_from_row(row)
+
+    def update(self, bike_id: int, **changes: Any) -> None:
+        """Write through a partial update of a cached bike."""
+        bike = self._bikes.get(bike_id)
+        if bike is None:
+            return
+        if "last_position" in changes:
+            bike.lon, bike.lat = _parse_point(changes.pop("last_position"))
+        for key, value in changes.items():
+            setattr(bike, key, value)
+        bike.updated_at = datetime.now(timezone.utc)
+
+    def remove(self, bike_id: int) -> None:
+        """Remove a bike from the cache."""
+        self._bikes.pop(bike_id, None)
+
+    def bikes(self) -> Iterable[FleetBike]:
+        """Iterate over all cached bikes."""
+        return self._bikes.values()
+
+    def get_available_bikes(self, **params: Any) -> list[FleetBike]:
+        """Filter, sort and paginate available bikes like BikeRepository.get_bikes.
+
+        Bike ids are assigned in creation order, so created_at sorts by id."""
+        city_id = params.get("city_id")
+        battery_gt = params.get("battery_gt")
+        battery_lt = params.get("battery_lt")
+
+        bikes = [
+            bike
+            for bike in self._bikes.values()
+            if bike.is_available
+            and (city_id is None or bike.city_id == city_id)
+            and (battery_gt is None or bike.battery_lvl > battery_gt)
+            and (battery_lt is None or bike.battery_lvl < battery_lt)
+        ]
+
+        order_by = params.get("order_by", "created_at")
+        order_key = "id" if order_by == "created_at" else order_by
+        bikes.sort(
+            key=lambda bike: (getattr(bike, order_key), bike.id),
+            reverse=params.get("order_direction") == "desc",
+        )
+
+        offset = params.get("offset", 0)
+        return bikes[offset : offset + params.get("limit", 100)]
+
+    def staleness(self) -> dict[str, Any]:
+        """Meta data about how fresh the cache is."""
+        return {
+            "source": "fleet_cache",
+            "synced_at": self._synced_at.isoformat() if self._synced_at else None,
+            "staleness_seconds": (
+                round(time.monotonic() - self._synced_monotonic, 3)
+                if self._synced_monotonic is not None
+                else None
+            ),
+        }
+
+
+# Global fleet cache instance
+fleet_cache = FleetCache()
@@ -0,0 +1,33 @@
+"""Module for the reconciliation of the fleet statistics
+
+The fleet statistics counters are kept up to date by database triggers in the same
+transactions that change bikes and trips. FleetStatsReconciler recounts them every
+interval, which fixes counters that drifted, e.g. after the triggers were disabled
+for a bulk load.
+"""
+
+from api.config import settings
+from api.db.database import sessionmanager
+from api.db.repository_bike import BikeRepository
+from api.services.metrics import metrics
+from api.services.periodic import PeriodicTask
+
+
+class FleetStatsReconciler(PeriodicTask):
+    """Recounts the fleet statistics counters from a background task."""
+
+    def __init__(self, interval: float) -> None:
+        super().__init__(interval, self.reconcile, "fleet_stats_reconciliation_errors_total")
+
+    async def reconcile(self) -> None:
+        """Recount the counters and record how many were off, unless another worker
+        is recounting them."""
+        async with sessionmanager.session() as session:
+            corrected = await BikeRepository(session).reconcile_fleet_stats()
+        if corrected is None:
+            return
+        metrics.inc("fleet_stats_reconciliations_total")
+        metrics.set("fleet_stats_corrected_counters", corrected)
+
+
+fleet_stats_reconciler = FleetStatsReconciler(settings.fleet_stats_reconcile_interval)
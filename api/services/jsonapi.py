@@ -0,0 +1,121 @@
+"""Module for encoding JSON:API collections straight from repository rows
+
+Collection routes would otherwise build a pydantic resource per row, and FastAPI
+would validate the whole page again before encoding it. Rows from the repositories
+are already valid, so a ResourceEncoder reads their attributes by the names of an
+attributes model and turns them into resource objects with links and relationships
+from templates, and the page is encoded to bytes with orjson in one call. The
+routes keep their response_model for the OpenAPI schema, and return the bytes as a
+Response that FastAPI sends as it is.
+"""
+
+from collections.abc import Iterable, Mapping
+from decimal import Decimal
+from functools import lru_cache, partial
+from typing import Any, Callable, Optional, get_args
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+
+# Datetimes in UTC end in Z, as pydantic encodes them
+ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+# An attribute: its name in responses and rows, its default and its converter
+AttributeSpec = tuple[str, Any, Optional[Callable[[Any], Any]]]
+
+
+def _json_value(value: Any) -> Any:
+    """Convert a value that orjson cannot encode."""
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+def _is_float(annotation: Any) -> bool:
+    """Check if an annotation is float, optional or annotated."""
+    return annotation is float or any(_is_float(arg) for arg in get_args(annotation))
+
+
+@lru_cache(maxsize=128)
+def _attribute_specs(
+    attributes_model: type[BaseModel], fields: Optional[frozenset[str]]
+) -> list[AttributeSpec]:
+    """Get the attributes of a model, or only those in a sparse fieldset.
+
+    Float attributes are converted, since rows may hold ints or Decimals for them."""
+    return [
+        (
+            info.alias or name,
+            None if info.default is PydanticUndefined else info.default,
+            float if _is_float(info.annotation) else None,
+        )
+        for name, info in attributes_model.model_fields.items()
+        if fields is None or (info.alias or name) in fields
+    ]
+
+
+class ResourceEncoder:
+    """Encodes repository rows as JSON:API resource objects of one resource type.
+
+    Rows are mappings or objects with the attributes of attributes_model, by alias.
+    relationships maps a relationship name to the resource type and the column of
+    the related id, or to None for a relationship that is always null."""
+
+    def __init__(
+        self,
+        resource_type: str,
+        attributes_model: type[BaseModel],
+        relationships: Optional[dict[str, Optional[tuple[str, str]]]] = None,
+        string_id: bool = True,
+    ) -> None:
+        self.resource_type = resource_type
+        self.attributes_model = attributes_model
+        self.relationships = relationships
+        self.string_id = string_id
+
+    def encode(
+        self, rows: Iterable[Any], self_prefix: str, fields: Optional[list[str]] = None
+    ) -> list[dict[str, Any]]:
+        """Get the resource objects of rows, with the attributes in fields if it is
+        given, and the id of a row appended to self_prefix as self link."""
+        specs = _attribute_specs(
+            self.attributes_model, frozenset(fields) if fields is not None else None
+        )
+        resources = []
+        for row in rows:
+            get = row.get if isinstance(row, Mapping) else partial(getattr, row)
+            resource_id = get("id")
+            attributes = {}
+            for key, default, convert in specs:
+                value = get(key, default)
+                attributes[key] = value if convert is None or value is None else convert(value)
+
+            resource = {
+                "id": str(resource_id) if self.string_id else resource_id,
+                "type": self.resource_type,
+                "attributes": attributes,
+            }
+            if self.relationships is not None:
+                resource["relationships"] = {
+                    name: (
+                        {"data": {"type": related[0], "id": str(get(related[1], None))}}
+                        if related is not None
+                        else None
+                    )
+                    for name, related in self.relationships.items()
+                }
+            resource["links"] = {"self": f"{self_prefix}{resource_id}"}
+            resources.append(resource)
+        return resources
+
+
+def jsonapi_response(data: list[dict[str, Any]], links: BaseModel) -> Response:
+    """Encode resource objects and a links model as a JSON:API response."""
+    body = orjson.dumps(
+        {"data": data, "links": links.model_dump(by_alias=True)},
+        default=_json_value,
+        option=ORJSON_OPTIONS,
+    )
+    return Response(body, media_type="application/json")
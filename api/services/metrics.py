@@ -0,0 +1,32 @@
+"""Module for process-local runtime metrics
+
+Services record gauges and counters here, and admins can read a snapshot of them
+from the /v1/admin/metrics route.
+"""
+
+
+class Metrics:
+    """Registry of named gauges and counters."""
+
+    def __init__(self) -> None:
+        self._values: dict[str, float] = {}
+
+    def set(self, name: str, value: float) -> None:
+        """Set a gauge to a value."""
+        self._values[name] = value
+
+    def inc(self, name: str, value: float = 1) -> None:
+        """Increment a counter."""
+        self._values[name] = self._values.get(name, 0) + value
+
+    def max(self, name: str, value: float) -> None:
+        """Keep the highest value seen for a gauge."""
+        self._values[name] = max(self._values.get(name, value), value)
+
+    def snapshot(self) -> dict[str, float]:
+        """Get the current value of every metric."""
+        return dict(sorted(self._values.items()))
+
+
+# Global metrics instance
+metrics = Metrics()
@@ -0,0 +1,74 @@
+"""Module for the background tasks of the API
+
+Services that work in the background, like flushing a buffer every interval or
+listening on a channel, derive from BackgroundTask, and the lifespan of the
+application starts and stops them. PeriodicTask runs a function every interval.
+"""
+
+import asyncio
+import contextlib
+from collections.abc import Awaitable, Callable
+from typing import Optional
+
+from api.services.metrics import metrics
+
+
+class BackgroundTask:
+    """Runs the run method in a background task, from start until stop."""
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        """Check if the background task is running."""
+        return self._task is not None
+
+    async def run(self) -> None:
+        """Do the work of the background task until cancelled."""
+        raise NotImplementedError
+
+    def start(self) -> None:
+        """Start the background task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop the background task."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+
+class PeriodicTask(BackgroundTask):
+    """Runs a function every interval seconds from a background task.
+
+    An exception of the function is counted in the errors_metric counter, if any,
+    and the function runs again at the next interval."""
+
+    def __init__(
+        self,
+        interval: float,
+        function: Callable[[], Awaitable[None]],
+        errors_metric: Optional[str] = None,
+    ) -> None:
+        super().__init__()
+        self.interval = interval
+        self.function = function
+        self.errors_metric = errors_metric
+
+    async def wait(self) -> None:
+        """Wait until the function is due."""
+        await asyncio.sleep(self.interval)
+
+    async def run(self) -> None:
+        """Run the function every interval until cancelled."""
+        while True:
+            await self.wait()
+            try:
+                await self.function()
+            except Exception:  # pylint: disable=broad-exception-caught
+                if self.errors_metric is not None:
+                    metrics.inc(self.errors_metric)
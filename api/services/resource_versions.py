@@ -0,0 +1,138 @@
+"""Module for the versions of the read-mostly resources
+
+Every write to bikes, cities, map_zones and zone_types NOTIFYs the resource_versions
+channel with a new value of the resource_versions sequence, see api/db/triggers.py.
+ResourceVersions LISTENs on the channel and keeps the latest version of every table,
+so routes can send strong ETags made from the version and answer If-None-Match with
+a 304 without touching the database or building the response.
+
+Versions are only known while the LISTEN connection is open. Every time it is made,
+every table gets a new value of the sequence, so writes missed while the connection
+was down cannot make an old ETag match. Workers that connected at different times
+send different ETags until the next write, which only costs a full response.
+
+The notification of a write arrives a moment after its commit, so the repositories
+also bump the version of a table on their own worker right after they commit. A
+bumped version counts the writes of the worker since the last notification, and its
+ETag has the worker in it, so it differs from every ETag sent before the write. The
+next notification replaces it.
+"""
+
+import re
+import uuid
+from collections.abc import Callable
+from typing import Annotated, Optional
+
+import asyncpg
+from fastapi import Header, Response, status
+
+from api.config import settings
+from api.db.notifications import asyncpg_dsn, listen
+from api.db.triggers import RESOURCE_VERSIONS_CHANNEL, VERSIONED_TABLES
+from api.services.metrics import metrics
+from api.services.periodic import BackgroundTask
+
+# Suffix that CompressionMiddleware adds to the ETags of compressed responses
+ENCODING_SUFFIX = re.compile(r'-(?:gzip|br)"$')
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """Check if an If-None-Match header matches an ETag, also in a compressed form."""
+    if not if_none_match or etag is None:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (ENCODING_SUFFIX.sub('"', tag) for tag in tags)
+
+
+def cache_headers(etag: Optional[str], cache_control: str) -> dict[str, str]:
+    """Get the ETag and Cache-Control headers of a response."""
+    headers = {"Cache-Control": cache_control}
+    if etag is not None:
+        headers["ETag"] = etag
+    return headers
+
+
+class ResourceVersions(BackgroundTask):
+    """Keeps the latest versions of the read-mostly tables from a background task."""
+
+    def __init__(self, database_url: str) -> None:
+        super().__init__()
+        self.dsn = asyncpg_dsn(database_url)
+        self.worker = uuid.uuid4().hex[:8]
+        self._versions: dict[str, int] = {}
+        self._local_writes: dict[str, int] = {}
+        self._connection: Optional[asyncpg.Connection] = None
+
+    def etag(self, table: str) -> Optional[str]:
+        """Get a strong ETag of the current version of a table, or None if the version
+        is not known."""
+        if self._connection is None or self._connection.is_closed():
+            return None
+        version = self._versions.get(table)
+        if version is None:
+            return None
+        local_writes = self._local_writes.get(table)
+        if local_writes is not None:
+            return f'"{table}-{version}-{self.worker}.{local_writes}"'
+        return f'"{table}-{version}"'
+
+    def apply(self, payload: str) -> None:
+        """Apply a <table>:<version> notification. Notifications of transactions that
+        commit out of order do not move a version back."""
+        table, version = payload.split(":", 1)
+        if int(version) > self._versions.get(table, 0):
+            self._versions[table] = int(version)
+            self._local_writes.pop(table, None)
+        metrics.inc("resource_versions_notifications_total")
+
+    def bump(self, table: str) -> None:
+        """Give a table a new version on this worker after a write of it was committed,
+        until the notification of the write arrives."""
+        if table in self._versions:
+            self._local_writes[table] = self._local_writes.get(table, 0) + 1
+
+    async def reset(self, connection: asyncpg.Connection) -> None:
+        """Give every table a new version, when the LISTEN connection is made."""
+        version = await connection.fetchval("SELECT nextval('resource_versions')")
+        self._versions = dict.fromkeys(VERSIONED_TABLES, version)
+        self._local_writes = {}
+        self._connection = connection
+
+    async def run(self) -> None:
+        """Apply the notifications of the channel until cancelled."""
+        async for payload in listen(self.dsn, RESOURCE_VERSIONS_CHANNEL, on_connect=self.reset):
+            try:
+                self.apply(payload)
+            except ValueError:
+                metrics.inc("resource_versions_errors_total")
+
+    async def stop(self) -> None:
+        """Stop the background task, after which no version is known."""
+        await super().stop()
+        self._connection = None
+        self._versions = {}
+        self._local_writes = {}
+
+
+# Global resource versions instance
+resource_versions = ResourceVersions(settings.database_url)
+
+
+def not_modified(table: str, cache_control: str) -> Callable[..., Optional[Response]]:
+    """Get a dependency that compares If-None-Match with the current ETag of a table.
+
+    The dependency gives a 304 response for the route to return if the client has
+    the current version, and else sets the ETag and Cache-Control headers of the
+    response and gives None."""
+
+    def check_etag(
+        response: Response, if_none_match: Annotated[Optional[str], Header()] = None
+    ) -> Optional[Response]:
+        etag = resource_versions.etag(table)
+        headers = cache_headers(etag, cache_control)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
+        return None
+
+    return check_etag
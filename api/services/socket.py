@@ -1,17 +1,362 @@
-"""Module that creates socket"""
+"""Module that creates socket
+
+Clients subscribe to the rooms they want bike updates for: a city, a set of map
+tiles (z/x/y) or every bike. Each update is only sent to the rooms that contain
+the bike's city and position. Clients join the room of every bike on connect, as
+before the other rooms existed, and leave it when they first subscribe without
+all_bikes.
+
+Updates are batched per tick by BikeUpdateEmitter, so request handlers never wait
+on socket I/O. With SOCKET_POSTGRES_BUS the batches of every worker are published
+through Postgres, see api/services/socket_manager.py, and every worker emits them to
+its own clients in the order of the bus.
+
+Bike updates are delta encoded: only the fields that changed since the last update
+of the bike are sent, with a per-bike sequence number. A client that misses a
+sequence number, or sees a bike for the first time, asks for a full snapshot with
+the resync event. The snapshot is read from the fleet cache.
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from collections.abc import Iterable
+from typing import Any, Optional
 
 import socketio
+from pydantic import ValidationError
+
+from api.config import settings
+from api.models.bike_models import BikeResync, BikeSocket, BikeSocketStartEnd, BikeSubscription
+from api.models.wkt_models import parse_wkt
+from api.services.fleet_cache import FleetBike, fleet_cache
+from api.services.metrics import metrics
+from api.services.periodic import PeriodicTask
+from api.services.socket_manager import AsyncPostgresManager
+from api.services.tiles import is_valid_tile, lonlat_to_tile
+
+socket = socketio.AsyncServer(
+    cors_allowed_origins=[],
+    async_mode="asgi",
+    # With more than one worker, emits go through Postgres to the clients of every worker
+    client_manager=(
+        AsyncPostgresManager(settings.database_url) if settings.socket_postgres_bus else None
+    ),
+)
+
+# Room for clients that want updates for every bike, e.g. admin dashboards
+ALL_BIKES_ROOM = "bike_updates"
+
+# Method of the bus messages with the queued bike changes of a tick
+BIKE_CHANGES_METHOD = "bike_changes"
+
+# Fields of a bike update that the fleet cache keeps
+SNAPSHOT_FIELDS = ("battery_lvl", "city_id", "is_available", "last_position")
+
+
+def city_room(city_id: int) -> str:
+    """Get the room name of a city."""
+    return f"city:{city_id}"
+
+
+def tile_room(zoom: int, x: int, y: int) -> str:
+    """Get the room name of a map tile."""
+    return f"tile:{zoom}/{x}/{y}"
+
+
+class BikeRoomRouter:
+    """Routes bike updates to rooms and remembers the rooms each bike was last sent to.
+
+    A bike that moves to another tile or city is sent to both its old and its new
+    rooms, so that clients watching the old tile see it leave.
+    """
+
+    def __init__(self, tile_zooms: list[int]) -> None:
+        self.tile_zooms = tile_zooms
+        self._city_rooms: dict[int, str] = {}
+        self._tile_rooms: dict[int, frozenset[str]] = {}
+
+    def _tile_rooms_for(self, position: str) -> frozenset[str]:
+        """Get the tile rooms of a WKT point at every tile zoom level."""
+        point = parse_wkt(position)
+        return frozenset(
+            tile_room(zoom, *lonlat_to_tile(point.x, point.y, zoom)) for zoom in self.tile_zooms
+        )
+
+    def route(self, bike: BikeSocket) -> list[str]:
+        """Get the rooms a bike update should be sent to.
+
+        City and position missing from the update are taken from the fleet cache,
+        or else from the last update of the bike."""
+        cached = fleet_cache.get(bike.bike_id)
+        city_id = bike.city_id if bike.city_id is not None else getattr(cached, "city_id", None)
+        position = bike.last_position or getattr(cached, "last_position", None)
+
+        previous_city = self._city_rooms.get(bike.bike_id)
+        previous_tiles = self._tile_rooms.get(bike.bike_id, frozenset())
+        current_city = city_room(city_id) if city_id is not None else previous_city
+        current_tiles = self._tile_rooms_for(position) if position else previous_tiles
+
+        if current_city is not None:
+            self._city_rooms[bike.bike_id] = current_city
+        self._tile_rooms[bike.bike_id] = current_tiles
+
+        rooms = {current_city, previous_city} - {None}
+        return [ALL_BIKES_ROOM, *sorted(rooms | current_tiles | previous_tiles)]
+
+    def rooms_of(self, bike: FleetBike) -> set[str]:
+        """Get the rooms of a bike in the fleet cache."""
+        rooms = {ALL_BIKES_ROOM, city_room(bike.city_id)}
+        if bike.last_position:
+            rooms.update(self._tile_rooms_for(bike.last_position))
+        return rooms
+
+    def subscription_rooms(self, subscription: BikeSubscription) -> list[str]:
+        """Get the rooms of a subscription.
+
+        Raises:
+            ValueError: If a tile is outside the grid or not at a routed zoom level
+        """
+        rooms = [ALL_BIKES_ROOM] if subscription.all_bikes else []
+        rooms.extend(city_room(city_id) for city_id in subscription.city_ids)
+        for tile in subscription.tiles:
+            zoom, x, y = (int(part) for part in tile.split("/"))
+            if zoom not in self.tile_zooms or not is_valid_tile(zoom, x, y):
+                raise ValueError(
+                    f"Invalid tile {tile}, zoom level must be one of {self.tile_zooms}"
+                )
+            rooms.append(tile_room(zoom, x, y))
+        return rooms
+
+
+bike_rooms = BikeRoomRouter(settings.socket_tile_zooms)
+
+
+@socket.event
+async def connect(sid: str, _environ: dict[str, Any]) -> None:
+    """Join the room of every bike, which clients that do not subscribe listen to."""
+    await socket.enter_room(sid, ALL_BIKES_ROOM)
+
+
+@socket.event
+async def subscribe(sid: str, data: Optional[dict[str, Any]] = None) -> dict[str, Any]:
+    """Join the rooms of a subscription. The joined rooms are sent back as ack.
+
+    The first subscription of a client replaces the room of every bike joined on
+    connect, unless it asks for all_bikes."""
+    try:
+        rooms = bike_rooms.subscription_rooms(BikeSubscription.model_validate(data or {}))
+    except (ValidationError, ValueError) as e:
+        return {"error": str(e)}
+
+    session = await socket.get_session(sid)
+    if not session.get("subscribed"):
+        if ALL_BIKES_ROOM not in rooms:
+            await socket.leave_room(sid, ALL_BIKES_ROOM)
+        await socket.save_session(sid, {**session, "subscribed": True})
+    for room in rooms:
+        await socket.enter_room(sid, room)
+    return {"rooms": rooms}
+
+
+@socket.event
+async def unsubscribe(sid: str, data: Optional[dict[str, Any]] = None) -> dict[str, Any]:
+    """Leave the rooms of a subscription, or every room if no subscription is given."""
+    if data:
+        try:
+            rooms = bike_rooms.subscription_rooms(BikeSubscription.model_validate(data))
+        except (ValidationError, ValueError) as e:
+            return {"error": str(e)}
+    else:
+        rooms = [room for room in socket.rooms(sid) if room != sid]
+
+    for room in rooms:
+        await socket.leave_room(sid, room)
+    return {"rooms": rooms}
+
+
+class BikeUpdateEmitter(PeriodicTask):
+    """Coalesces bike updates and emits them as deltas in batches from a background task.
+
+    Updates are queued per bike and merged, so only the latest state of a bike is
+    sent each tick. Every room gets one bike_updates_batch event per tick, with the
+    bikes routed to it. A client in several rooms of a bike gets it in each of
+    their batches, with the same sequence number, and drops the repeats.
+    The last state sent of every bike is kept to diff the next update against.
+
+    With the Postgres bus, the queued changes of a tick are published instead of
+    emitted, and every worker routes, diffs and emits the changes of every worker in
+    the order of the bus. So the sequence numbers and the last sent state of a bike
+    are the same on every worker, whichever worker handled the write.
+    """
+
+    def __init__(self, interval: float) -> None:
+        # A failed emit drops that tick, later updates are still sent
+        super().__init__(interval, self.flush, "socket_emit_errors_total")
+        self._pending: dict[int, dict[str, Any]] = {}
+        self._sent: dict[int, dict[str, Any]] = {}
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of bikes with updates waiting to be emitted."""
+        return len(self._pending)
+
+    def enqueue(self, bike: BikeSocket, event: str = "bike_update") -> None:
+        """Queue a bike update for the next tick.
+
+        Fields that are missing or None in the update keep their earlier value, and
+        event is the kind of the latest update."""
+        pending = self._pending.get(bike.bike_id)
+        if pending is None:
+            pending = self._pending[bike.bike_id] = {}
+        else:
+            metrics.inc("socket_emit_coalesced_total")
+        pending.update(
+            {
+                key: value
+                for key, value in bike.model_dump(exclude_unset=True).items()
+                if value is not None
+            }
+        )
+        pending["event"] = event
+        metrics.inc("socket_emit_enqueued_total")
+        metrics.set("socket_emit_queue_depth", self.queue_depth)
+
+    def _delta(self, bike_id: int, changes: dict[str, Any]) -> Optional[dict[str, Any]]:
+        """Diff queued changes against the last state sent and record the new state.
+
+        Returns None for a plain update that changes nothing."""
+        event = changes.pop("event")
+        sent = self._sent.setdefault(bike_id, {"bike_id": bike_id, "seq": 0})
+        delta = {key: value for key, value in changes.items() if sent.get(key) != value}
+        if not delta and event == "bike_update":
+            return None
+        sent.update(delta)
+        sent["seq"] += 1
+        return {"bike_id": bike_id, "seq": sent["seq"], "event": event, **delta}
+
+    def snapshot(self, bikes: Iterable[FleetBike]) -> list[dict[str, Any]]:
+        """Get the full state of bikes in the fleet cache, with their sequence numbers.
+
+        The fleet cache is written before an update is emitted, so a snapshot is at
+        least as new as its sequence number, and later deltas only set values again."""
+        return [
+            {
+                "bike_id": bike.id,
+                "seq": self._sent.get(bike.id, {}).get("seq", 0),
+                "city_id": bike.city_id,
+                "battery_lvl": bike.battery_lvl,
+                "is_available": bike.is_available,
+                "last_position": bike.last_position,
+            }
+            for bike in bikes
+        ]
+
+    async def flush(self) -> None:
+        """Emit all queued updates, or publish them to every worker with the bus."""
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending = {}
+        metrics.set("socket_emit_queue_depth", 0)
+
+        bikes = [{"bike_id": bike_id, **changes} for bike_id, changes in pending.items()]
+        if isinstance(socket.manager, AsyncPostgresManager):
+            await socket.manager.publish({"method": BIKE_CHANGES_METHOD, "bikes": bikes})
+        else:
+            await self.emit_changes(bikes)
+
+    async def emit_changes(self, bikes: list[dict[str, Any]]) -> None:
+        """Emit the queued changes of a tick to the clients of this worker, as one event
+        per room."""
+        started = time.perf_counter()
+        batches = defaultdict(list)
+        for changes in bikes:
+            bike_id = changes.pop("bike_id")
+            rooms = bike_rooms.route(
+                BikeSocket.model_construct(
+                    bike_id=bike_id,
+                    city_id=changes.get("city_id"),
+                    last_position=changes.get("last_position"),
+                )
+            )
+            delta = self._delta(bike_id, changes)
+            if delta is None:
+                metrics.inc("socket_emit_unchanged_total")
+                continue
+            for room in rooms:
+                batches[room].append(delta)
+
+        # The batches of other workers reach the clients of this worker here
+        await asyncio.gather(
+            *(
+                socket.emit("bike_updates_batch", data=bikes, room=room, ignore_queue=True)
+                for room, bikes in sorted(batches.items())
+            )
+        )
+        latency = time.perf_counter() - started
+        metrics.inc("socket_emit_flushes_total")
+        metrics.set("socket_emit_flush_seconds", latency)
+        metrics.max("socket_emit_flush_max_seconds", latency)
+
+    async def stop(self) -> None:
+        """Stop the background task and emit what is left in the queue."""
+        await super().stop()
+        await self.flush()
+
+
+bike_emitter = BikeUpdateEmitter(settings.socket_emit_interval_ms / 1000)
+
+
+async def on_bike_changes(message: dict[str, Any]) -> None:
+    """Emit the bike changes of a worker that reached this worker through the bus.
+
+    Changes of other workers are also written to the fleet cache of this worker, so
+    that resync snapshots are as new as the sequence numbers."""
+    if message["host_id"] != socket.manager.host_id:
+        for changes in message["bikes"]:
+            fleet_cache.update(
+                changes["bike_id"],
+                **{key: changes[key] for key in SNAPSHOT_FIELDS if key in changes},
+            )
+    await bike_emitter.emit_changes(message["bikes"])
+
+
+if isinstance(socket.manager, AsyncPostgresManager):
+    socket.manager.handlers[BIKE_CHANGES_METHOD] = on_bike_changes
+
+
+@socket.event
+async def resync(sid: str, data: Optional[dict[str, Any]] = None) -> dict[str, Any]:
+    """Send back the full state of bikes, for clients that missed an update.
+
+    Without bike ids every bike in the rooms of the client is included. Bikes are
+    read from the fleet cache, which every worker keeps."""
+    try:
+        request = BikeResync.model_validate(data or {})
+    except ValidationError as e:
+        return {"error": str(e)}
+
+    if request.bike_ids:
+        bikes = [fleet_cache.get(bike_id) for bike_id in request.bike_ids]
+        bikes = [bike for bike in bikes if bike is not None]
+    else:
+        client_rooms = set(socket.rooms(sid))
+        bikes = [bike for bike in fleet_cache.bikes() if bike_rooms.rooms_of(bike) & client_rooms]
+    return {"bikes": bike_emitter.snapshot(bikes)}
 
-from api.models.bike_models import BikeSocket, BikeSocketStartEnd
 
-socket = socketio.AsyncServer(cors_allowed_origins=[], async_mode="asgi")
+def emit_update(updated_bike: BikeSocket):
+    """Queues updated bike data for the socket."""
+    bike_emitter.enqueue(updated_bike)
 
 
-async def emit_update(updated_bike: BikeSocket):
-    """Emits updated bike data to socket."""
-    await socket.emit("bike_update", data=updated_bike.model_dump(), room="bike_updates")
+def emit_update_start_end(updated_bike: BikeSocketStartEnd, start_or_end: str):
+    """Queues updated bike data from a trip start or end for the socket."""
+    bike_emitter.enqueue(updated_bike, start_or_end)
 
 
-async def emit_update_start_end(updated_bike: BikeSocketStartEnd, start_or_end: str):
-    """Emits updated bike data to socket."""
-    await socket.emit(start_or_end, data=updated_bike.model_dump(), room="bike_updates")
+def emit_updates_batch(updated_bikes: list[BikeSocket]):
+    """Queues a batch of updated bikes for the socket."""
+    for bike in updated_bikes:
+        bike_emitter.enqueue(bike)
@@ -0,0 +1,128 @@
+"""Module for the Postgres message bus of the socket server
+
+With more than one API worker, every worker has its own socket clients. The
+AsyncPostgresManager client manager sends every emit through Postgres NOTIFY, and
+every worker LISTENs on the same channel and emits the messages to its local rooms.
+So a client gets the updates handled by any worker, without another message broker.
+
+NOTIFY payloads are limited to 8000 bytes, so larger messages are split into parts
+that are sent in one transaction and joined again by the listeners.
+
+Other services can publish messages of their own methods with a handler. Every
+worker, the publishing one included, hands them to the handler in the order of the
+NOTIFYs, so state that the handlers derive from them is the same on every worker.
+"""
+
+import asyncio
+import json
+import uuid
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Any, Optional
+
+import asyncpg
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+from api.db.notifications import asyncpg_dsn, listen
+
+# Characters of a message per NOTIFY, below the 8000 byte limit with the part header
+PART_SIZE = 7900
+
+# Messages that are waiting for more parts, the oldest are dropped beyond this
+MAX_PARTIAL_MESSAGES = 100
+
+
+def split_message(message: dict[str, Any]) -> list[str]:
+    """Split a message into NOTIFY payloads of the form <id>:<part>:<parts>:<json>.
+
+    The JSON is ASCII only, so every character is one byte."""
+    text = json.dumps(message, separators=(",", ":"))
+    message_id = uuid.uuid4().hex
+    chunks = [text[start : start + PART_SIZE] for start in range(0, len(text), PART_SIZE)]
+    return [f"{message_id}:{part}:{len(chunks)}:{chunk}" for part, chunk in enumerate(chunks)]
+
+
+class MessageAssembler:
+    """Joins the NOTIFY payloads of split messages."""
+
+    def __init__(self) -> None:
+        self._partial: OrderedDict[str, dict[int, str]] = OrderedDict()
+
+    def add(self, payload: str) -> Optional[str]:
+        """Add a payload, and get the JSON of its message once every part is in."""
+        message_id, part, parts, chunk = payload.split(":", 3)
+        if parts == "1":
+            return chunk
+        chunks = self._partial.setdefault(message_id, {})
+        chunks[int(part)] = chunk
+        if len(chunks) < int(parts):
+            while len(self._partial) > MAX_PARTIAL_MESSAGES:
+                self._partial.popitem(last=False)
+            return None
+        del self._partial[message_id]
+        return "".join(chunks[index] for index in range(int(parts)))
+
+
+class AsyncPostgresManager(AsyncPubSubManager):  # pylint: disable=abstract-method
+    """Socket client manager that uses Postgres LISTEN/NOTIFY as its message bus.
+
+    Publishing and listening use their own asyncpg connections, outside the
+    SQLAlchemy pool, since a listening connection has to stay open."""
+
+    name = "asyncpg"
+
+    def __init__(
+        self,
+        url: str,
+        channel: str = "socketio",
+        write_only: bool = False,
+        logger: Any = None,
+        reconnect_delay: float = 1.0,
+    ) -> None:
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.dsn = asyncpg_dsn(url)
+        self.reconnect_delay = reconnect_delay
+        self._publisher: Optional[asyncpg.Connection] = None
+        self._publish_lock = asyncio.Lock()
+        # Handlers of the messages of other methods than those of python-socketio
+        self.handlers: dict[str, Callable[[dict[str, Any]], Awaitable[None]]] = {}
+
+    async def publish(self, message: dict[str, Any]) -> None:
+        """Publish a message to the handler of its method on every worker."""
+        await self._publish({**message, "host_id": self.host_id})
+
+    async def _publish(self, data: dict[str, Any]) -> None:
+        """NOTIFY every worker of a message, reconnecting once if the connection is lost."""
+        payloads = split_message(data)
+        async with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publisher is None or self._publisher.is_closed():
+                        self._publisher = await asyncpg.connect(self.dsn)
+                    async with self._publisher.transaction():
+                        for payload in payloads:
+                            await self._publisher.execute(
+                                "SELECT pg_notify($1, $2)", self.channel, payload
+                            )
+                    return
+                except (OSError, asyncpg.PostgresConnectionError, asyncpg.InterfaceError):
+                    self._publisher = None
+                    if attempt:
+                        raise
+
+    async def _listen(self) -> AsyncIterator[dict[str, Any]]:
+        """LISTEN on the channel, hand messages to their handlers and yield the others."""
+        assembler = MessageAssembler()
+        async for payload in listen(self.dsn, self.channel, self.reconnect_delay):
+            text = assembler.add(payload)
+            if text is None:
+                continue
+            message = json.loads(text)
+            handler = self.handlers.get(message.get("method"))
+            if handler is None:
+                yield message
+                continue
+            try:
+                await handler(message)
+            except Exception:  # pylint: disable=broad-exception-caught
+                self._get_logger().exception("Handler error of %s messages", message["method"])
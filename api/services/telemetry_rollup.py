@@ -0,0 +1,47 @@
+"""Module for the background rollup of the bike telemetry history
+
+With BIKE_TELEMETRY_HISTORY enabled, every bike report is added to bike_telemetry.
+TelemetryRollup rolls the new reports up into the per minute and per hour tables
+every interval, and creates the monthly partitions before they are needed.
+"""
+
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from api.config import settings
+from api.db.database import sessionmanager
+from api.db.repository_telemetry import TelemetryRepository
+from api.services.metrics import metrics
+from api.services.periodic import PeriodicTask
+
+
+class TelemetryRollup(PeriodicTask):
+    """Rolls up the bike telemetry history from a background task."""
+
+    def __init__(self, interval: float) -> None:
+        # The next rollup picks up where the last successful one stopped
+        super().__init__(interval, self.roll_up, "telemetry_rollup_errors_total")
+        self._partitioned_month: Optional[tuple[int, int]] = None
+
+    async def ensure_partitions(self) -> None:
+        """Create the partitions of the telemetry tables, once per month."""
+        now = datetime.now(timezone.utc)
+        if self._partitioned_month == (now.year, now.month):
+            return
+        async with sessionmanager.session() as session:
+            await TelemetryRepository(session).ensure_partitions(now)
+        self._partitioned_month = (now.year, now.month)
+
+    async def roll_up(self) -> None:
+        """Roll the reports since the last rollup up into the rollup tables."""
+        await self.ensure_partitions()
+        started = time.perf_counter()
+        async with sessionmanager.session() as session:
+            rolled_up = await TelemetryRepository(session).roll_up()
+        if rolled_up:
+            metrics.inc("telemetry_rollups_total")
+            metrics.set("telemetry_rollup_seconds", time.perf_counter() - started)
+
+
+telemetry_rollup = TelemetryRollup(settings.bike_telemetry_rollup_interval)
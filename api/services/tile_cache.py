@@ -0,0 +1,78 @@
+"""Module for the in-process tile cache
+
+Keeps the most recently used Mapbox Vector Tile layers, per layer and z/x/y, so that
+map clients panning over the same area do not rebuild tiles with ST_AsMVT on every
+request. Writes to bikes and zones invalidate their layer by bumping its version,
+without scanning the cache, and tiles of older versions are dropped when they are
+read or pushed out of the LRU order. Cached layers also expire after a max age, to
+pick up writes made by other workers. The cache is generic over the value it keeps
+per tile, so it also holds other per tile results such as bike clusters.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Generic, Optional, TypeVar
+
+from api.config import settings
+
+TileKey = tuple[str, int, int, int]
+T = TypeVar("T")
+
+
+class TileCache(Generic[T]):
+    """LRU cache of per tile values, like encoded vector tile layers."""
+
+    def __init__(self, max_tiles: int = 1024, max_age: float = 30.0) -> None:
+        self.max_tiles = max_tiles
+        self.max_age = max_age
+        self._tiles: OrderedDict[TileKey, tuple[float, int, T]] = OrderedDict()
+        self._versions: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._tiles)
+
+    def version(self, layer: str) -> int:
+        """Get the version of a layer, which changes every time it is invalidated."""
+        return self._versions.get(layer, 0)
+
+    def get(self, layer: str, z: int, x: int, y: int) -> Optional[T]:
+        """Get a cached tile layer, if it is cached, not invalidated and not too old."""
+        key = (layer, z, x, y)
+        cached = self._tiles.get(key)
+        if cached is None:
+            return None
+        cached_at, version, tile = cached
+        if version != self.version(layer) or time.monotonic() - cached_at > self.max_age:
+            del self._tiles[key]
+            return None
+        self._tiles.move_to_end(key)
+        return tile
+
+    def put(self, layer: str, z: int, x: int, y: int, tile: T, version: int) -> None:
+        """Cache a tile layer built at a layer version.
+
+        A layer that was invalidated while the tile was being built is not cached,
+        since the tile may already be out of date."""
+        if version != self.version(layer):
+            return
+        key = (layer, z, x, y)
+        self._tiles[key] = (time.monotonic(), version, tile)
+        self._tiles.move_to_end(key)
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+
+    def invalidate(self, layer: str) -> None:
+        """Invalidate every cached tile of a layer, in constant time.
+
+        This runs on every bike write, so the tiles are not looked up here."""
+        self._versions[layer] = self.version(layer) + 1
+
+    def clear(self) -> None:
+        """Drop every cached tile."""
+        for layer in {key[0] for key in self._tiles}:
+            self.invalidate(layer)
+        self._tiles.clear()
+
+
+# Global tile cache instance
+tile_cache: TileCache[bytes] = TileCache(settings.tile_cache_size, settings.tile_cache_max_age)
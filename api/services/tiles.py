@@ -0,0 +1,72 @@
+"""Module for slippy map (z/x/y) tile calculations
+
+Tiles follow the Web Mercator scheme used by OpenStreetMap and most map libraries,
+see https://wiki.openstreetmap.org/wiki/Slippy_map_tilenames
+"""
+
+import math
+from collections.abc import Iterable
+
+# Web Mercator cannot represent the poles, latitudes are clamped to this
+MAX_LATITUDE = 85.0511287798
+
+# Half the width of the Web Mercator (EPSG:3857) world in meters
+WEB_MERCATOR_EXTENT = 20037508.342789244
+
+
+def lonlat_to_tile(lon: float, lat: float, zoom: int) -> tuple[int, int]:
+    """Get the x and y of the tile that contains a longitude/latitude at a zoom level."""
+    n = 2**zoom
+    lat = max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)
+    lat_rad = math.radians(lat)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(zoom: int, x: int, y: int) -> tuple[float, float, float, float]:
+    """Get the (min_lon, min_lat, max_lon, max_lat) bounds of a tile."""
+    n = 2**zoom
+
+    def tile_lat(tile_y: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / n))))
+
+    return x / n * 360.0 - 180.0, tile_lat(y + 1), (x + 1) / n * 360.0 - 180.0, tile_lat(y)
+
+
+def tiles_bounds(zoom: int, tiles: Iterable[tuple[int, int]]) -> tuple[float, float, float, float]:
+    """Get the (min_lon, min_lat, max_lon, max_lat) bounds around tiles at a zoom level."""
+    bounds = [tile_bounds(zoom, x, y) for x, y in tiles]
+    return (
+        min(bound[0] for bound in bounds),
+        min(bound[1] for bound in bounds),
+        max(bound[2] for bound in bounds),
+        max(bound[3] for bound in bounds),
+    )
+
+
+def tile_range(bbox: tuple[float, float, float, float], zoom: int) -> tuple[int, int, int, int]:
+    """Get the (min_x, min_y, max_x, max_y) of the tiles at a zoom level that overlap a
+    (min_lon, min_lat, max_lon, max_lat) bounding box."""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    min_x, min_y = lonlat_to_tile(min_lon, max_lat, zoom)
+    max_x, max_y = lonlat_to_tile(max_lon, min_lat, zoom)
+    return min_x, min_y, max_x, max_y
+
+
+def tile_count(bbox: tuple[float, float, float, float], zoom: int) -> int:
+    """Count the tiles at a zoom level that overlap a bounding box, without listing them."""
+    min_x, min_y, max_x, max_y = tile_range(bbox, zoom)
+    return (max_x - min_x + 1) * (max_y - min_y + 1)
+
+
+def tiles_in_bbox(bbox: tuple[float, float, float, float], zoom: int) -> list[tuple[int, int]]:
+    """Get the x and y of every tile at a zoom level that overlaps a
+    (min_lon, min_lat, max_lon, max_lat) bounding box."""
+    min_x, min_y, max_x, max_y = tile_range(bbox, zoom)
+    return [(x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)]
+
+
+def is_valid_tile(zoom: int, x: int, y: int) -> bool:
+    """Check if x and y are inside the tile grid of a zoom level."""
+    return zoom >= 0 and 0 <= x < 2**zoom and 0 <= y < 2**zoom
@@ -0,0 +1,148 @@
+"""Module for the in-process spatial index of map zones
+
+Point-in-zone lookups are answered from memory instead of the database. Every city
+has an STRtree over the bounding boxes of its zone boundaries, and the boundaries are
+prepared, so a lookup is a tree query for the few candidate zones and an exact
+contains check against each. The zone type and fees are kept with every zone, so a
+lookup needs nothing else. Batches of points are classified with one bulk tree query
+and one vectorized contains check over numpy coordinate arrays.
+
+The index is loaded at startup, rebuilt when this process writes zones or zone types,
+and periodically reloaded to pick up writes made by other workers.
+"""
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+import shapely
+from shapely import Point, STRtree
+
+from api.models.wkt_models import parse_wkt
+from api.services.metrics import metrics
+
+
+@dataclass(slots=True)
+class IndexedZone:
+    """A map zone with its zone type, as kept in the zone index."""
+
+    id: int
+    zone_name: str
+    city_id: int
+    zone_type_id: int
+    type_name: str
+    speed_limit: Optional[int]
+    start_fee: float
+    end_fee: float
+
+
+class CityZones:
+    """STRtree of the prepared zone boundaries of one city."""
+
+    def __init__(self, zones: list[IndexedZone], boundaries: list[str]) -> None:
+        self.zones = zones
+        self.zone_ids = np.array([zone.id for zone in zones])
+        self.boundaries = shapely.from_wkt(boundaries)
+        shapely.prepare(self.boundaries)
+        self.tree = STRtree(self.boundaries)
+
+    def find(self, point: Point) -> list[IndexedZone]:
+        """Get the zones that contain a point, in the order they were loaded."""
+        candidates = self.tree.query(point)
+        hits = candidates[shapely.contains(self.boundaries[candidates], point)]
+        return [self.zones[index] for index in sorted(hits)]
+
+    def classify(self, x: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Get the point indexes and zone ids of every zone that contains a point."""
+        point_indexes, zone_indexes = self.tree.query(shapely.points(x, y))
+        candidates = self.boundaries[zone_indexes]
+        inside = shapely.contains_xy(candidates, x[point_indexes], y[point_indexes])
+        return point_indexes[inside], self.zone_ids[zone_indexes[inside]]
+
+
+class ZoneIndex:
+    """Process-local spatial index of the map zones of every city."""
+
+    def __init__(self) -> None:
+        self._cities: dict[int, CityZones] = {}
+        self._zones: dict[int, IndexedZone] = {}
+        self._loaded = False
+
+    @property
+    def is_loaded(self) -> bool:
+        """Check if the index has been loaded from the database."""
+        return self._loaded
+
+    def __len__(self) -> int:
+        return len(self._zones)
+
+    def load(self, rows: Iterable[Any]) -> None:
+        """Replace the index with the zones in rows.
+
+        Rows need id, zone_name, city_id, zone_type_id, type_name, speed_limit,
+        start_fee, end_fee and the boundary as WKT. The new index is built before it
+        replaces the old one, so lookups never see a partial index."""
+        zones: dict[int, tuple[list[IndexedZone], list[str]]] = {}
+        for row in rows:
+            city_zones, boundaries = zones.setdefault(row.city_id, ([], []))
+            city_zones.append(
+                IndexedZone(
+                    id=row.id,
+                    zone_name=row.zone_name,
+                    city_id=row.city_id,
+                    zone_type_id=row.zone_type_id,
+                    type_name=row.type_name,
+                    speed_limit=row.speed_limit,
+                    start_fee=float(row.start_fee),
+                    end_fee=float(row.end_fee),
+                )
+            )
+            boundaries.append(row.boundary)
+
+        self._cities = {
+            city_id: CityZones(city_zones, boundaries)
+            for city_id, (city_zones, boundaries) in zones.items()
+        }
+        self._zones = {zone.id: zone for city_zones, _ in zones.values() for zone in city_zones}
+        self._loaded = True
+        metrics.set("zone_index_zones", len(self))
+
+    def find(self, point: str, city_id: Optional[int] = None) -> list[IndexedZone]:
+        """Get every zone that contains a WKT point, in a city or in any city."""
+        geometry = parse_wkt(point)
+        if city_id is not None:
+            city = self._cities.get(city_id)
+            return city.find(geometry) if city is not None else []
+        return [zone for city in self._cities.values() for zone in city.find(geometry)]
+
+    def classify(
+        self, coordinates: Any, city_id: Optional[int] = None
+    ) -> tuple[list[list[int]], list[IndexedZone]]:
+        """Classify (lon, lat) coordinates by the zones that contain them, in a city or
+        in any city.
+
+        Returns the ids of the zones that contain each point, in the order of the
+        points, and every zone that contains a point."""
+        coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+        x, y = coordinates[:, 0], coordinates[:, 1]
+        if city_id is None:
+            cities = list(self._cities.values())
+        else:
+            cities = [self._cities[city_id]] if city_id in self._cities else []
+        hits = [city.classify(x, y) for city in cities]
+
+        zone_ids: list[list[int]] = [[] for _ in range(len(coordinates))]
+        if not hits:
+            return zone_ids, []
+        point_indexes = np.concatenate([point_indexes for point_indexes, _ in hits])
+        hit_zone_ids = np.concatenate([ids for _, ids in hits])
+        order = np.lexsort((hit_zone_ids, point_indexes))
+        point_indexes, hit_zone_ids = point_indexes[order], hit_zone_ids[order]
+        for point_index, zone_id in zip(point_indexes.tolist(), hit_zone_ids.tolist()):
+            zone_ids[point_index].append(zone_id)
+        return zone_ids, [self._zones[zone_id] for zone_id in np.unique(hit_zone_ids).tolist()]
+
+
+# Global zone index instance
+zone_index = ZoneIndex()
@@ -0,0 +1,81 @@
+"""Module for testing the bike repository"""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from api.db.repository_bike import BikeRepository
+
+
+class TestBikeRepository:
+    """Class to test the queries of the bike repository"""
+
+    @pytest.mark.asyncio
+    async def test_nearby_bikes_knn_order(self):
+        """Tests that nearby bikes are ordered by <-> in meters, which the index serves"""
+        session = MagicMock(execute=AsyncMock(return_value=MagicMock()))
+        await BikeRepository(session).get_nearby_bikes("POINT(13.07 55.58)", 5, 500)
+
+        sql = str(session.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+        position = "CAST(bikes.last_position AS geography)"
+        assert f"ST_DWithin({position}, ST_GeogFromText(" in sql
+        assert f"ORDER BY {position} <-> ST_GeogFromText(" in sql
+        assert "LIMIT" in sql
+        assert "ST_DistanceSphere" not in sql
+
+    @pytest.mark.asyncio
+    async def test_reconcile_fleet_stats_locked(self):
+        """Tests that the counters are left alone while another worker reconciles them"""
+        session = MagicMock(
+            scalar=AsyncMock(return_value=False), execute=AsyncMock(), commit=AsyncMock()
+        )
+
+        assert await BikeRepository(session).reconcile_fleet_stats() is None
+
+        session.execute.assert_not_awaited()
+        session.commit.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_reconcile_fleet_stats(self):
+        """Tests that every bike is refreshed and the counters are recounted from the
+        members, with the counters that were off returned"""
+        recounted, emptied = MagicMock(), MagicMock()
+        recounted.all.return_value = [(1,), (2,)]
+        emptied.all.return_value = [(3,)]
+        session = MagicMock(
+            scalar=AsyncMock(return_value=True),
+            execute=AsyncMock(side_effect=[MagicMock(), MagicMock(), recounted, emptied]),
+            commit=AsyncMock(),
+        )
+
+        assert await BikeRepository(session).reconcile_fleet_stats() == 3
+
+        lock = str(session.scalar.await_args.args[0].compile(dialect=postgresql.dialect()))
+        assert "pg_try_advisory_xact_lock" in lock
+        lock_table, refresh, recount, empty = (
+            str(call.args[0].compile(dialect=postgresql.dialect()))
+            for call in session.execute.await_args_list
+        )
+        assert lock_table == "LOCK TABLE fleet_stats IN SHARE ROW EXCLUSIVE MODE"
+        assert refresh.startswith("SELECT refresh_fleet_stats(ARRAY(SELECT id FROM bikes ")
+        assert recount.startswith("INSERT INTO fleet_stats ")
+        assert "FROM fleet_stats_members GROUP BY" in recount
+        assert "ON CONFLICT (city_id, status, battery_bucket) DO UPDATE" in recount
+        assert "WHERE fleet_stats.bikes != excluded.bikes" in recount
+        assert empty.startswith("UPDATE fleet_stats SET bikes=")
+        assert "NOT (EXISTS (SELECT * \nFROM fleet_stats_members" in empty
+        session.commit.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_bikes_in_zone_membership(self):
+        """Tests that bikes in a zone are looked up in bike_map_zones by equality,
+        instead of a point-in-polygon join"""
+        session = MagicMock(execute=AsyncMock(return_value=MagicMock()))
+        await BikeRepository(session).get_bikes_in_zone(2, 1)
+
+        sql = str(session.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+        assert "JOIN bike_map_zones ON bike_map_zones.bike_id = bikes.id" in sql
+        assert "JOIN map_zones ON map_zones.id = bike_map_zones.map_zone_id" in sql
+        assert "ST_Contains" not in sql
+        assert "bike_map_zones.deleted_at" not in sql
@@ -0,0 +1,168 @@
+"""Module for testing the bike telemetry repository"""
+
+import re
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from api.db.repository_telemetry import TelemetryRepository, month_start
+
+
+def mock_session(*scalars):
+    """Creates a session mock that returns scalars in order"""
+    return MagicMock(
+        execute=AsyncMock(return_value=MagicMock()),
+        scalar=AsyncMock(side_effect=list(scalars)),
+        commit=AsyncMock(),
+    )
+
+
+def read_tables(sql):
+    """Gets the tables a statement reads from"""
+    return re.findall(r"\nFROM (bike_telemetry\w*)", sql)
+
+
+def executed_sql(session):
+    """Gets the SQL of every statement the session executed"""
+    return [
+        str(call.args[0].compile(dialect=postgresql.dialect()))
+        for call in session.execute.await_args_list
+    ]
+
+
+class TestTelemetryRepository:
+    """Class to test the queries of the bike telemetry repository"""
+
+    def test_month_start(self):
+        """Tests that months are counted over year ends"""
+        moment = datetime(2026, 11, 20, 8, tzinfo=timezone.utc)
+        assert month_start(moment) == datetime(2026, 11, 1, tzinfo=timezone.utc)
+        assert month_start(moment, 2) == datetime(2027, 1, 1, tzinfo=timezone.utc)
+
+    @pytest.mark.asyncio
+    async def test_ensure_partitions(self):
+        """Tests that monthly partitions are created ahead, without a default partition"""
+        session = mock_session()
+
+        await TelemetryRepository(session).ensure_partitions(
+            datetime(2026, 11, 20, 8, tzinfo=timezone.utc)
+        )
+
+        sql = executed_sql(session)
+        assert not any("DEFAULT" in statement for statement in sql)
+        assert sql[0] == (
+            "CREATE TABLE IF NOT EXISTS bike_telemetry_202611 PARTITION OF bike_telemetry "
+            "FOR VALUES FROM ('2026-11-01T00:00:00+00:00') TO ('2026-12-01T00:00:00+00:00')"
+        )
+        assert [statement.split()[5] for statement in sql] == [
+            "bike_telemetry_202611",
+            "bike_telemetry_202612",
+            "bike_telemetry_202701",
+            "bike_telemetry_1m_202611",
+            "bike_telemetry_1m_202612",
+            "bike_telemetry_1m_202701",
+        ]
+        session.commit.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_roll_up_locked(self):
+        """Tests that nothing is rolled up while another worker holds the lock"""
+        session = mock_session(False)
+
+        assert not await TelemetryRepository(session).roll_up()
+
+        session.execute.assert_not_awaited()
+        session.commit.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_roll_up(self):
+        """Tests that reports roll up into minutes, and minutes into hours, from one
+        bucket before the last one"""
+        last_minute = datetime(2026, 10, 16, 12, 30, tzinfo=timezone.utc)
+        session = mock_session(True, last_minute, None)
+
+        assert await TelemetryRepository(session).roll_up()
+
+        minutes, hours = executed_sql(session)
+        assert minutes.startswith("INSERT INTO bike_telemetry_1m ")
+        assert read_tables(minutes) == ["bike_telemetry"]
+        assert "WHERE bike_telemetry.created_at >= " in minutes
+        assert "ON CONFLICT (bike_id, bucket) DO UPDATE" in minutes
+        assert "updated_at" not in minutes
+        start = session.execute.await_args_list[0].args[0].compile().params
+        assert last_minute - timedelta(minutes=1) in start.values()
+        # The hours have not been rolled up before, so every minute is read
+        assert hours.startswith("INSERT INTO bike_telemetry_1h ")
+        assert read_tables(hours) == ["bike_telemetry_1m"]
+        assert "WHERE" not in hours
+        session.commit.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        ("step", "source", "tables"),
+        [
+            (timedelta(hours=2), "bike_telemetry_1h", ["bike_telemetry_1h", "bike_telemetry"]),
+            (timedelta(minutes=5), "bike_telemetry_1m", ["bike_telemetry_1m", "bike_telemetry"]),
+            # Neither rollup bucket size divides 90 seconds
+            (timedelta(seconds=90), "bike_telemetry", ["bike_telemetry"]),
+        ],
+    )
+    async def test_get_history_source(self, step, source, tables):
+        """Tests that buckets are read from the coarsest rollup that divides the step,
+        with the raw reports from its last bucket onward"""
+        last_bucket = datetime(2026, 10, 16, 10, tzinfo=timezone.utc)
+        session = mock_session(last_bucket)
+
+        read, _ = await TelemetryRepository(session).get_history(
+            1,
+            datetime(2026, 10, 16, tzinfo=timezone.utc),
+            datetime(2026, 10, 16, 12, tzinfo=timezone.utc),
+            step,
+            1000,
+        )
+
+        assert read == source
+        (sql,) = executed_sql(session)
+        assert read_tables(sql) == tables
+        if len(tables) == 2:
+            # The rollup is read up to its last bucket and the reports from there on
+            rollup, reports = sql.split("UNION ALL")
+            assert f"{source}.bucket < " in rollup
+            assert "bike_telemetry.created_at >= " in reports
+            params = session.execute.await_args.args[0].compile().params
+            assert list(params.values()).count(last_bucket) == 2
+
+    @pytest.mark.asyncio
+    async def test_get_history_before_rollups(self):
+        """Tests that the reports are read while the rollup has no bucket after start"""
+        session = mock_session(None)
+
+        read, _ = await TelemetryRepository(session).get_history(
+            1,
+            datetime(2026, 10, 16, tzinfo=timezone.utc),
+            datetime(2026, 10, 16, 12, tzinfo=timezone.utc),
+            timedelta(hours=1),
+            1000,
+        )
+
+        assert read == "bike_telemetry"
+        assert "UNION ALL" not in executed_sql(session)[0]
+
+    @pytest.mark.asyncio
+    async def test_get_history_reports(self):
+        """Tests that every report is read without a step"""
+        session = mock_session()
+
+        read, _ = await TelemetryRepository(session).get_history(
+            1,
+            datetime(2026, 10, 16, tzinfo=timezone.utc),
+            datetime(2026, 10, 16, 12, tzinfo=timezone.utc),
+            None,
+            50,
+        )
+
+        assert read == "bike_telemetry"
+        session.scalar.assert_not_awaited()
+        assert "ORDER BY bike_telemetry.created_at" in executed_sql(session)[0]
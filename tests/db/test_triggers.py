@@ -0,0 +1,45 @@
+"""Module for testing the database triggers"""
+
+import re
+
+from api.db import triggers
+from api.models.bike_models import FleetStatsAttributes
+
+
+class TestTriggers:
+    """Class to test the SQL of the database triggers"""
+
+    def test_fleet_stats_triggers(self):
+        """Tests that every statement that changes bikes or trips refreshes the fleet
+        statistics once, with the rows it changed"""
+        assert len(triggers.CREATE_FLEET_STATS_TRIGGERS) == 6
+        for table in ("bikes", "trips"):
+            for event, rows in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+                (trigger,) = (
+                    trigger
+                    for trigger in triggers.CREATE_FLEET_STATS_TRIGGERS
+                    if f"AFTER {event} ON {table}\n" in trigger
+                )
+                assert f"REFERENCING {rows} TABLE AS changed_rows" in trigger
+                assert f"FOR EACH STATEMENT EXECUTE FUNCTION refresh_fleet_stats_of_{table}()" in (
+                    trigger
+                )
+
+    def test_fleet_stats_trigger_functions(self):
+        """Tests that the trigger functions refresh the bikes of the changed rows"""
+        bikes, trips = triggers.CREATE_FLEET_STATS_TRIGGER_FUNCTIONS
+        assert "refresh_fleet_stats_of_bikes()" in bikes
+        assert "ARRAY(SELECT DISTINCT id FROM changed_rows)" in bikes
+        assert "refresh_fleet_stats_of_trips()" in trips
+        assert "ARRAY(SELECT DISTINCT bike_id FROM changed_rows)" in trips
+
+    def test_refresh_fleet_stats(self):
+        """Tests that bikes only move between counters when their key changed, and that
+        counters and members are written in key order"""
+        sql = " ".join(triggers.CREATE_FLEET_STATS_FUNCTION.split())
+        assert "IS DISTINCT FROM (stored.city_id, stored.status, stored.battery_bucket)" in sql
+        assert "HAVING sum(delta) <> 0" in sql
+        assert "ORDER BY city_id, status, battery_bucket ON CONFLICT" in sql
+        assert "ORDER BY bike_id ON CONFLICT (bike_id)" in sql
+        # The statuses match the ones of FleetStatsAttributes
+        assert set(re.findall(r"'(\w+)'", sql)) < set(FleetStatsAttributes.model_fields)
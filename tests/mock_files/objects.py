@@ -1,4 +1,6 @@
 import datetime
+from collections import namedtuple
+from decimal import Decimal
 
 from api.models.db_models import Bike, MapZone, Transaction, Trip, User, ZoneType
 from api.models.trip_models import (
@@ -368,3 +370,54 @@ fake_transactions_data = [
         updated_at=datetime.datetime(2025, 1, 19, 17, 55, 39, 596693),
     ),
 ]
+
+FakeZoneIndexRow = namedtuple(
+    "FakeZoneIndexRow",
+    [
+        "id",
+        "zone_name",
+        "city_id",
+        "zone_type_id",
+        "type_name",
+        "speed_limit",
+        "start_fee",
+        "end_fee",
+        "boundary",
+    ],
+)
+
+fake_zone_index_rows = [
+    FakeZoneIndexRow(
+        1,
+        "Centrum",
+        1,
+        1,
+        "Parking",
+        20,
+        Decimal("10.00"),
+        Decimal("0.00"),
+        "POLYGON((0 0, 2 0, 2 2, 0 2, 0 0))",
+    ),
+    FakeZoneIndexRow(
+        2,
+        "Torget",
+        1,
+        2,
+        "Slow",
+        10,
+        Decimal("0.00"),
+        Decimal("5.50"),
+        "POLYGON((1 1, 3 1, 3 3, 1 3, 1 1))",
+    ),
+    FakeZoneIndexRow(
+        3,
+        "Hamnen",
+        2,
+        1,
+        "Parking",
+        None,
+        Decimal("10.00"),
+        Decimal("0.00"),
+        "POLYGON((1 1, 3 1, 3 3, 1 3, 1 1))",
+    ),
+]
@@ -1,8 +1,22 @@
 """Module for testing models and model functions"""
 
+import json
+
 import pytest
+import shapely
 
-from api.models.wkt_models import validate_wkt_point
+from api.models.bike_models import MAX_CLUSTER_TILES, BikeClusterGetRequestParams
+from api.models.models import validate_attributes
+from api.models.trip_models import TripAttributes, TripCreate
+from api.models.wkt_models import (
+    DATABASE_CONTEXT,
+    WKTLineStringGeometry,
+    parse_wkt,
+    validate_wkt_linestring,
+    validate_wkt_point,
+    validate_wkt_polygon,
+)
+from api.services import tiles
 
 
 class TestValidateWktPoint:
@@ -47,3 +61,139 @@ class TestValidateWktPoint:
         invalid_point = "POINT(14.2 200.52)"
         with pytest.raises(ValueError):
             assert validate_wkt_point(invalid_point)
+
+
+class TestWktGeometry:
+    """Class to test the parse-once WKT geometry values"""
+
+    def test_parse_keeps_geometry(self):
+        """Tests that a parsed value is the WKT string and keeps its coordinates"""
+        path = validate_wkt_linestring("LINESTRING(11.9746 57.7089, 11.9747 57.709)")
+
+        assert isinstance(path, str)
+        assert path == "LINESTRING(11.9746 57.7089, 11.9747 57.709)"
+        assert path.coordinates.tolist() == [[11.9746, 57.7089], [11.9747, 57.709]]
+        assert path.geometry.length > 0
+        assert json.loads(path.geojson)["type"] == "LineString"
+        assert parse_wkt(path) is path.geometry
+        # A parsed value is not parsed again
+        assert WKTLineStringGeometry.parse(path) is path
+
+    def test_parse_checks_every_coordinate(self):
+        """Tests that coordinates out of bounds fail anywhere in a geometry"""
+        with pytest.raises(ValueError, match="Invalid coordinates"):
+            validate_wkt_linestring("LINESTRING(11 57, 12 57, 200 57)")
+        with pytest.raises(ValueError, match="Invalid coordinates"):
+            validate_wkt_polygon("POLYGON((0 0, 10 0, 10 10, 0 10, 0 0), (1 1, 2 1, 2 95, 1 1))")
+
+    def test_parse_checks_geometry_type(self):
+        """Tests that a geometry of another type fails"""
+        with pytest.raises(ValueError, match="Geometry must be a Point"):
+            validate_wkt_point("LINESTRING(11 57, 12 57)")
+        with pytest.raises(ValueError, match="Geometry must be a LineString"):
+            validate_wkt_linestring(validate_wkt_point("POINT(11 57)"))
+        with pytest.raises(ValueError):
+            validate_wkt_point("POINT EMPTY")
+
+
+class TestDatabaseContext:
+    """Class to test that WKT read from the database is not parsed again"""
+
+    @pytest.fixture(name="parses")
+    def fixture_parses(self, monkeypatch):
+        """Count the WKT strings that are parsed"""
+        parses = []
+        from_wkt = shapely.from_wkt
+
+        def counting_from_wkt(value, *args, **kwargs):
+            parses.append(value)
+            return from_wkt(value, *args, **kwargs)
+
+        monkeypatch.setattr(shapely, "from_wkt", counting_from_wkt)
+        return parses
+
+    @staticmethod
+    def trip_row(trip_id):
+        """A trip row as the trip repository returns it"""
+        path = ", ".join(f"{11 + point / 1000} {57 + point / 1000}" for point in range(1000))
+        return {
+            "start_position": "POINT(11 57)",
+            "end_position": "POINT(11.999 57.999)",
+            "path_taken": f"LINESTRING({path})",
+            "start_time": "2024-01-01T12:00:00",
+            "end_time": "2024-01-01T12:30:00",
+            "created_at": "2024-01-01T12:00:00",
+            "updated_at": "2024-01-01T12:30:00",
+            "id": trip_id,
+        }
+
+    def test_page_is_not_parsed(self, parses):
+        """Tests that a page of trips from the database parses no WKT, while the same
+        page parses every geometry without the context"""
+        page = [self.trip_row(trip_id) for trip_id in range(300)]
+
+        trusted = [validate_attributes(TripAttributes, row) for row in page]
+        assert not parses
+        assert trusted[0].path_taken == page[0]["path_taken"]
+        assert isinstance(trusted[0].path_taken, WKTLineStringGeometry)
+        # The geometry is still there when it is used
+        assert trusted[0].path_taken.coordinates.shape == (1000, 2)
+        assert len(parses) == 1
+
+        parses.clear()
+        for row in page:
+            TripAttributes.model_validate(row)
+        assert len(parses) == 3 * len(page)
+
+    def test_sparse_fieldset_is_not_parsed(self, parses):
+        """Tests that sparse fieldsets skip the parsing too"""
+        attributes = validate_attributes(TripAttributes, self.trip_row(1), ["path_taken"])
+
+        assert set(attributes) == {"path_taken"}
+        assert not parses
+
+    def test_validated_geometry_is_kept(self, parses):
+        """Tests that a validated geometry is not parsed again in another model"""
+        attributes = TripAttributes.model_validate(self.trip_row(1))
+        parses.clear()
+
+        copy = TripAttributes.model_validate(attributes.model_dump())
+        assert copy.path_taken is attributes.path_taken
+        assert not parses
+
+    def test_request_bodies_are_validated(self):
+        """Tests that WKT in request bodies is still validated"""
+        with pytest.raises(ValueError, match="Invalid coordinates"):
+            TripCreate.model_validate(
+                {"id": 1, "user_id": 1, "bike_id": 1, "start_position": "POINT(200 57)"}
+            )
+        with pytest.raises(ValueError):
+            TripAttributes.model_validate(self.trip_row(1) | {"start_position": "Banangatan"})
+        # The context only skips parsing, the value must still be a string
+        with pytest.raises(ValueError):
+            TripAttributes.model_validate(
+                self.trip_row(1) | {"start_position": 11}, context=DATABASE_CONTEXT
+            )
+
+
+class TestBikeClusterParams:
+    """Class to test the bbox check of the bike cluster query params"""
+
+    def test_tile_count(self):
+        """Tests that tiles are counted like they are listed"""
+        bbox = (12.9, 55.4, 13.3, 55.7)
+        assert tiles.tile_count(bbox, 11) == len(tiles.tiles_in_bbox(bbox, 11)) == 12
+
+    def test_large_bbox_is_not_listed(self, monkeypatch):
+        """Tests that a bbox over too many tiles is rejected without listing its tiles"""
+        listed = []
+        monkeypatch.setattr(
+            "api.models.bike_models.tiles_in_bbox", lambda *args: listed.append(args)
+        )
+        with pytest.raises(ValueError, match=f"more than {MAX_CLUSTER_TILES} tiles"):
+            BikeClusterGetRequestParams(bbox="-179,-80,179,80", zoom=18)
+        assert not listed
+
+        params = BikeClusterGetRequestParams(bbox="12.9,55.4,13.3,55.7", zoom=11)
+        assert not listed
+        assert params.tile_bounds == (12.9, 55.4, 13.3, 55.7)
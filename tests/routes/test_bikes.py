@@ -1,16 +1,38 @@
 """Module for testing bike module"""
 
-from unittest.mock import AsyncMock
+import warnings
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
+from fastapi._compat import get_model_fields
 from httpx import ASGITransport, AsyncClient
+from pydantic.warnings import UnsupportedFieldAttributeWarning
 
 from api.db.repository_bike import BikeRepository
+from api.db.repository_telemetry import TelemetryRepository
 from api.main import app
+from api.models.bike_models import BikeTelemetryHistoryGetRequestParams
 from api.routes.bikes import security_check
+from api.services.bike_write_buffer import BikeWriteBuffer
+from api.services.fleet_cache import FleetCache
+from api.services.socket import BikeRoomRouter, BikeUpdateEmitter, socket
+from api.services.tile_cache import TileCache
 from tests.mock_files.objects import fake_bike_data
 from tests.utils import get_fake_json_data
 
+FleetCacheRow = namedtuple(
+    "FleetCacheRow",
+    ["id", "city_id", "battery_lvl", "lon", "lat", "is_available", "updated_at", "created_at"],
+    defaults=[None],
+)
+TelemetryRow = namedtuple(
+    "TelemetryRow",
+    ["time", "samples", "battery_sum", "battery_min", "battery_max", "last_position"],
+)
+FleetStatsRow = namedtuple("FleetStatsRow", ["city_id", "status", "battery_bucket", "bikes"])
+
 
 class TestBikeRoute:
     """Class to test bike routes"""
@@ -80,3 +102,265 @@ class TestBikeRoute:
         assert response.status_code == 200
         expected_response = get_fake_json_data("bike")
         assert response.json() == expected_response
+
+    @pytest.mark.asyncio
+    async def test_telemetry_batch(self, monkeypatch):
+        """Tests v1/bikes/telemetry:batch route"""
+
+        async def mock_admin_check():
+            return 1
+
+        app.dependency_overrides[security_check] = mock_admin_check
+        # Mock database call, bike 2 does not exist
+        mock_update_bulk = AsyncMock(return_value={1})
+        monkeypatch.setattr(BikeRepository, "update_bikes_bulk", mock_update_bulk)
+        # Mock socket emit function
+        mock_socket_emit = AsyncMock()
+        monkeypatch.setattr(socket, "emit", mock_socket_emit)
+        monkeypatch.setattr("api.services.socket.bike_rooms", BikeRoomRouter([12, 14]))
+        emitter = BikeUpdateEmitter(0.25)
+        monkeypatch.setattr("api.services.socket.bike_emitter", emitter)
+
+        reports = [
+            {"bike_id": 1, "battery_lvl": 40, "last_position": "POINT(13.06 55.57)"},
+            {"bike_id": 2, "battery_lvl": 80},
+        ]
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            response = await ac.post("v1/bikes/telemetry:batch", json={"reports": reports})
+
+        assert response.status_code == 200
+        mock_update_bulk.assert_awaited_once_with(
+            [
+                {"bike_id": 1, "battery_lvl": 40, "last_position": "POINT(13.06 55.57)"},
+                {"bike_id": 2, "battery_lvl": 80},
+            ]
+        )
+        assert [result["attributes"]["status"] for result in response.json()["data"]] == [
+            "updated",
+            "not_found",
+        ]
+        # One batch per room on the next tick, only with the updated bike
+        await emitter.flush()
+        emitted = {
+            call.kwargs["room"]: call.kwargs["data"] for call in mock_socket_emit.call_args_list
+        }
+        assert {call.args[0] for call in mock_socket_emit.call_args_list} == {"bike_updates_batch"}
+        assert set(emitted) == {"bike_updates", "tile:12/2196/1284", "tile:14/8786/5136"}
+        assert [bike["bike_id"] for bike in emitted["bike_updates"]] == [1]
+
+    @pytest.mark.asyncio
+    async def test_update_bike_write_behind(self, monkeypatch):
+        """Tests that a buffered update gets the admin view of the synchronous update"""
+        app.dependency_overrides[security_check] = lambda: 1
+        bike = fake_bike_data[0]
+        cache = FleetCache()
+        cache.load(
+            [FleetCacheRow(1, 1, 45, 13.06782, 55.577859, True, bike.updated_at, bike.created_at)]
+        )
+        buffer = BikeWriteBuffer(interval=60, max_updates=100)
+        monkeypatch.setattr(buffer, "_task", MagicMock())
+        monkeypatch.setattr("api.routes.bikes.fleet_cache", cache)
+        monkeypatch.setattr("api.routes.bikes.bike_write_buffer", buffer)
+        monkeypatch.setattr("api.services.socket.bike_emitter", BikeUpdateEmitter(0.25))
+        # Database should not be called
+        mock_update_bike = AsyncMock()
+        monkeypatch.setattr(BikeRepository, "update_bike", mock_update_bike)
+
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            response = await ac.patch("v1/bikes/1", json={"battery_lvl": 30})
+
+        assert response.status_code == 202
+        mock_update_bike.assert_not_awaited()
+        assert buffer.pending_bikes == 1
+        data = response.json()["data"]
+        assert data["attributes"]["battery_lvl"] == 30
+        assert data["attributes"]["created_at"] == "2024-07-13T07:56:50.758246Z"
+        assert data["links"]["self"] == "http://localhost:8000/v1/bikes1"
+        assert response.json()["links"]["self"] == "http://localhost:8000/v1/bikes"
+
+    @pytest.mark.asyncio
+    async def test_get_bike_telemetry(self, monkeypatch):
+        """Tests v1/bikes/{bike_id}/telemetry route"""
+        app.dependency_overrides[security_check] = self.mock_security_check
+        start = datetime(2026, 10, 16, tzinfo=timezone.utc)
+        mock_get_history = AsyncMock(
+            return_value=(
+                "bike_telemetry_1m",
+                [
+                    TelemetryRow(start, 4, 350, 86, 90, "POINT(13.06 55.57)"),
+                    TelemetryRow(start + timedelta(minutes=1), 2, 171, 85, 86, None),
+                ],
+            )
+        )
+        monkeypatch.setattr(TelemetryRepository, "get_history", mock_get_history)
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", UnsupportedFieldAttributeWarning)
+            get_model_fields(BikeTelemetryHistoryGetRequestParams)
+
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            response = await ac.get(
+                "v1/bikes/1/telemetry?from=2026-10-16T00:00:00&to=2026-10-16T12:00:00Z"
+            )
+            too_long = await ac.get(
+                "v1/bikes/1/telemetry?from=2026-10-01T00:00:00Z&to=2026-10-16T00:00:00Z"
+                "&resolution=1m"
+            )
+
+        assert response.status_code == 200
+        # 720 one minute buckets is the finest resolution within the limit
+        mock_get_history.assert_awaited_once_with(
+            1, start, start + timedelta(hours=12), timedelta(minutes=1), 1000
+        )
+        body = response.json()
+        assert body["meta"] == {"resolution": "1m", "source": "bike_telemetry_1m"}
+        assert [bucket["attributes"]["battery_avg"] for bucket in body["data"]] == [87.5, 85.5]
+        assert body["data"][0]["attributes"]["last_position"] == "POINT(13.06 55.57)"
+        assert too_long.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_get_fleet_stats(self, monkeypatch):
+        """Tests v1/bikes/stats route"""
+        app.dependency_overrides[security_check] = self.mock_security_check
+        mock_get_fleet_stats = AsyncMock(
+            return_value=[
+                FleetStatsRow(1, "available", 9, 3),
+                FleetStatsRow(1, "available", 1, 2),
+                FleetStatsRow(1, "in_use", 5, 1),
+                FleetStatsRow(1, "unavailable", 0, 1),
+                FleetStatsRow(1, "deleted", 0, 4),
+            ]
+        )
+        monkeypatch.setattr(BikeRepository, "get_fleet_stats", mock_get_fleet_stats)
+
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            response = await ac.get("v1/bikes/stats?city_id=1")
+
+        assert response.status_code == 200
+        mock_get_fleet_stats.assert_awaited_once_with(1)
+        data = response.json()["data"]
+        assert [city["id"] for city in data] == ["1"]
+        assert data[0]["attributes"] == {
+            "available": 5,
+            "in_use": 1,
+            "unavailable": 1,
+            "deleted": 4,
+            "low_battery": 3,
+            "battery_histogram": [1, 2, 0, 0, 0, 1, 0, 0, 0, 3],
+        }
+
+    @pytest.mark.asyncio
+    async def test_get_available_bikes_from_cache(self, monkeypatch):
+        """Tests that v1/bikes/available is served from a loaded fleet cache"""
+        cache = FleetCache()
+        cache.load(
+            [
+                FleetCacheRow(1, 1, 45, 13.06782, 55.577859, True, fake_bike_data[0].updated_at),
+                FleetCacheRow(2, 1, 95, 13.1, 55.5, True, fake_bike_data[1].updated_at),
+                FleetCacheRow(3, 1, 80, 13.2, 55.6, False, fake_bike_data[1].updated_at),
+                FleetCacheRow(4, 3, 60, 18.0, 59.3, True, fake_bike_data[1].updated_at),
+            ]
+        )
+        monkeypatch.setattr("api.routes.bikes.fleet_cache", cache)
+        # Database should not be called
+        mock_get_bikes = AsyncMock(return_value=[])
+        monkeypatch.setattr(BikeRepository, "get_bikes", mock_get_bikes)
+
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            response = await ac.get("v1/bikes/available?city_id=1&battery_gt=50")
+
+        assert response.status_code == 200
+        mock_get_bikes.assert_not_awaited()
+        body = response.json()
+        assert [bike["id"] for bike in body["data"]] == ["2"]
+        assert body["data"][0]["attributes"]["last_position"] == "POINT(13.1 55.5)"
+        assert body["meta"]["source"] == "fleet_cache"
+
+    @pytest.mark.asyncio
+    async def test_get_bike_clusters_from_cache(self, monkeypatch):
+        """Tests that v1/bikes/clusters clusters the fleet cache and caches the clusters"""
+        cache = FleetCache()
+        cache.load(
+            [
+                FleetCacheRow(1, 1, 45, 13.06782, 55.577859, True, fake_bike_data[0].updated_at),
+                FleetCacheRow(2, 1, 95, 13.1, 55.5, True, fake_bike_data[1].updated_at),
+                FleetCacheRow(3, 1, 80, 13.1, 55.5, True, fake_bike_data[1].updated_at),
+                FleetCacheRow(4, 1, 80, 13.2, 55.6, False, fake_bike_data[1].updated_at),
+                FleetCacheRow(5, 3, 60, 18.0, 59.3, True, fake_bike_data[1].updated_at),
+            ]
+        )
+        monkeypatch.setattr("api.routes.bikes.fleet_cache", cache)
+        monkeypatch.setattr("api.routes.bikes.cluster_cache", TileCache(max_age=60))
+        # Database should not be called
+        mock_get_clusters = AsyncMock(return_value=[])
+        monkeypatch.setattr(BikeRepository, "get_bike_clusters", mock_get_clusters)
+
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            response = await ac.get("v1/bikes/clusters?bbox=12.9,55.4,13.3,55.7&zoom=11")
+            cached = await ac.get("v1/bikes/clusters?bbox=12.9,55.4,13.3,55.7&zoom=11")
+            too_large = await ac.get("v1/bikes/clusters?bbox=10,50,20,60&zoom=11")
+
+        assert response.status_code == 200
+        mock_get_clusters.assert_not_awaited()
+        clusters = {cluster["id"]: cluster["attributes"] for cluster in response.json()["data"]}
+        assert clusters == {
+            "14/8786/5136": {
+                "count": 1,
+                "avg_battery": 45.0,
+                "centroid": "POINT(13.06782 55.577859)",
+            },
+            "14/8788/5142": {"count": 2, "avg_battery": 87.5, "centroid": "POINT(13.1 55.5)"},
+        }
+        assert response.json()["meta"]["source"] == "fleet_cache"
+        assert cached.json()["data"] == response.json()["data"]
+        assert cached.json()["meta"]["source"] == "cluster_cache"
+        assert too_large.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_get_nearby_bikes(self, monkeypatch):
+        """Tests v1/bikes/nearby route"""
+        nearby_bike = {
+            "id": 1,
+            "battery_lvl": 45,
+            "city_id": 1,
+            "is_available": True,
+            "last_position": "POINT(13.06782 55.577859)",
+            "distance_m": 123.456,
+        }
+        mock_get_nearby = AsyncMock(return_value=[namedtuple("Row", nearby_bike)(**nearby_bike)])
+        monkeypatch.setattr(BikeRepository, "get_nearby_bikes", mock_get_nearby)
+
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            response = await ac.get("v1/bikes/nearby?point=POINT(13.07 55.58)&k=5")
+
+        assert response.status_code == 200
+        mock_get_nearby.assert_awaited_once_with(
+            point="POINT(13.07 55.58)", k=5, max_distance_m=500.0
+        )
+        bike = response.json()["data"][0]
+        assert bike["id"] == "1"
+        assert bike["meta"] == {"distance_m": 123.5}
+        assert bike["links"]["self"] == "http://localhost:8000/v1/bikes/1"
+
+    @pytest.mark.asyncio
+    async def test_get_nearby_bikes_invalid_point(self):
+        """Tests that v1/bikes/nearby rejects invalid points"""
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            response = await ac.get("v1/bikes/nearby?point=POINT(200 55.58)")
+
+        assert response.status_code == 422
@@ -0,0 +1,120 @@
+"""Module for testing export routes"""
+
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from fastapi.security.oauth2 import SecurityScopes
+from httpx import ASGITransport, AsyncClient
+
+from api.db.repository_transaction import TransactionRepository
+from api.main import app
+from api.routes.export import security_check
+
+
+class FakeResult:
+    """Streamed result with batches of rows"""
+
+    def __init__(self, keys, batches):
+        self._keys = keys
+        self._batches = batches
+
+    def keys(self):
+        """Column names of the rows"""
+        return self._keys
+
+    async def partitions(self):
+        """Yield the batches of rows"""
+        for batch in self._batches:
+            yield batch
+
+
+class TestExport:
+    """Class to test export routes"""
+
+    keys = ["id", "user_id", "amount", "transaction_type", "meta_data", "created_at"]
+    created_at = datetime(2026, 10, 16, 12, 30, tzinfo=timezone.utc)
+    batches = [
+        [
+            (1, 7, Decimal("100.00"), "deposit", None, created_at),
+            (2, 7, Decimal("-24.50"), "trip", {"note": "a, b"}, created_at),
+        ],
+        [(3, 8, Decimal("10.25"), "refund", None, created_at)],
+    ]
+
+    async def mock_security_check(self, _1: str = "", _2: SecurityScopes = None):
+        """Mocks security check"""
+        return 652134919185249719
+
+    def mock_export(self, expected_params):
+        """Mock of TransactionRepository.export_transactions"""
+
+        async def export_transactions(_, **params):
+            assert params | expected_params == params
+            return FakeResult(self.keys, self.batches)
+
+        return export_transactions
+
+    @pytest.mark.asyncio
+    async def test_export_ndjson(self, monkeypatch):
+        """Tests that the export sends one JSON object per row"""
+        app.dependency_overrides[security_check] = self.mock_security_check
+        monkeypatch.setattr(
+            TransactionRepository,
+            "export_transactions",
+            self.mock_export({"transaction_type": "trip", "order_direction": "asc"}),
+        )
+
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            response = await ac.get(
+                "v1/export/transactions?transaction_type=trip&order_direction=asc"
+            )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert 'filename="transactions.ndjson"' in response.headers["content-disposition"]
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["id"] for line in lines] == [1, 2, 3]
+        assert lines[1] == {
+            "id": 2,
+            "user_id": 7,
+            "amount": -24.5,
+            "transaction_type": "trip",
+            "meta_data": {"note": "a, b"},
+            "created_at": "2026-10-16T12:30:00+00:00",
+        }
+
+    @pytest.mark.asyncio
+    async def test_export_csv(self, monkeypatch):
+        """Tests that the CSV export has a header and a line per row"""
+        app.dependency_overrides[security_check] = self.mock_security_check
+        monkeypatch.setattr(
+            TransactionRepository, "export_transactions", self.mock_export({"format": "csv"})
+        )
+
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            response = await ac.get("v1/export/transactions?format=csv")
+            unknown = await ac.get("v1/export/transactions?format=xml")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.reader(io.StringIO(response.text)))
+        assert rows[0] == self.keys
+        assert rows[2] == [
+            "2",
+            "7",
+            "-24.50",
+            "trip",
+            '{"note":"a, b"}',
+            "2026-10-16T12:30:00+00:00",
+        ]
+        assert rows[3][4] == ""
+        assert len(rows) == 4
+        assert unknown.status_code == 422
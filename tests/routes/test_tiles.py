@@ -0,0 +1,79 @@
+"""Module for testing tile routes"""
+
+from unittest.mock import AsyncMock
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from api.db.repository_bike import BikeRepository
+from api.db.repository_zone import MapZoneRepository
+from api.main import app
+from api.services.tile_cache import tile_cache
+
+
+class TestTileRoute:
+    """Class to test tile routes"""
+
+    fake_bike_layer = b"\x1a\x05bikes"
+    fake_zone_layer = b"\x1a\x0dzones_parking"
+
+    @pytest.mark.asyncio
+    async def test_get_tile(self, monkeypatch):
+        """Tests that a tile joins the bike and zone layers and is cached"""
+        tile_cache.clear()
+        mock_bike_tile = AsyncMock(return_value=self.fake_bike_layer)
+        mock_zone_tile = AsyncMock(return_value=self.fake_zone_layer)
+        monkeypatch.setattr(BikeRepository, "get_bike_tile", mock_bike_tile)
+        monkeypatch.setattr(MapZoneRepository, "get_map_zone_tile", mock_zone_tile)
+
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            response = await ac.get("v1/tiles/14/8802/5137.mvt")
+            cached = await ac.get("v1/tiles/14/8802/5137.mvt")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/vnd.mapbox-vector-tile"
+        assert response.content == self.fake_bike_layer + self.fake_zone_layer
+        assert cached.content == response.content
+        assert cached.headers["etag"] == response.headers["etag"]
+        mock_bike_tile.assert_awaited_once_with(14, 8802, 5137)
+        mock_zone_tile.assert_awaited_once_with(14, 8802, 5137)
+
+    @pytest.mark.asyncio
+    async def test_get_tile_not_modified(self, monkeypatch):
+        """Tests that a matching If-None-Match gives 304 and invalidation rebuilds a layer"""
+        tile_cache.clear()
+        mock_bike_tile = AsyncMock(return_value=self.fake_bike_layer)
+        monkeypatch.setattr(BikeRepository, "get_bike_tile", mock_bike_tile)
+        monkeypatch.setattr(
+            MapZoneRepository, "get_map_zone_tile", AsyncMock(return_value=self.fake_zone_layer)
+        )
+
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            response = await ac.get("v1/tiles/14/8802/5137.mvt")
+            etag = response.headers["etag"]
+            not_modified = await ac.get(
+                "v1/tiles/14/8802/5137.mvt", headers={"If-None-Match": etag}
+            )
+            tile_cache.invalidate("bikes")
+            mock_bike_tile.return_value = b"\x1a\x06bikes2"
+            modified = await ac.get("v1/tiles/14/8802/5137.mvt", headers={"If-None-Match": etag})
+
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert modified.status_code == 200
+        assert modified.headers["etag"] != etag
+        assert mock_bike_tile.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_get_tile_outside_grid(self):
+        """Tests that a tile outside the grid of its zoom level is not found"""
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            response = await ac.get("v1/tiles/2/4/0.mvt")
+
+        assert response.status_code == 404
@@ -1,15 +1,19 @@
 """Module for testing trip routes"""
 
+import json
+import warnings
 from unittest.mock import AsyncMock, Mock
 
 import pytest
+from fastapi._compat import get_model_fields
 from fastapi.security.oauth2 import SecurityScopes
 from httpx import ASGITransport, AsyncClient
+from pydantic.warnings import UnsupportedFieldAttributeWarning
 
 from api.db.repository_trip import TripRepository
 from api.db.repository_user import UserRepository
 from api.main import app
-from api.models.trip_models import BikeTripEndData, BikeTripStartData
+from api.models.trip_models import BikeTripEndData, BikeTripStartData, TripGetRequestParams
 from api.routes.trips import TSID, security_check
 from api.services.socket import socket
 from tests.mock_files.objects import fake_trip_start, fake_trips
@@ -59,6 +63,100 @@ class TestTrips:
         assert response.status_code == 200
         assert response.json() == get_fake_json_data("trips")
 
+    @pytest.mark.asyncio
+    async def test_get_trips_page(self, monkeypatch):
+        """Tests that get trips is paginated and passes the page params on"""
+
+        app.dependency_overrides[security_check] = self.mock_security_check
+
+        mock_trips_return = AsyncMock(return_value=fake_trips)
+        monkeypatch.setattr(TripRepository, "get_trips", mock_trips_return)
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            response = await ac.get(f"v1/trips/?limit={len(fake_trips)}&order_by=start_time")
+            too_large = await ac.get("v1/trips/?limit=5000")
+
+        assert response.status_code == 200
+        params = mock_trips_return.await_args_list[0].kwargs
+        assert params["limit"] == len(fake_trips)
+        assert params["order_by"] == "start_time"
+        assert "cursor=" in response.json()["links"]["next"]
+        assert too_large.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_get_trips_sparse_fields(self, monkeypatch):
+        """Tests that fields[trips] limits the trip attributes and is passed to the repo"""
+
+        app.dependency_overrides[security_check] = self.mock_security_check
+
+        mock_trips_return = AsyncMock(return_value=fake_trips)
+        monkeypatch.setattr(TripRepository, "get_trips", mock_trips_return)
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            response = await ac.get("v1/trips/?fields[trips]=start_time,total_fee")
+            unknown = await ac.get("v1/trips/?fields[trips]=start_time,password")
+
+        assert response.status_code == 200
+        params = mock_trips_return.await_args_list[0].kwargs
+        assert params["fields"] == ["start_time", "total_fee"]
+        expected = get_fake_json_data("trips")["data"]
+        for trip, expected_trip in zip(response.json()["data"], expected):
+            assert trip["attributes"] == {
+                "start_time": expected_trip["attributes"]["start_time"],
+                "total_fee": expected_trip["attributes"]["total_fee"],
+            }
+            assert trip["relationships"] == expected_trip["relationships"]
+        assert unknown.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_get_trips_literal_fieldset(self, monkeypatch):
+        """Tests that a fields[trips] parameter with unescaped brackets projects the trip
+        attributes, without alias warnings"""
+
+        app.dependency_overrides[security_check] = self.mock_security_check
+
+        # FastAPI validates the parameters of a query model with the fields of the model
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", UnsupportedFieldAttributeWarning)
+            get_model_fields(TripGetRequestParams)
+
+        monkeypatch.setattr(TripRepository, "get_trips", AsyncMock(return_value=fake_trips))
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            response = await ac.get("v1/trips/?fields[trips]=start_time")
+
+        assert response.request.url.raw_path == b"/v1/trips/?fields[trips]=start_time"
+        assert response.status_code == 200
+        expected = get_fake_json_data("trips")["data"]
+        assert [trip["attributes"] for trip in response.json()["data"]] == [
+            {"start_time": expected_trip["attributes"]["start_time"]} for expected_trip in expected
+        ]
+
+    @pytest.mark.asyncio
+    async def test_stream_trips(self, monkeypatch):
+        """Tests that the trip stream sends one JSON:API resource per line"""
+
+        app.dependency_overrides[security_check] = self.mock_security_check
+
+        async def mock_stream_trips(_, **params):
+            assert params["bike_id"] == 1
+            for trip in fake_trips:
+                yield trip
+
+        monkeypatch.setattr(TripRepository, "stream_trips", mock_stream_trips)
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            response = await ac.get("v1/trips/stream?bike_id=1")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert lines == get_fake_json_data("trips")["data"]
+
     @pytest.mark.asyncio
     async def test_get_trip(self, monkeypatch):
         """Tests get trips route"""
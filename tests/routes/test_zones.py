@@ -4,10 +4,17 @@ from unittest.mock import AsyncMock
 
 import pytest
 from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
 
 from api.db.repository_zone import MapZoneRepository, ZoneTypeRepository
 from api.main import app
-from tests.mock_files.objects import fake_zone_type_data, fake_zones_data
+from api.models import db_models
+from api.models.models import Cursor
+from api.routes.zones import security_check
+from api.services.resource_versions import resource_versions
+from api.services.zone_index import zone_index
+from tests.mock_files.objects import fake_zone_index_rows, fake_zone_type_data, fake_zones_data
 from tests.utils import get_fake_json_data
 
 
@@ -34,6 +41,78 @@ class TestZoneRoute:
         expected_response = get_fake_json_data("mapzones")
         assert response.json() == expected_response
 
+    @pytest.mark.asyncio
+    async def test_get_zones_cursor_links(self, monkeypatch):
+        """Tests that a full page links to the next page by cursor"""
+        mock_get_zones = AsyncMock(return_value=fake_zones_data)
+        monkeypatch.setattr(MapZoneRepository, "get_map_zones", mock_get_zones)
+
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            response = await ac.get("v1/zones/?limit=2&offset=2&city_id=1")
+            links = response.json()["links"]
+            next_cursor = Cursor.decode(links["next"].rsplit("cursor=", 1)[1])
+            assert next_cursor.model_dump() == {
+                "order_by": "city_id",
+                "order_direction": "asc",
+                "value": 1,
+                "id": 112415,
+                "before": False,
+            }
+            assert "offset" not in links["next"]
+            assert "city_id=1" in links["next"]
+            assert Cursor.decode(links["prev"].rsplit("cursor=", 1)[1]).before
+
+            response = await ac.get(links["next"])
+
+        assert response.status_code == 200
+        assert mock_get_zones.await_args.kwargs["cursor"] == links["next"].rsplit("cursor=", 1)[1]
+
+    @pytest.mark.asyncio
+    async def test_get_zones_invalid_cursor(self):
+        """Tests that cursors that are broken or made for another sorting are rejected"""
+        cursor = Cursor(order_by="created_at", order_direction="asc", value=None, id=1).encode()
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            broken = await ac.get("v1/zones/?cursor=abc")
+            mismatched = await ac.get(f"v1/zones/?cursor={cursor}")
+
+        assert broken.status_code == 422
+        assert mismatched.status_code == 422
+
+    def test_paginate_by_cursor(self):
+        """Tests that cursors become row comparisons on (order column, id)"""
+        repository = MapZoneRepository(None)
+        cursor = Cursor(order_by="city_id", order_direction="desc", value=1, id=5)
+
+        stmt, backwards = repository._paginate(  # pylint: disable=protected-access
+            select(db_models.MapZone.id),
+            order_by="city_id",
+            order_direction="desc",
+            cursor=cursor.encode(),
+            limit=10,
+        )
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        assert not backwards
+        assert "WHERE (map_zones.city_id, map_zones.id) < (" in sql
+        assert "ORDER BY map_zones.city_id DESC, map_zones.id DESC" in sql
+        assert "OFFSET" not in sql
+
+        cursor.before = True
+        stmt, backwards = repository._paginate(  # pylint: disable=protected-access
+            select(db_models.MapZone.id),
+            order_by="city_id",
+            order_direction="desc",
+            cursor=cursor.encode(),
+            limit=10,
+        )
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        assert backwards
+        assert "WHERE (map_zones.city_id, map_zones.id) > (" in sql
+        assert "ORDER BY map_zones.city_id ASC, map_zones.id ASC" in sql
+
     @pytest.mark.asyncio
     async def test_get_zone(self, monkeypatch):
         """Tests v1/zones/{zone_id} route"""
@@ -65,3 +144,113 @@ class TestZoneRoute:
         assert response.status_code == 200
         expected_response = get_fake_json_data("zonetypes")
         assert response.json() == expected_response
+
+    @pytest.mark.asyncio
+    async def test_zone_types_not_modified(self, monkeypatch):
+        """Tests that zone types are not read again when If-None-Match has the ETag"""
+        mock_get_zone_types = AsyncMock(return_value=fake_zone_type_data)
+        monkeypatch.setattr(ZoneTypeRepository, "get_zone_types", mock_get_zone_types)
+        monkeypatch.setattr(resource_versions, "etag", lambda table: f'"{table}-7"')
+
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            response = await ac.get("v1/zones/types", headers={"Accept-Encoding": "identity"})
+            not_modified = await ac.get(
+                "v1/zones/types", headers={"If-None-Match": response.headers["etag"]}
+            )
+
+        assert response.status_code == 200
+        assert response.headers["etag"] == '"zone_types-7"'
+        assert response.headers["cache-control"] == "public, max-age=300"
+        assert not_modified.status_code == 304
+        assert not_modified.headers["etag"] == '"zone_types-7"'
+        assert mock_get_zone_types.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_zones_cache_headers(self, monkeypatch):
+        """Tests that the encoded zone page has the ETag and Cache-Control headers"""
+        mock_get_zones = AsyncMock(return_value=fake_zones_data)
+        monkeypatch.setattr(MapZoneRepository, "get_map_zones", mock_get_zones)
+        monkeypatch.setattr(resource_versions, "etag", lambda table: f'"{table}-7"')
+
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            response = await ac.get("v1/zones/", headers={"Accept-Encoding": "identity"})
+            not_modified = await ac.get("v1/zones/", headers={"If-None-Match": '"map_zones-7"'})
+
+        assert response.status_code == 200
+        assert response.headers["etag"] == '"map_zones-7"'
+        assert response.headers["cache-control"] == "public, max-age=60"
+        assert not_modified.status_code == 304
+        assert mock_get_zones.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_point_in_zone(self, monkeypatch):
+        """Tests v1/zones/point_in_zone route"""
+        # A POST route would read the params of mock_security_check from the body
+        app.dependency_overrides[security_check] = lambda: {"user_id": 1, "scopes": ["admin"]}
+        monkeypatch.setattr(zone_index, "_cities", {})
+        monkeypatch.setattr(zone_index, "_zones", {})
+        monkeypatch.setattr(zone_index, "_loaded", False)
+
+        async def mock_rebuild_zone_index(_):
+            zone_index.load(fake_zone_index_rows)
+
+        monkeypatch.setattr(MapZoneRepository, "rebuild_zone_index", mock_rebuild_zone_index)
+
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            response = await ac.post(
+                "v1/zones/point_in_zone", json={"point": "POINT(1.5 1.5)", "city_id": 1}
+            )
+            outside = await ac.post("v1/zones/point_in_zone", json={"point": "POINT(5 5)"})
+
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert [zone["id"] for zone in data] == ["1", "2"]
+        assert data[1]["attributes"] == {
+            "zone_name": "Torget",
+            "city_id": 1,
+            "zone_type_id": 2,
+            "type_name": "Slow",
+            "speed_limit": 10,
+            "start_fee": 0.0,
+            "end_fee": 5.5,
+        }
+        assert data[1]["links"]["self"] == "http://localhost:8000/v1/zones/2"
+        assert outside.json()["data"] == []
+
+    @pytest.mark.asyncio
+    async def test_classify_points(self, monkeypatch):
+        """Tests v1/zones/classify route"""
+        app.dependency_overrides[security_check] = lambda: {"user_id": 1, "scopes": ["admin"]}
+        # Keep the loaded zones out of the global index after the test
+        for attribute in ("_cities", "_zones", "_loaded"):
+            monkeypatch.setattr(zone_index, attribute, getattr(zone_index, attribute))
+        zone_index.load(fake_zone_index_rows)
+
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost:8000/"
+        ) as ac:
+            points = await ac.post(
+                "v1/zones/classify", json={"points": [[1.5, 1.5], [5, 5]], "city_id": 1}
+            )
+            path = await ac.post(
+                "v1/zones/classify", json={"path": "LINESTRING(0.5 0.5, 2.5 2.5, 5 5)"}
+            )
+            both = await ac.post(
+                "v1/zones/classify",
+                json={"points": [[1.5, 1.5]], "path": "LINESTRING(0.5 0.5, 2.5 2.5)"},
+            )
+            out_of_range = await ac.post("v1/zones/classify", json={"points": [[200, 1]]})
+
+        assert points.status_code == 200
+        body = points.json()
+        assert body["data"] == [[1, 2], []]
+        assert [zone["id"] for zone in body["included"]] == ["1", "2"]
+        assert path.json()["data"] == [[1], [2, 3], []]
+        assert both.status_code == 422
+        assert out_of_range.status_code == 422
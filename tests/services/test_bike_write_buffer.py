@@ -0,0 +1,92 @@
+"""Module for testing the bike write-behind buffer"""
+
+import asyncio
+import contextlib
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from api.db.repository_bike import BikeRepository
+from api.services.bike_write_buffer import BikeWriteBuffer
+from api.services.metrics import metrics
+
+
+class FakeSessionManager:
+    """Session manager that hands out mock sessions"""
+
+    @contextlib.asynccontextmanager
+    async def session(self):
+        """Yields a mock session"""
+        yield Mock()
+
+
+class TestBikeWriteBuffer:
+    """Class to test the bike write-behind buffer"""
+
+    @pytest.mark.asyncio
+    async def test_flush_merges_reports(self, monkeypatch):
+        """Tests that reports are merged per bike and written in one bulk update"""
+        monkeypatch.setattr("api.services.bike_write_buffer.sessionmanager", FakeSessionManager())
+        mock_update_bulk = AsyncMock(return_value={1, 2})
+        monkeypatch.setattr(BikeRepository, "update_bikes_bulk", mock_update_bulk)
+
+        buffer = BikeWriteBuffer(interval=60, max_updates=1000)
+        buffer.enqueue(1, {"battery_lvl": 50, "last_position": "POINT(13.06 55.57)"})
+        buffer.enqueue(2, {"battery_lvl": 90})
+        buffer.enqueue(1, {"battery_lvl": 49})
+        await buffer.flush()
+
+        mock_update_bulk.assert_awaited_once_with(
+            [
+                {"bike_id": 1, "battery_lvl": 49, "last_position": "POINT(13.06 55.57)"},
+                {"bike_id": 2, "battery_lvl": 90},
+            ]
+        )
+        assert buffer.pending_bikes == 0
+        assert metrics.snapshot()["bike_write_buffer_flush_size"] == 2
+
+        # Nothing is written when the buffer is empty
+        await buffer.flush()
+        mock_update_bulk.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_reports(self, monkeypatch):
+        """Tests that a failed flush keeps its reports below newer ones"""
+        monkeypatch.setattr("api.services.bike_write_buffer.sessionmanager", FakeSessionManager())
+        mock_update_bulk = AsyncMock(side_effect=ConnectionError("database is down"))
+        monkeypatch.setattr(BikeRepository, "update_bikes_bulk", mock_update_bulk)
+
+        buffer = BikeWriteBuffer(interval=60, max_updates=1000)
+        buffer.enqueue(1, {"battery_lvl": 50, "is_available": True})
+        with pytest.raises(ConnectionError):
+            await buffer.flush()
+        buffer.enqueue(1, {"battery_lvl": 48})
+
+        mock_update_bulk.side_effect = None
+        await buffer.flush()
+
+        assert mock_update_bulk.await_args.args[0] == [
+            {"bike_id": 1, "battery_lvl": 48, "is_available": True}
+        ]
+
+    @pytest.mark.asyncio
+    async def test_stop_flushes_when_full(self, monkeypatch):
+        """Tests that max_updates wakes the flush task and that stop writes the rest"""
+        monkeypatch.setattr("api.services.bike_write_buffer.sessionmanager", FakeSessionManager())
+        mock_update_bulk = AsyncMock(return_value=set())
+        monkeypatch.setattr(BikeRepository, "update_bikes_bulk", mock_update_bulk)
+
+        buffer = BikeWriteBuffer(interval=60, max_updates=2)
+        buffer.start()
+        buffer.enqueue(1, {"battery_lvl": 50})
+        buffer.enqueue(2, {"battery_lvl": 60})
+        for _ in range(20):
+            await asyncio.sleep(0)
+        assert mock_update_bulk.await_count == 1
+
+        buffer.enqueue(3, {"battery_lvl": 70})
+        await buffer.stop()
+
+        assert mock_update_bulk.await_count == 2
+        assert mock_update_bulk.await_args.args[0] == [{"bike_id": 3, "battery_lvl": 70}]
+        assert not buffer.is_running
@@ -0,0 +1,99 @@
+"""Module for testing the response compression middleware"""
+
+import asyncio
+import json
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from starlette.responses import Response, StreamingResponse
+
+from api.services import compression
+from api.services.compression import CompressionMiddleware, accepted_encodings
+
+page = json.dumps([{"path_taken": "LINESTRING(13.06782 55.57786, 13.06787 55.57785)"}] * 100)
+
+
+def app_of(response, **options):
+    """Wrap an ASGI response in the middleware"""
+
+    async def app(scope, receive, send):
+        await response(scope, receive, send)
+
+    return CompressionMiddleware(app, **options)
+
+
+async def get(app, accept_encoding="gzip"):
+    """Get / from an ASGI app"""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+        return await ac.get("/", headers={"Accept-Encoding": accept_encoding})
+
+
+class TestCompressionMiddleware:
+    """Class to test the response compression middleware"""
+
+    def test_accepted_encodings(self):
+        """Tests that encodings with a quality of 0 are not accepted"""
+        assert accepted_encodings("gzip, deflate, br;q=0") == {"gzip", "deflate"}
+        assert accepted_encodings("GZIP;q=0.5, *;q=0") == {"gzip"}
+        assert accepted_encodings("") == set()
+
+    @pytest.mark.asyncio
+    async def test_compress_body(self, monkeypatch):
+        """Tests that a large JSON body is compressed"""
+        monkeypatch.setattr(compression, "brotli", None)
+        response = await get(app_of(Response(page, media_type="application/json")), "gzip, br")
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert int(response.headers["content-length"]) < len(page)
+        assert response.text == page
+
+    @pytest.mark.asyncio
+    async def test_skip_body(self):
+        """Tests that small bodies, other content types and clients that do not accept
+        gzip get the body as it is"""
+        small = await get(app_of(Response("[]", media_type="application/json")))
+        tile = await get(app_of(Response(page, media_type="application/vnd.mapbox-vector-tile")))
+        identity = await get(app_of(Response(page, media_type="application/json")), "identity")
+
+        for response in (small, tile, identity):
+            assert "content-encoding" not in response.headers
+        assert tile.text == identity.text == page
+
+    @pytest.mark.asyncio
+    async def test_compress_stream(self):
+        """Tests that a streamed body is compressed chunk by chunk"""
+
+        async def lines():
+            for line in page.split(","):
+                yield line + "\n"
+
+        response = await get(
+            app_of(
+                StreamingResponse(lines(), media_type="application/x-ndjson"),
+                content_types=["application/x-ndjson"],
+            )
+        )
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        assert response.text == "".join(line + "\n" for line in page.split(","))
+
+    @pytest.mark.asyncio
+    async def test_compress_in_thread(self, monkeypatch):
+        """Tests that bodies of at least thread_size bytes are compressed in a thread"""
+        sizes = []
+        to_thread = asyncio.to_thread
+
+        async def recording_to_thread(function, data, last):
+            sizes.append(len(data))
+            return await to_thread(function, data, last)
+
+        monkeypatch.setattr(compression.asyncio, "to_thread", recording_to_thread)
+        small = app_of(Response(page, media_type="application/json"))
+        large = app_of(Response(page, media_type="application/json"), thread_size=len(page))
+
+        assert (await get(small)).text == page
+        assert not sizes
+        assert (await get(large)).text == page
+        assert sizes == [len(page)]
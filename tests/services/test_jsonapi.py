@@ -0,0 +1,88 @@
+"""Module for testing the JSON:API collection encoder"""
+
+import datetime
+import json
+from decimal import Decimal
+
+from api.models.bike_models import AdminBikeAttributes, BikeResource
+from api.models.models import JsonApiLinks
+from api.models.trip_models import TripAttributes, TripResource
+from api.services.jsonapi import ResourceEncoder, jsonapi_response
+from tests.mock_files.objects import fake_bike_data, fake_trips
+
+bike_encoder = ResourceEncoder(
+    "bikes", AdminBikeAttributes, relationships={"city": ("cities", "city_id")}
+)
+trip_encoder = ResourceEncoder(
+    "trips",
+    TripAttributes,
+    relationships={"user": ("users", "user_id"), "bike": ("bikes", "bike_id"), "transaction": None},
+    string_id=False,
+)
+
+
+def encoded(resources):
+    """Get the data of a response with resources, as decoded JSON"""
+    response = jsonapi_response(resources, JsonApiLinks(self_link="http://localhost"))
+    assert response.media_type == "application/json"
+    return json.loads(response.body)["data"]
+
+
+class TestResourceEncoder:
+    """Class to test that the encoder gives the resources of the pydantic models"""
+
+    def test_encode_like_resources(self):
+        """Tests that rows encode like pydantic resources of the same rows"""
+        url = "http://localhost:8000/v1/bikes/"
+        expected = [
+            json.loads(BikeResource.from_db_model(bike, url, True).model_dump_json(by_alias=True))
+            for bike in fake_bike_data
+        ]
+        assert encoded(bike_encoder.encode(fake_bike_data, url)) == expected
+
+        url = "http://localhost:8000/v1/trips/"
+        expected = [
+            json.loads(TripResource.from_db_model(trip, url).model_dump_json(by_alias=True))
+            for trip in fake_trips
+        ]
+        assert encoded(trip_encoder.encode(fake_trips, url)) == expected
+
+    def test_encode_mappings(self):
+        """Tests that mapping rows are read by key, and that float attributes are floats"""
+        row = {
+            "id": 7,
+            "user_id": 3,
+            "bike_id": 2,
+            "start_position": "POINT(13.05 55.23)",
+            "start_time": datetime.datetime(2024, 7, 13, 7, 56, 51, tzinfo=datetime.timezone.utc),
+            "start_fee": 10,
+            "total_fee": Decimal("12.50"),
+            "created_at": datetime.datetime(2024, 7, 13, 7, 56, 51),
+            "updated_at": datetime.datetime(2024, 7, 13, 7, 56, 51),
+        }
+        trip = encoded(trip_encoder.encode([row], "http://localhost:8000/v1/trips/"))[0]
+
+        assert trip["id"] == 7
+        assert trip["attributes"]["start_time"] == "2024-07-13T07:56:51Z"
+        assert trip["attributes"]["created_at"] == "2024-07-13T07:56:51"
+        assert trip["attributes"]["start_fee"] == 10.0
+        assert isinstance(trip["attributes"]["start_fee"], float)
+        assert trip["attributes"]["total_fee"] == 12.5
+        assert trip["attributes"]["end_position"] is None
+        assert trip["relationships"] == {
+            "user": {"data": {"type": "users", "id": "3"}},
+            "bike": {"data": {"type": "bikes", "id": "2"}},
+            "transaction": None,
+        }
+        assert trip["links"] == {"self": "http://localhost:8000/v1/trips/7"}
+
+    def test_encode_sparse_fieldset(self):
+        """Tests that a sparse fieldset keeps only its attributes"""
+        bikes = encoded(
+            bike_encoder.encode(fake_bike_data, "http://localhost/", ["battery_lvl", "created_at"])
+        )
+
+        assert [bike["attributes"] for bike in bikes] == [
+            {"battery_lvl": 45, "created_at": "2024-07-13T07:56:50.758246Z"},
+            {"battery_lvl": 95, "created_at": "2024-07-13T07:56:51.758246Z"},
+        ]
@@ -0,0 +1,52 @@
+"""Module for testing the background tasks"""
+
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from api.services.metrics import metrics
+from api.services.periodic import PeriodicTask
+
+
+class TestPeriodicTask:
+    """Class to test the periodic background task"""
+
+    @pytest.mark.asyncio
+    async def test_runs_after_errors(self):
+        """Tests that a failed run is counted and the function runs again"""
+        function = AsyncMock()
+
+        def fail_first():
+            if function.await_count == 1:
+                raise RuntimeError("database unavailable")
+
+        function.side_effect = fail_first
+        errors = metrics.snapshot().get("test_periodic_errors_total", 0)
+        task = PeriodicTask(0, function, "test_periodic_errors_total")
+
+        task.start()
+        for _ in range(10):
+            await asyncio.sleep(0)
+        await task.stop()
+
+        assert function.await_count >= 2
+        assert metrics.snapshot()["test_periodic_errors_total"] == errors + 1
+
+    @pytest.mark.asyncio
+    async def test_start_and_stop(self):
+        """Tests that start runs one task and stop cancels it before the first run"""
+        function = AsyncMock()
+        task = PeriodicTask(60, function)
+
+        task.start()
+        running = task._task  # pylint: disable=protected-access
+        task.start()
+        assert task._task is running  # pylint: disable=protected-access
+        assert task.is_running
+
+        await task.stop()
+        await task.stop()
+        assert not task.is_running
+        assert running.cancelled()
+        function.assert_not_awaited()
@@ -0,0 +1,56 @@
+"""Module for testing the map zone index"""
+
+from api.services.zone_index import ZoneIndex
+from tests.mock_files.objects import fake_zone_index_rows as zone_rows
+
+
+class TestZoneIndex:
+    """Class to test the map zone index"""
+
+    def test_find(self):
+        """Tests that a lookup finds every zone that contains the point"""
+        index = ZoneIndex()
+        assert not index.is_loaded
+        index.load(zone_rows)
+
+        assert index.is_loaded
+        assert len(index) == 3
+        assert [zone.id for zone in index.find("POINT(1.5 1.5)", 1)] == [1, 2]
+        assert [zone.id for zone in index.find("POINT(1.5 1.5)")] == [1, 2, 3]
+        assert [zone.id for zone in index.find("POINT(0.5 0.5)")] == [1]
+        assert index.find("POINT(5 5)") == []
+        assert index.find("POINT(1.5 1.5)", 3) == []
+
+        zone = index.find("POINT(2.5 2.5)", 1)[0]
+        assert (zone.type_name, zone.speed_limit, zone.end_fee) == ("Slow", 10, 5.5)
+
+    def test_find_excludes_boundary(self):
+        """Tests that points on a boundary are not in the zone, like ST_Contains"""
+        index = ZoneIndex()
+        index.load(zone_rows[:1])
+
+        assert index.find("POINT(2 1)") == []
+
+    def test_load_replaces_index(self):
+        """Tests that a reload drops zones that are gone"""
+        index = ZoneIndex()
+        index.load(zone_rows)
+        index.load(zone_rows[1:2])
+
+        assert [zone.id for zone in index.find("POINT(1.5 1.5)")] == [2]
+
+    def test_classify(self):
+        """Tests that every point gets the ids of the zones that contain it, in order"""
+        index = ZoneIndex()
+        index.load(zone_rows)
+
+        zone_ids, zones = index.classify([(1.5, 1.5), (5, 5), (0.5, 0.5), (2.5, 2.5)])
+        assert zone_ids == [[1, 2, 3], [], [1], [2, 3]]
+        assert [zone.id for zone in zones] == [1, 2, 3]
+
+        zone_ids, zones = index.classify([(1.5, 1.5), (2.5, 2.5)], city_id=2)
+        assert zone_ids == [[3], [3]]
+        assert [zone.type_name for zone in zones] == ["Parking"]
+
+        assert index.classify([(1.5, 1.5)], city_id=3) == ([[]], [])
+        assert index.classify([]) == ([], [])